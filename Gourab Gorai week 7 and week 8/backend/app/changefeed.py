@@ -0,0 +1,215 @@
+"""
+Change-data feed for incremental warehouse syncs.
+
+Every flush that inserts, updates or deletes a tracked row queues an entry for
+`change_log`. Bulk `query.update()` / `query.delete()` calls are captured too,
+by selecting the affected ids before the statement runs; bulk inserts are
+logged by their callers through record_inserts(). The queued entries are
+written right before the transaction commits, stamped with that moment, and
+dropped if it rolls back. Consumers page through the log by (changed_at, id)
+and get the current row for upserts or a tombstone for deletes.
+
+Ordering limit: changed_at is taken just before COMMIT, not at it, and there
+is no commit sequence in the database. fetch_changes only hands out entries
+older than SAFETY_LAG, so a commit is seen as long as it completes within
+SAFETY_LAG of being stamped. One that stalls longer (e.g. waiting on a lock
+for the whole lag) lands behind consumers' watermarks and is not delivered
+to them; raise CHANGEFEED_SAFETY_LAG_SECONDS if that can happen, or re-sync
+from the CSV exports.
+
+The log only covers changes made after it was introduced; seed a warehouse with
+the full CSV exports first, then follow the feed.
+"""
+import datetime
+import os
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select, or_, and_
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import (
+    ChangeLog, User, ShoutOut, ShoutOutRecipient, ShoutOutMedia,
+    Comment, Reaction, Report, Notification,
+)
+
+TRACKED_MODELS = {
+    model.__tablename__: model
+    for model in (User, ShoutOut, ShoutOutRecipient, ShoutOutMedia, Comment, Reaction, Report, Notification)
+}
+
+# Columns that must never leave the database through the feed
+EXCLUDED_COLUMNS = {
+    "users": {"password"},
+}
+
+# Only hand out entries at least this old: the time a transaction may take
+# between being stamped and committing (see the ordering limit above)
+SAFETY_LAG = datetime.timedelta(seconds=float(os.getenv("CHANGEFEED_SAFETY_LAG_SECONDS", "5")))
+
+# session.info key for the entries waiting for the commit
+_PENDING = "changefeed_pending"
+
+MAX_PAGE_SIZE = 5000
+
+
+def _record(session: Session, entries):
+    if entries:
+        session.info.setdefault(_PENDING, []).extend(entries)
+
+
+def _before_commit(session: Session):
+    # Flush first: the commit would otherwise flush after this hook, and those
+    # changes would miss the log
+    session.flush()
+    entries = session.info.pop(_PENDING, None)
+    if not entries:
+        return
+    now = datetime.datetime.utcnow()
+    session.connection().execute(
+        ChangeLog.__table__.insert(),
+        [
+            {"table_name": table, "row_id": row_id, "operation": operation, "changed_at": now}
+            for table, row_id, operation in entries
+        ],
+    )
+
+
+def _after_transaction_end(session: Session, transaction):
+    # A transaction that rolled back or was closed without committing leaves nothing behind
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
+
+
+def record_inserts(session: Session, table: str, ids: Iterable[int]):
+    """For rows written with a bulk insert(), which the flush listener never sees."""
+    if table in TRACKED_MODELS:
+        _record(session, [(table, row_id, "upsert") for row_id in ids])
+
+
+def _after_flush(session: Session, flush_context):
+    entries = []
+    for obj in session.new:
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_MODELS:
+            entries.append((table, obj.id, "upsert"))
+    for obj in session.dirty:
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_MODELS and session.is_modified(obj, include_collections=False):
+            entries.append((table, obj.id, "upsert"))
+    for obj in session.deleted:
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_MODELS:
+            entries.append((table, obj.id, "delete"))
+    _record(session, entries)
+
+
+def _capture_bulk_writes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.local_table.name not in TRACKED_MODELS:
+        return
+
+    statement = orm_execute_state.statement
+    id_query = select(mapper.primary_key[0])
+    if statement.whereclause is not None:
+        id_query = id_query.where(statement.whereclause)
+
+    session = orm_execute_state.session
+    ids = session.execute(id_query).scalars().all()
+    operation = "delete" if orm_execute_state.is_delete else "upsert"
+    _record(session, [(mapper.local_table.name, row_id, operation) for row_id in ids])
+
+
+def register(session_factory=SessionLocal):
+    """Attach the change-log listeners to a sessionmaker (idempotent)."""
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _capture_bulk_writes),
+        ("before_commit", _before_commit),
+        ("after_transaction_end", _after_transaction_end),
+    ):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)
+
+
+def serialize_row(table: str, row) -> dict:
+    mapper = TRACKED_MODELS[table].__mapper__
+    excluded = EXCLUDED_COLUMNS.get(table, set())
+    return {
+        attr.key: getattr(row, attr.key)
+        for attr in mapper.column_attrs
+        if attr.key not in excluded
+    }
+
+
+def fetch_changes(
+    db: Session,
+    since: Optional[datetime.datetime] = None,
+    after_id: int = 0,
+    limit: int = 1000,
+    tables: Optional[Iterable[str]] = None,
+) -> dict:
+    """
+    Returns the next page of changes after the (since, after_id) watermark.
+
+    Repeated changes to the same row within a page collapse into one entry.
+    Upserts carry the row as it is now; rows that no longer exist come back
+    as tombstones. Pass the returned `next_since` / `next_after_id` on the
+    following call.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cutoff = datetime.datetime.utcnow() - SAFETY_LAG
+
+    query = db.query(ChangeLog).filter(ChangeLog.changed_at <= cutoff)
+    if since is not None:
+        query = query.filter(or_(
+            ChangeLog.changed_at > since,
+            and_(ChangeLog.changed_at == since, ChangeLog.id > after_id),
+        ))
+    if tables:
+        query = query.filter(ChangeLog.table_name.in_(list(tables)))
+
+    entries = query.order_by(ChangeLog.changed_at, ChangeLog.id).limit(limit).all()
+
+    # Keep the last entry per row, in feed order
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.table_name, entry.row_id), None)
+        latest[(entry.table_name, entry.row_id)] = entry
+
+    # One IN query per table for the current state of changed rows
+    ids_by_table = {}
+    for table, row_id in latest:
+        ids_by_table.setdefault(table, set()).add(row_id)
+    current_rows = {}
+    for table, ids in ids_by_table.items():
+        model = TRACKED_MODELS.get(table)
+        if model is None:
+            continue
+        for row in db.query(model).filter(model.id.in_(ids)):
+            current_rows[(table, row.id)] = row
+
+    changes = []
+    for key, entry in latest.items():
+        row = current_rows.get(key)
+        changes.append({
+            "table": entry.table_name,
+            "id": entry.row_id,
+            "operation": "upsert" if row is not None else "delete",
+            "changed_at": entry.changed_at,
+            "data": serialize_row(entry.table_name, row) if row is not None else None,
+        })
+
+    last = entries[-1] if entries else None
+    return {
+        "changes": changes,
+        "next_since": last.changed_at if last else since,
+        "next_after_id": last.id if last else after_id,
+        "has_more": len(entries) == limit,
+    }
+
+
+register()
@@ -1,13 +1,19 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 from . import models
+from . import changefeed  # records writes into change_log
+from . import unread_counters  # keeps notification_unread_counts in step
 from .database import engine
-from .routers import auth, users, shoutouts, admin
+from .routers import auth, users, shoutouts, admin, uploads
+from .utils import media_pipeline, face_detection, password_hashing, storage
+from .utils import notifications  # pushes new notifications to open streams
+from .utils.notification_hub import notification_hub
+from .utils.notification_retention import retention_job
+from .utils.media_files import MediaFiles
 
 models.Base.metadata.create_all(bind=engine)
 
@@ -32,15 +38,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def resume_media_uploads():
+    media_pipeline.pipeline.resume_pending()
+
+@app.on_event("shutdown")
+def stop_media_uploads():
+    media_pipeline.pipeline.shutdown()
+    storage.close_storage()
+
+@app.on_event("startup")
+def warm_up_face_detection():
+    # Opt-in: loads the face model now instead of on the first profile picture
+    if os.getenv("FACE_DETECTION_WARMUP", "false").lower() == "true" and face_detection.is_available():
+        face_detection.face_detector.warm_up()
+
+@app.on_event("shutdown")
+def stop_face_detection():
+    face_detection.face_detector.shutdown()
+
+@app.on_event("startup")
+def start_password_hashing():
+    if password_hashing.TARGET_MS:
+        rounds = password_hashing.apply_calibration(password_hashing.TARGET_MS)
+        print(f"Password hashing: {rounds} pbkdf2 rounds for a {password_hashing.TARGET_MS:.0f} ms target")
+    password_hashing.password_hasher.warm_up()
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    password_hashing.password_hasher.shutdown()
+
+@app.on_event("startup")
+def start_notification_push():
+    notification_hub.start()
+
+@app.on_event("shutdown")
+def stop_notification_push():
+    notification_hub.shutdown()
+
+@app.on_event("startup")
+def start_notification_retention():
+    retention_job.start()
+
+@app.on_event("shutdown")
+def stop_notification_retention():
+    retention_job.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to BragBoard API"}
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", MediaFiles(directory="uploads"), name="uploads")
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(shoutouts.router)
+app.include_router(uploads.router)
 
 app.include_router(admin.router)
 from .routers import reports
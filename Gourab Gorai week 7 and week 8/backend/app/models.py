@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, ForeignKey, DateTime, Enum, Text, Index, JSON, false
+from sqlalchemy.orm import relationship, column_property
 import datetime
 import enum
 from .database import Base
@@ -47,7 +47,10 @@ class Notification(Base):
     comment_id = Column(Integer, ForeignKey("comments.id"), nullable=True)
     type = Column(String)  # "tag", "reaction_like", "reaction_clap", "reaction_star", "comment"
     message = Column(Text)
-    is_read = Column(String, default="false") # "true", "false"
+    # active_history: unread_counters needs the old value even when it was expired
+    is_read = column_property(Column(Boolean, default=False, server_default=false(), nullable=False), active_history=True)
+    # People folded into this notification by utils/notifications.coalesce
+    actor_count = Column(Integer, default=1, server_default="1", nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     recipient = relationship("User", foreign_keys=[recipient_id], back_populates="notifications_received")
@@ -55,6 +58,20 @@ class Notification(Base):
     shoutout = relationship("ShoutOut")
     comment = relationship("Comment")
 
+    __table_args__ = (
+        # A user's unread notifications, newest first
+        Index("ix_notifications_recipient_unread", "recipient_id", "is_read", "created_at"),
+        # Retention pruning (utils/notification_retention.py)
+        Index("ix_notifications_created_at", "created_at"),
+    )
+
+class NotificationUnreadCount(Base):
+    """Unread notifications per user, kept up to date by unread_counters.py."""
+    __tablename__ = "notification_unread_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+
 class ShoutOut(Base):
     __tablename__ = "shoutouts"
 
@@ -77,9 +94,36 @@ class ShoutOutMedia(Base):
     shoutout_id = Column(Integer, ForeignKey("shoutouts.id"))
     file_path = Column(String)
     media_type = Column(Enum(MediaType))
+    status = Column(String, default="ready") # "pending", "ready", "failed"
+    derivatives = Column(JSON, nullable=True) # [{"width", "format", "url"}], smallest first
 
     shoutout = relationship("ShoutOut", back_populates="media")
 
+class Blob(Base):
+    """One stored copy per distinct file content, shared by all media rows using it."""
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    url = Column(String, index=True, nullable=False) # what ShoutOutMedia.file_path points at
+    size = Column(Integer)
+    ref_count = Column(Integer, default=1, nullable=False)
+    derivatives = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class UploadSession(Base):
+    """A resumable upload in progress (see utils/chunked_uploads.py)."""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True) # uuid4 hex, used in the upload URL
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    filename = Column(String)
+    content_type = Column(String)
+    size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, default=0, nullable=False) # bytes written so far, i.e. the next offset
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
 class ShoutOutRecipient(Base):
     __tablename__ = "shoutout_recipients"
 
@@ -147,3 +191,17 @@ class SystemSetting(Base):
     key = Column(String, primary_key=True, index=True)
     value = Column(String)  # We will store "true"/"false" strings for booleans
     updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String, index=True)
+    row_id = Column(Integer)
+    operation = Column(String)  # "upsert", "delete"
+    changed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Feed pagination walks (changed_at, id)
+        Index("ix_change_log_changed_at_id", "changed_at", "id"),
+    )
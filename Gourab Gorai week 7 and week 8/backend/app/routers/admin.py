@@ -1,16 +1,18 @@
-import csv
-import io
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, case
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from ..database import get_db
 from ..models import User, ShoutOut, SystemSetting, Comment, Notification, Reaction, ShoutOutRecipient, ShoutOutMedia, Report
 from ..deps import get_current_admin
 from .. import schemas
+from ..utils.csv_export import stream_query_csv
+from ..utils import blob_store
+from .. import changefeed
 
 router = APIRouter(
     prefix="/admin",
@@ -61,6 +63,10 @@ def delete_shoutout(shoutout_id: int, db: Session = Depends(get_db)):
     db.query(Comment).filter(Comment.shoutout_id == shoutout_id).delete()
     db.query(Reaction).filter(Reaction.shoutout_id == shoutout_id).delete()
     db.query(ShoutOutRecipient).filter(ShoutOutRecipient.shoutout_id == shoutout_id).delete()
+    for media in db.query(ShoutOutMedia).filter(ShoutOutMedia.shoutout_id == shoutout_id).all():
+        # Older media isn't a shared blob, so its files just go with the commit
+        if not blob_store.release(db, media.file_path):
+            blob_store.delete_after_commit(db, media.file_path, media.derivatives)
     db.query(ShoutOutMedia).filter(ShoutOutMedia.shoutout_id == shoutout_id).delete()
     db.query(Report).filter(Report.shoutout_id == shoutout_id).delete()
 
@@ -123,51 +129,39 @@ def get_top_contributors(limit: int = 5, db: Session = Depends(get_db)):
     return [{"user": user, "count": count} for user, count in results]
 
 @router.get("/reports/export/users")
-def export_users_csv(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    
-    stream = io.StringIO()
-    writer = csv.writer(stream)
-    
-    # Header
-    writer.writerow(["ID", "Name", "Email", "Department", "Role", "Joined At", "Is Deleted"])
-    
-    # Rows
-    for user in users:
-        writer.writerow([
-            user.id,
-            user.name,
-            user.email,
-            user.department,
-            user.role,
-            user.joined_at,
-            user.is_deleted
-        ])
-        
-    response = StreamingResponse(iter([stream.getvalue()]), media_type="text/csv")
+def export_users_csv():
+    stmt = select(
+        User.id,
+        User.name,
+        User.email,
+        User.department,
+        User.role,
+        User.joined_at,
+        User.is_deleted
+    ).order_by(User.id)
+
+    response = StreamingResponse(
+        stream_query_csv(stmt, ["ID", "Name", "Email", "Department", "Role", "Joined At", "Is Deleted"]),
+        media_type="text/csv"
+    )
     response.headers["Content-Disposition"] = "attachment; filename=users_report.csv"
     return response
 
 @router.get("/reports/export/shoutouts")
-def export_shoutouts_csv(db: Session = Depends(get_db)):
-    shoutouts = db.query(ShoutOut).all()
-    
-    stream = io.StringIO()
-    writer = csv.writer(stream)
-    
-    # Header
-    writer.writerow(["ID", "Sender", "Message", "Date"])
-    
-    # Rows
-    for shoutout in shoutouts:
-        writer.writerow([
-            shoutout.id,
-            shoutout.sender.name if shoutout.sender else "Unknown",
-            shoutout.message,
-            shoutout.created_at
-        ])
-        
-    response = StreamingResponse(iter([stream.getvalue()]), media_type="text/csv")
+def export_shoutouts_csv():
+    # Sender name comes from the join, so there is no per-row lazy load of shoutout.sender
+    stmt = select(
+        ShoutOut.id,
+        case((User.id.is_(None), "Unknown"), else_=User.name),
+        ShoutOut.message,
+        ShoutOut.created_at
+    ).outerjoin(User, ShoutOut.sender_id == User.id)\
+     .order_by(ShoutOut.id)
+
+    response = StreamingResponse(
+        stream_query_csv(stmt, ["ID", "Sender", "Message", "Date"]),
+        media_type="text/csv"
+    )
     response.headers["Content-Disposition"] = "attachment; filename=shoutouts_report.csv"
     return response
 
@@ -190,3 +184,24 @@ def get_most_tagged(limit: int = 5, db: Session = Depends(get_db)):
      .all()
 
     return [{"user": user, "count": count} for user, count in results]
+
+@router.get("/changes")
+def get_changes(
+    since: Optional[datetime] = None,
+    after_id: int = 0,
+    limit: int = 1000,
+    tables: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Incremental export feed: rows changed after the (since, after_id) watermark.
+    `tables` is an optional comma-separated filter, e.g. "users,shoutouts".
+    """
+    table_filter = [t.strip() for t in tables.split(",") if t.strip()] if tables else None
+    if table_filter:
+        unknown = set(table_filter) - set(changefeed.TRACKED_MODELS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    return changefeed.fetch_changes(db, since=since, after_id=after_id, limit=limit, tables=table_filter)
+
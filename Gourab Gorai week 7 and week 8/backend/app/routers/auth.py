@@ -1,40 +1,82 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
 from .. import schemas, models
 from ..database import get_db
-from ..security import hash_password, verify_password, create_access_token, decode_access_token
+from ..security import create_access_token, decode_access_token
+from ..utils.password_hashing import password_hasher, PasswordHashingOverloaded
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+
+# Hashing runs in a process pool (see utils/password_hashing.py); these
+# routes are async so they can wait for it without holding a threadpool slot.
+# Their queries are blocking, so they go through run_in_threadpool, and the
+# session is closed before the hash so the DB connection goes back to the
+# pool instead of being held for the whole hash (loaded attributes stay).
+def _find_user(db: Session, email: str) -> Optional[models.User]:
+    user = db.query(models.User).filter(models.User.email == email).first()
+    db.close()
+    return user
+
+
+def _set_password(db: Session, user_id: int, password_hash: str):
+    db.query(models.User).filter(models.User.id == user_id).update({models.User.password: password_hash})
+    db.commit()
+
+
+def _add_user(db: Session, user: models.User) -> models.User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+async def _hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+
+async def _check_password(db: Session, user: models.User, plain_password: str) -> bool:
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(plain_password, user.password)
+    except PasswordHashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+    if valid and new_hash:
+        # Legacy bcrypt or too few rounds: upgrade while we have the password
+        await run_in_threadpool(_set_password, db, user.id, new_hash)
+    return valid
+
+
 @router.post("/register", response_model=schemas.UserOut, status_code=201)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     # Normalize email to lowercase
     user_in.email = user_in.email.lower()
-    existing = db.query(models.User).filter(models.User.email == user_in.email).first()
-    if existing:
+    if await run_in_threadpool(_find_user, db, user_in.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     user = models.User(
         name=user_in.name,
         email=user_in.email,
-        password=hash_password(user_in.password),
+        password=await _hash(user_in.password),
         department=user_in.department,
         role=user_in.role,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return await run_in_threadpool(_add_user, db, user)
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
     # JSON-based login (for frontend)
     email = user_in.email.lower()
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not verify_password(user_in.password, user.password):
+    user = await run_in_threadpool(_find_user, db, email)
+    if not user or not await _check_password(db, user, user_in.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -51,7 +93,7 @@ def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
@@ -60,8 +102,8 @@ def login_for_access_token(
     Accepts form data with 'username' and 'password' fields. username is the email.
     """
     email = form_data.username.lower()
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not verify_password(form_data.password, user.password):
+    user = await run_in_threadpool(_find_user, db, email)
+    if not user or not await _check_password(db, user, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -88,13 +130,13 @@ def forgot_password(request: schemas.ForgotPasswordRequest, db: Session = Depend
 
 
 @router.post("/reset-password", status_code=200)
-def reset_password(request: schemas.ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: schemas.ResetPasswordRequest, db: Session = Depends(get_db)):
     email = request.email.lower()
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await run_in_threadpool(_find_user, db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-        
-    user.password = hash_password(request.new_password)
-    db.commit()
+
+    password = await _hash(request.new_password)
+    await run_in_threadpool(_set_password, db, user.id, password)
     
     return {"message": "Password updated successfully"}
@@ -1,12 +1,14 @@
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, File, UploadFile, Form
 import shutil
 import uuid
 import os
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 from .. import models, schemas
 from ..database import get_db
 from ..deps import get_current_user
+from ..utils import media_pipeline, notifications
 
 router = APIRouter(prefix="/shoutouts", tags=["Shoutouts"])
 
@@ -39,7 +41,7 @@ def update_completed_weeks(
 
 @router.post("/", response_model=schemas.ShoutOutOut)
 def create_shoutout(
-
+    background_tasks: BackgroundTasks,
     message: str = Form(...),
 
     recipient_ids: List[int] = Form([]),
@@ -57,6 +59,9 @@ def create_shoutout(
     db.refresh(db_shoutout)
 
     # Handle file uploads
+    # Files are only spooled locally here; the media pipeline uploads them to the
+    # storage backend in the background and patches in the final URLs.
+    pending_media = []
     if files:
         for file in files:
             # Determine media type
@@ -67,15 +72,8 @@ def create_shoutout(
                 media_type = models.MediaType.VIDEO
             
             if media_type:
-
-                # Use storage utility
-                from ..utils import storage
-                
-                # Determine folder based on media type (optional, or just 'shoutouts')
-                # We'll use 'shoutouts' for all
-                
                 try:
-                    file_url = storage.save_file(file, folder="shoutouts")
+                    spooled_url, digest, size = media_pipeline.spool_upload(file)
                 except Exception as e:
                     print(f"File upload failed: {e}")
                     continue # Skip this file or raise? Skipping for robustness.
@@ -83,36 +81,30 @@ def create_shoutout(
                 # Create ShoutOutMedia entry
                 db_media = models.ShoutOutMedia(
                     shoutout_id=db_shoutout.id,
-                    file_path=file_url,
-                    media_type=media_type
+                    file_path=spooled_url,
+                    media_type=media_type,
+                    status="pending"
                 )
                 db.add(db_media)
+                pending_media.append((db_media, digest, size))
 
-    # Add recipients
-    for recipient_id in recipient_ids:
-        # Verify recipient exists
-        recipient = db.query(models.User).filter(models.User.id == recipient_id).first()
-        if not recipient:
-            continue
-        
-        db_recipient = models.ShoutOutRecipient(
-            shoutout_id=db_shoutout.id,
-            recipient_id=recipient_id
-        )
-        db.add(db_recipient)
-
-        # Create Notification for Tag
-        notification = models.Notification(
-            recipient_id=recipient_id,
-            sender_id=current_user.id,
-            shoutout_id=db_shoutout.id,
-            type="tag",
-            message=f"{current_user.name} tagged you in a shoutout!",
-            is_read="false"
-        )
-        db.add(notification)
+    # Add recipients (unknown ids are skipped) and notify them
+    recipient_ids = notifications.existing_user_ids(db, recipient_ids)
+    notifications.add_recipients(db, db_shoutout.id, recipient_ids)
+    notifications.fan_out(
+        db, background_tasks, recipient_ids,
+        sender_id=current_user.id,
+        shoutout_id=db_shoutout.id,
+        type="tag",
+        message=f"{current_user.name} tagged you in a shoutout!",
+    )
     
+    db.flush()
+    pending_uploads = [(db_media.id, db_media.file_path, digest, size) for db_media, digest, size in pending_media]
     db.commit()
+
+    for media_id, spooled_url, digest, size in pending_uploads:
+        media_pipeline.pipeline.enqueue(media_id, spooled_url, folder="shoutouts", digest=digest, size=size)
     
     # Reload with relationships for response
     shoutout_with_rels = db.query(models.ShoutOut).options(
@@ -213,10 +205,16 @@ def react_to_shoutout(
         models.Reaction.user_id == current_user.id
     ).first()
 
+    # The reaction and the author's notification are written in one transaction
+    notify_author = shoutout.sender_id != current_user.id
     if existing_reaction:
+        previous_type = existing_reaction.type
         # If same type, toggle off (delete)
         if existing_reaction.type == reaction.type:
             db.delete(existing_reaction)
+            db.flush()
+            if notify_author:
+                _recount_reaction_notification(db, shoutout, previous_type)
             db.commit()
             # Return dummy deleted reaction to indicate removal, or handle on frontend
             # For simplicity, returning the deleted reaction object state
@@ -224,6 +222,9 @@ def react_to_shoutout(
         else:
             # Change reaction type
             existing_reaction.type = reaction.type
+            db.flush()
+            if notify_author:
+                _recount_reaction_notification(db, shoutout, previous_type)
             db.commit()
             db.refresh(existing_reaction)
             return existing_reaction
@@ -235,31 +236,44 @@ def react_to_shoutout(
             type=reaction.type
         )
         db.add(new_reaction)
-        db.commit()
-        db.refresh(new_reaction)
-
-        # Create Notification for Reaction
-        if shoutout.sender_id != current_user.id:
-            # Check if reaction notification already exists to avoid spam? 
-            # For now, let's just create it. Or maybe we only notify on the first one?
-            # Simple approach: Every reaction notifies.
-            
-            notification_type = f"reaction_{reaction.type.value}"
-            notification_msg = f"{current_user.name} reacted with {reaction.type.value} to your shoutout!"
+        db.flush()
 
-            notification = models.Notification(
+        # Notify the author; a burst of reactions is merged into one notification
+        if notify_author:
+            notifications.coalesce(
+                db,
                 recipient_id=shoutout.sender_id,
-                sender_id=current_user.id,
+                sender=current_user,
+                type=f"reaction_{reaction.type.value}",
+                action=f"reacted with {reaction.type.value} to your shoutout!",
                 shoutout_id=shoutout.id,
-                type=notification_type,
-                message=notification_msg,
-                is_read="false"
+                actor_count=_reactors(db, shoutout, reaction.type).count(),
             )
-            db.add(notification)
-            db.commit()
-
+        db.commit()
+        db.refresh(new_reaction)
         return new_reaction
 
+def _reactors(db: Session, shoutout: models.ShoutOut, reaction_type: models.ReactionType):
+    """People other than the author with a `reaction_type` reaction on the shoutout, latest first"""
+    return db.query(models.User).join(models.Reaction, models.Reaction.user_id == models.User.id).filter(
+        models.Reaction.shoutout_id == shoutout.id,
+        models.Reaction.type == reaction_type,
+        models.Reaction.user_id != shoutout.sender_id,
+    ).group_by(models.User.id).order_by(func.max(models.Reaction.id).desc())
+
+def _recount_reaction_notification(db: Session, shoutout: models.ShoutOut, reaction_type: models.ReactionType):
+    # A reaction was taken back: the merged notification counts and names the people still reacting
+    reactors = _reactors(db, shoutout, reaction_type)
+    notifications.recount(
+        db,
+        recipient_id=shoutout.sender_id,
+        type=f"reaction_{reaction_type.value}",
+        action=f"reacted with {reaction_type.value} to your shoutout!",
+        shoutout_id=shoutout.id,
+        actor_count=reactors.count(),
+        sender=reactors.first(),
+    )
+
 @router.post("/{shoutout_id}/comments", response_model=schemas.CommentOut)
 def add_comment(
     shoutout_id: int,
@@ -297,7 +311,6 @@ def add_comment(
             comment_id=new_comment.id,
             type="comment",
             message=f"{current_user.name} commented on your shoutout!",
-            is_read="false"
         )
         db.add(notification)
         db.commit()
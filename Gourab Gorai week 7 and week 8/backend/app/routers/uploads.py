@@ -0,0 +1,167 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from .. import models, schemas
+from ..database import get_db
+from ..deps import get_current_user
+from ..utils import chunked_uploads
+
+# Resumable uploads for large media:
+#   POST   /media/uploads                  {filename, content_type, size} -> session
+#   GET    /media/uploads/{id}             current offset (also in the Upload-Offset header)
+#   PATCH  /media/uploads/{id}             raw bytes, Upload-Offset header = where they start
+#   POST   /media/uploads/{id}/complete    {shoutout_id} -> the pending ShoutOutMedia
+#   DELETE /media/uploads/{id}             cancel
+router = APIRouter(prefix="/media/uploads", tags=["Uploads"])
+
+
+def _http_error(e: chunked_uploads.UploadSessionError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+
+
+def _session_for_chunk(db: Session, upload_id: str, user: models.User, offset: int) -> models.UploadSession:
+    upload = chunked_uploads.get_session(db, upload_id, user)
+    chunked_uploads.check_offset(upload, offset)
+    return upload
+
+
+def _session_out(upload: models.UploadSession, response: Response) -> schemas.UploadSessionOut:
+    response.headers["Upload-Offset"] = str(upload.received)
+    return schemas.UploadSessionOut(
+        id=upload.id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size=upload.size,
+        received=upload.received,
+        max_chunk_size=chunked_uploads.MAX_CHUNK_BYTES,
+        created_at=upload.created_at,
+        updated_at=upload.updated_at,
+    )
+
+
+@router.post("", response_model=schemas.UploadSessionOut, status_code=status.HTTP_201_CREATED)
+def create_upload(
+    body: schemas.UploadSessionCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    try:
+        upload = chunked_uploads.create_session(db, current_user, body.filename, body.content_type, body.size)
+    except chunked_uploads.UploadSessionError as e:
+        raise _http_error(e)
+    return _session_out(upload, response)
+
+
+@router.get("/{upload_id}", response_model=schemas.UploadSessionOut)
+def get_upload(
+    upload_id: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    try:
+        upload = chunked_uploads.get_session(db, upload_id, current_user)
+    except chunked_uploads.UploadSessionError as e:
+        raise _http_error(e)
+    return _session_out(upload, response)
+
+
+@router.patch("/{upload_id}", response_model=schemas.UploadSessionOut)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # This handler is async so it can stream the body; the database calls and
+    # the file writes are blocking and all run in the threadpool
+    try:
+        upload = await run_in_threadpool(_session_for_chunk, db, upload_id, current_user, upload_offset)
+    except chunked_uploads.UploadSessionError as e:
+        raise _http_error(e)
+
+    # The body is streamed straight into the preallocated file instead of
+    # being spooled first; writes are batched
+    limit = chunked_uploads.max_chunk_length(upload, upload_offset)
+    written = 0
+    too_large = False
+    buffer = bytearray()
+    f = await run_in_threadpool(chunked_uploads.open_for_chunk, upload, upload_offset)
+    try:
+        try:
+            async for data in request.stream():
+                if written + len(buffer) + len(data) > limit:
+                    too_large = True
+                    break
+                buffer += data
+                if len(buffer) >= chunked_uploads.WRITE_BUFFER_BYTES:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    written += len(buffer)
+                    buffer.clear()
+        except ClientDisconnect:
+            # Keep whatever arrived; the client resumes from the new offset
+            pass
+        if buffer:
+            await run_in_threadpool(f.write, bytes(buffer))
+            written += len(buffer)
+        await run_in_threadpool(chunked_uploads.sync, f)
+    finally:
+        f.close()
+
+    if written and not await run_in_threadpool(chunked_uploads.advance, db, upload, upload_offset, written):
+        raise HTTPException(
+            status_code=409,
+            detail="Another request uploaded this chunk first",
+            headers={"Upload-Offset": str(upload.received)},
+        )
+    if too_large:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Chunk too large; send at most {limit} bytes from offset {upload.received}",
+            headers={"Upload-Offset": str(upload.received)},
+        )
+    return _session_out(upload, response)
+
+
+@router.post("/{upload_id}/complete", response_model=schemas.ShoutOutMediaOut)
+def complete_upload(
+    upload_id: str,
+    body: schemas.UploadComplete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    try:
+        upload = chunked_uploads.get_session(db, upload_id, current_user)
+    except chunked_uploads.UploadSessionError as e:
+        raise _http_error(e)
+
+    shoutout = db.get(models.ShoutOut, body.shoutout_id)
+    if not shoutout:
+        raise HTTPException(status_code=404, detail="Shoutout not found")
+    if shoutout.sender_id != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only add media to your own shoutouts")
+
+    try:
+        return chunked_uploads.finalize(db, upload, shoutout)
+    except chunked_uploads.UploadSessionError as e:
+        raise _http_error(e)
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    try:
+        upload = chunked_uploads.get_session(db, upload_id, current_user)
+    except chunked_uploads.UploadSessionError as e:
+        raise _http_error(e)
+    chunked_uploads.discard(db, upload)
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
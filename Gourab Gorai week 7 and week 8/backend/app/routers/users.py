@@ -1,42 +1,29 @@
 # backend/app/routers/users.py
-from fastapi import APIRouter, Depends
+import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 
-from .. import schemas, models
-from ..database import get_db
+from .. import schemas, models, unread_counters
+from ..database import SessionLocal, get_db
 from ..deps import get_current_user
+from ..security import decode_access_token
+from ..utils import notifications
+from ..utils.notification_hub import event_stream, notification_hub
 
 # --- Face Detection Setup ---
 import os
 
-try:
-    from ultralytics import YOLO
-except ImportError:
-    YOLO = None
-    print("WARNING: 'ultralytics' library not found. Face detection will be DISABLED.")
-
-# Path to the model file
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "face_model", "final_face_model.pt")
-# Ensure absolute path
-MODEL_PATH = os.path.abspath(MODEL_PATH)
-
-print(f"Loading Face Detection Model from: {MODEL_PATH}")
-face_model = None
+from ..utils import face_detection, image_validation
 
-if YOLO and os.path.exists(MODEL_PATH):
-    try:
-        # Load model ensuring we handle potential issues gracefully
-        # NOTE: Allow unsafe_globals might be needed if trusting this model, 
-        # normally ultralytics handles it.
-        face_model = YOLO(MODEL_PATH)
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        face_model = None
-else:
-    if not YOLO:
-        print("Model check skipped: ultralytics not installed.")
-    else:
-        print("Model file not found.")
+# Only checks that a model is installed; it is loaded by the face detection
+# workers on first use
+face_detection_enabled = face_detection.is_available()
+if not face_detection_enabled:
+    print("WARNING: no face model (onnxruntime or ultralytics) available. Face detection will be DISABLED.")
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -64,9 +51,7 @@ def update_me(
     db.refresh(current_user)
     return current_user
 
-import shutil
 import os
-import uuid
 from fastapi import File, UploadFile, HTTPException
 
 UPLOAD_DIR = "uploads/profile_pics"
@@ -86,77 +71,37 @@ def upload_profile_picture(
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    # Generate unique filename
-    # Save file temporarily for face detection
-    # We used to save directly to final path. Now we save to a temp path first.
-    file_extension = os.path.splitext(file.filename)[1]
-    filename = f"{current_user.id}_{uuid.uuid4()}{file_extension}"
-    
-    # Ensure local directory exists for temp processing
-    # Even if using Cloudinary, we need a physical file for the YOLO model (unless we rewrite it to use streams/bytes, but that's risky)
-    temp_dir = UPLOAD_DIR # "uploads/profile_pics"
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, filename)
-
-    # Save file locally first
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Validate and decode in memory; nothing touches the disk until the image is accepted
+    try:
+        image = image_validation.open_image(file)
+        pixels = image_validation.decode_for_detection(image) if face_detection_enabled else None
+    except image_validation.ImageValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
 
     # --- Face Detection Policy Enforcement ---
-    if face_model:
+    if face_detection_enabled:
         try:
-            # Run inference
-            print(f"Running face detection on: {file_path}")
-            # YOLO expects a file path
-            results = face_model.predict(file_path, conf=0.5, verbose=False)
-            
-            # Count faces
-            face_count = 0
-            for r in results:
-                face_count += len(r.boxes)
-            
+            face_count = face_detection.face_detector.count_faces(pixels)
             print(f"Face count detected: {face_count}")
-
-            if face_count != 1:
-                # Validation failed - Delete file and reject
-                try:
-                    os.remove(file_path)
-                except OSError:
-                    pass 
-                
-                msg = "one single face" if face_count == 0 else "only one face"
-                detail_msg = f"Profile picture rejected. Detected {face_count} faces. Please add an image with a single face."
-                raise HTTPException(status_code=400, detail=detail_msg)
-                
-        except HTTPException as he:
-            raise he
+        except (face_detection.FaceDetectionOverloaded, face_detection.FaceDetectionTimeout) as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
         except Exception as e:
             print(f"Face detection unexpected error: {e}")
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except:
-                pass
             raise HTTPException(status_code=500, detail="Internal error during image validation.")
 
-    # Validation passed. Now handle final storage.
-    # If storage is local, file_path is already in place (uploads/profile_pics/...), we just need the relative URL.
-    # If storage is Cloudinary, we upload it then delete the local file.
-    
+        if face_count != 1:
+            detail_msg = f"Profile picture rejected. Detected {face_count} faces. Please add an image with a single face."
+            raise HTTPException(status_code=400, detail=detail_msg)
+
+    # Validation passed. Write the original bytes once, straight to the final storage.
     from ..utils import storage
-    
+
     try:
-        final_url = storage.upload_local_file(file_path, folder="profile_pics")
-        
-        # If Cloudinary, we should delete the local file now (since it was just temp)
-        # Check if we are using cloudinary by checking the URL or storage type
-        if "http" in final_url and storage.get_storage_type() == "cloudinary":
-            os.remove(file_path)
-            
+        file.file.seek(0)
+        final_url = storage.get_storage().save_upload(
+            file.file, storage.unique_key("profile_pics", file.filename), file.content_type
+        )
     except Exception as e:
-        # If upload fails, clean up local file
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Image storage failed: {str(e)}")
 
     # Update user profile
@@ -201,6 +146,100 @@ def read_my_notifications(
     
     return notifications
 
+@router.get("/me/notifications/unread-count", response_model=schemas.UnreadCountOut)
+def read_my_unread_count(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Maintained counter: one primary-key lookup, no scan of the notifications
+    return {"unread": unread_counters.unread_count(db, current_user.id)}
+
+def _stream_replay(user_id: int, last_event_id: Optional[int]):
+    # Own short session: the stream stays open far longer than a request should hold a connection
+    db = SessionLocal()
+    try:
+        if db.get(models.User, user_id) is None:
+            return None
+        return notifications.replay(db, user_id, last_event_id)
+    finally:
+        db.close()
+
+@router.get("/me/notifications/stream")
+async def stream_my_notifications(
+    request: Request,
+    access_token: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+):
+    """
+    Server-Sent Events stream of new notifications (see utils/notification_hub.py).
+    EventSource cannot set headers, so the token may also be passed as ?access_token=.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        access_token = authorization[7:]
+    # Sent by EventSource when it reconnects, and newer than the one in the URL
+    header_event_id = request.headers.get("last-event-id", "")
+    if header_event_id.isdigit():
+        last_event_id = int(header_event_id)
+
+    user_id = decode_access_token(access_token) if access_token else None
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+
+    # Subscribe before reading the replay so nothing committed in between is missed
+    subscription = notification_hub.subscribe(user_id)
+    try:
+        replay = await run_in_threadpool(_stream_replay, user_id, last_event_id)
+    except Exception:
+        notification_hub.unsubscribe(subscription)
+        raise
+    if replay is None:
+        notification_hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return StreamingResponse(
+        event_stream(subscription, replay),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/me/notifications/read-all")
+def mark_all_notifications_read(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    count = notifications.mark_read(db, current_user.id)
+    db.commit()
+    return {"status": "success", "count": count}
+
+@router.post("/me/notifications/read")
+def mark_notifications_read(
+    body: schemas.NotificationIds,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Ids that are not the user's, or already read, are skipped
+    count = notifications.mark_read(db, current_user.id, body.ids)
+    db.commit()
+    return {"status": "success", "count": count}
+
+@router.delete("/me/notifications")
+def delete_read_notifications(
+    before: datetime.datetime,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Deletes the user's read notifications created before `before` (unread ones are kept)."""
+    if before.tzinfo is not None:
+        # created_at is stored as naive UTC
+        before = before.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    count = notifications.delete_read_before(db, current_user.id, before)
+    db.commit()
+    return {"status": "success", "count": count}
+
 @router.post("/me/notifications/{notification_id}/read")
 def mark_notification_read(
     notification_id: int,
@@ -213,7 +252,7 @@ def mark_notification_read(
     ).first()
     
     if notification:
-        notification.is_read = "true"
+        notification.is_read = True
         db.commit()
         return {"status": "success"}
     return {"status": "not_found"}
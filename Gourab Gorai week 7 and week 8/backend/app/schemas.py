@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Optional
 import enum
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from .models import UserRole, MediaType
 
 class UserBase(BaseModel):
@@ -107,14 +107,39 @@ class ShoutOutOut(BaseModel):
     class Config:
         from_attributes = True
 
+class MediaDerivativeOut(BaseModel):
+    width: int
+    format: str
+    url: str
+
 class ShoutOutMediaOut(BaseModel):
     id: int
     file_path: str
     media_type: MediaType
+    status: Optional[str] = "ready"
+    derivatives: Optional[list[MediaDerivativeOut]] = None
 
     class Config:
         from_attributes = True
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+
+class UploadSessionOut(BaseModel):
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    received: int
+    max_chunk_size: int
+    created_at: datetime
+    updated_at: datetime
+
+class UploadComplete(BaseModel):
+    shoutout_id: int
+
 class ReportCreate(BaseModel):
     reason: str
     shoutout_id: Optional[int] = None
@@ -140,8 +165,21 @@ class NotificationOut(BaseModel):
     comment_id: Optional[int]
     type: str # "tag", "reaction_like", "reaction_clap", "reaction_star", "comment"
     message: str
-    is_read: str
+    is_read: str # "true", "false"
+    actor_count: int = 1 # > 1 when several reactions were merged into this one
     created_at: datetime
 
+    # Stored as a boolean; clients still get the "true" / "false" they always did
+    @field_validator("is_read", mode="before")
+    @classmethod
+    def is_read_as_string(cls, value):
+        return "true" if value in (True, "true") else "false"
+
     class Config:
         from_attributes = True
+
+class UnreadCountOut(BaseModel):
+    unread: int
+
+class NotificationIds(BaseModel):
+    ids: list[int] = Field(..., max_length=1000)
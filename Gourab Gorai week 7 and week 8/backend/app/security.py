@@ -1,4 +1,5 @@
 # backend/app/security.py
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -16,7 +17,22 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # new (no bcrypt dependency, no 72-byte limit problems):
 # We add "bcrypt" to support legacy hashes from the previous version
-pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto")
+#
+# PASSWORD_HASH_ROUNDS sets the pbkdf2 iteration count (0 = passlib's default;
+# see utils/password_hashing.calibrate_rounds). Legacy bcrypt hashes and
+# pbkdf2 hashes with fewer rounds are replaced at the next login by
+# verify_and_update_password; hashes with more rounds are left alone.
+PBKDF2_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+
+
+def build_context(pbkdf2_rounds: int = 0) -> CryptContext:
+    options = {}
+    if pbkdf2_rounds:
+        options = {"pbkdf2_sha256__default_rounds": pbkdf2_rounds, "pbkdf2_sha256__min_rounds": pbkdf2_rounds}
+    return CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto", **options)
+
+
+pwd_context = build_context(PBKDF2_ROUNDS)
 
 
 def hash_password(password: str) -> str:
@@ -27,6 +43,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash); new_hash is None unless the stored hash should be replaced."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def create_access_token(user_id: int) -> str:
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"sub": str(user_id), "exp": expire}
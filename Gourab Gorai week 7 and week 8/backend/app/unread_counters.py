@@ -0,0 +1,117 @@
+"""
+Per-user unread notification counters.
+
+`notification_unread_counts` holds one row per user with the number of unread
+notifications, so the badge is one primary-key lookup instead of a scan of
+the user's notifications. The counters change in the same transaction as the
+notifications themselves:
+
+- notifications added, marked read / unread or deleted through the ORM are
+  picked up after each flush;
+- bulk `query.delete()` calls are captured by counting the unread rows they
+  are about to remove;
+- bulk inserts (utils/notifications.notify) and bulk read-marking call
+  `adjust` themselves, like changefeed.record_inserts.
+
+`rebuild` recomputes every counter from the notifications table; the
+migration script runs it once, and it fixes any drift.
+"""
+from collections import Counter
+from typing import Mapping
+
+from sqlalchemy import delete, event, false, func, inspect, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Notification, NotificationUnreadCount
+
+_upsert_constructs = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def adjust(session: Session, deltas: Mapping[int, int]):
+    """Adds deltas[user_id] to each user's counter, creating missing rows."""
+    rows = [{"user_id": user_id, "unread": delta} for user_id, delta in deltas.items() if user_id and delta]
+    if not rows:
+        return
+    connection = session.connection()
+    table = NotificationUnreadCount.__table__
+    upsert = _upsert_constructs.get(connection.dialect.name)
+    if upsert is None:
+        # No INSERT ... ON CONFLICT: update, then create the rows that were missing
+        for row in rows:
+            result = connection.execute(
+                table.update().where(table.c.user_id == row["user_id"]).values(unread=table.c.unread + row["unread"])
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert(), [row])
+        return
+    statement = upsert(table)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"unread": table.c.unread + statement.excluded.unread},
+        ),
+        rows,
+    )
+
+
+def unread_count(db: Session, user_id: int) -> int:
+    counter = db.get(NotificationUnreadCount, user_id)
+    return max(counter.unread, 0) if counter else 0
+
+
+def rebuild(db: Session) -> int:
+    """Recomputes all counters from the notifications table; returns the number of users with unread ones."""
+    db.execute(delete(NotificationUnreadCount))
+    counts = select(Notification.recipient_id, func.count()).where(
+        Notification.recipient_id.is_not(None),
+        Notification.is_read == false(),
+    ).group_by(Notification.recipient_id)
+    result = db.execute(insert(NotificationUnreadCount).from_select(["user_id", "unread"], counts))
+    return result.rowcount
+
+
+def _after_flush(session: Session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.recipient_id] += 1
+    for obj in session.dirty:
+        if not isinstance(obj, Notification):
+            continue
+        history = inspect(obj).attrs.is_read.history
+        if history.added and history.deleted:
+            was_unread, is_unread = not history.deleted[0], not history.added[0]
+            deltas[obj.recipient_id] += is_unread - was_unread
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.recipient_id] -= 1
+    adjust(session, deltas)
+
+
+def _capture_bulk_deletes(orm_execute_state):
+    if not orm_execute_state.is_delete:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Notification:
+        return
+
+    statement = orm_execute_state.statement
+    query = select(Notification.recipient_id, func.count()).where(Notification.is_read == false())
+    if statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+    session = orm_execute_state.session
+    removed = session.execute(query.group_by(Notification.recipient_id)).all()
+    adjust(session, {recipient_id: -count for recipient_id, count in removed})
+
+
+def register(session_factory=SessionLocal):
+    """Attach the counter listeners to a sessionmaker (idempotent)."""
+    if not event.contains(session_factory, "after_flush", _after_flush):
+        event.listen(session_factory, "after_flush", _after_flush)
+    if not event.contains(session_factory, "do_orm_execute", _capture_bulk_deletes):
+        event.listen(session_factory, "do_orm_execute", _capture_bulk_deletes)
+
+
+register()
@@ -0,0 +1,141 @@
+"""
+Content-addressed bookkeeping for shoutout media.
+
+The media pipeline hashes every spooled upload before sending it anywhere. If
+a blob with the same SHA-256 is already stored, the new ShoutOutMedia row just
+points at it (and at its derivatives) and the upload is skipped entirely. Each
+blob row carries a reference count; when the last media row using it goes
+away, the stored file and its derivatives are deleted from the backend once
+that transaction commits (media_gc sweeps up anything a crash leaves behind).
+
+With local storage blobs are written to uploads/blobs/<ab>/<cdef...><ext>,
+where ab are the first two hex characters of the digest.
+"""
+import hashlib
+import os
+import re
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import storage
+
+CHUNK_SIZE = 1024 * 1024
+_SAFE_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+# session.info key for the files waiting for the commit
+_PENDING_DELETES = "blob_store_pending_deletes"
+
+
+def file_digest(path: str, chunk_size: int = CHUNK_SIZE) -> tuple:
+    """Returns (sha256 hex, size in bytes), reading the file in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def blob_location(digest: str, filename: str) -> tuple:
+    """Returns the (folder, name) a blob is stored under, e.g. ("blobs/ab", "cdef....jpg")."""
+    extension = os.path.splitext(filename)[1].lower()
+    if not _SAFE_EXTENSION.match(extension):
+        extension = ""
+    return f"blobs/{digest[:2]}", digest[2:] + extension
+
+
+def acquire(db: Session, digest: str) -> Optional[models.Blob]:
+    """Takes a reference on an existing blob. Returns None if there is none. Does not commit."""
+    updated = db.query(models.Blob).filter(models.Blob.sha256 == digest).update(
+        {models.Blob.ref_count: models.Blob.ref_count + 1}, synchronize_session=False
+    )
+    if not updated:
+        return None
+    return db.query(models.Blob).filter(models.Blob.sha256 == digest).populate_existing().first()
+
+
+def register(db: Session, digest: str, url: str, size: int, derivatives: Optional[list]) -> models.Blob:
+    """
+    Records a freshly uploaded blob with one reference. If another worker
+    registered the same content in the meantime, a reference is taken on
+    theirs instead and our copy is dropped. Does not commit.
+    """
+    try:
+        with db.begin_nested():
+            blob = models.Blob(sha256=digest, url=url, size=size, ref_count=1, derivatives=derivatives)
+            db.add(blob)
+        return blob
+    except IntegrityError:
+        blob = acquire(db, digest)
+        if blob.url != url:
+            # With local storage both copies land on the same path, so only
+            # remote duplicates are deleted
+            delete_stored(url, derivatives)
+        return blob
+
+
+def delete_stored(url: str, derivatives: Optional[list] = None):
+    storage.delete_file(url)
+    for derivative in derivatives or []:
+        storage.delete_file(derivative["url"])
+
+
+def delete_after_commit(db: Session, url: str, derivatives: Optional[list] = None):
+    """
+    Deletes the stored files once db's transaction commits, and not at all if
+    it rolls back. Files that a blob row points at again by then are kept.
+    """
+    db.info.setdefault(_PENDING_DELETES, []).append((url, derivatives))
+    for name, listener in (("after_commit", _delete_pending), ("after_transaction_end", _drop_pending)):
+        if not event.contains(db, name, listener):
+            event.listen(db, name, listener)
+
+
+def _delete_pending(session: Session):
+    pending = session.info.pop(_PENDING_DELETES, None)
+    if not pending:
+        return
+    # The committed session can't run queries from this hook, so a short-lived one checks
+    # whether a concurrent upload registered the same content again in the meantime
+    with Session(bind=session.get_bind()) as check:
+        in_use = set(check.scalars(select(models.Blob.url).where(models.Blob.url.in_([url for url, _ in pending]))))
+    for url, derivatives in pending:
+        if url in in_use:
+            continue
+        try:
+            delete_stored(url, derivatives)
+        except Exception as e:
+            # Already committed; media_gc removes whatever is left
+            print(f"Could not delete {url}: {e}")
+
+
+def _drop_pending(session: Session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_DELETES, None)
+
+
+def release(db: Session, url: Optional[str]) -> bool:
+    """
+    Drops one reference to the blob stored at `url`; with the last one the
+    stored files are deleted after the caller commits. Returns False, and does
+    nothing, for URLs that are not blobs (media uploaded before the blob store
+    existed). Does not commit.
+    """
+    if not url:
+        return False
+    blob = db.query(models.Blob).filter(models.Blob.url == url).first()
+    if blob is None:
+        return False
+
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        db.delete(blob)
+        delete_after_commit(db, blob.url, blob.derivatives)
+    return True
@@ -0,0 +1,240 @@
+"""
+Resumable chunked uploads for large media (mainly videos).
+
+A client first creates an upload session with the file's total size. The
+target file is preallocated right away, so running out of disk space fails
+at that point instead of halfway through. Chunks are then PATCHed with the
+offset they start at and written straight into place; each request only holds
+a worker for one chunk, and after a dropped connection the client asks for
+the current offset and carries on from there. Once every byte has arrived the
+session is finalized: the file moves into the media pipeline's spool
+directory and is attached to a shoutout as a pending ShoutOutMedia row.
+
+Per-user quotas limit how many sessions can be open at once and how many
+bytes they may reserve in total. Sessions that see no activity for
+CHUNKED_UPLOAD_TTL_HOURS are expired together with their partial files.
+"""
+import datetime
+import errno
+import os
+import shutil
+import uuid
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import media_pipeline
+
+PARTIAL_DIR = os.getenv("CHUNKED_UPLOAD_DIR", "upload_sessions")  # not under /uploads: not served
+MAX_FILE_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+MAX_CHUNK_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_CHUNK_BYTES", str(32 * 1024 ** 2)))
+USER_QUOTA_BYTES = int(os.getenv("CHUNKED_UPLOAD_USER_QUOTA_BYTES", str(4 * 1024 ** 3)))
+USER_MAX_SESSIONS = int(os.getenv("CHUNKED_UPLOAD_USER_MAX_SESSIONS", "3"))
+SESSION_TTL_HOURS = float(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", "24"))
+WRITE_BUFFER_BYTES = 1024 * 1024
+MEDIA_TYPES = {"video/": models.MediaType.VIDEO, "image/": models.MediaType.IMAGE}
+
+
+class UploadSessionError(Exception):
+    def __init__(self, message: str, status_code: int = 400, headers: dict = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers
+
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(PARTIAL_DIR, f"{upload_id}.part")
+
+
+def media_type_for(content_type: str):
+    for prefix, media_type in MEDIA_TYPES.items():
+        if (content_type or "").startswith(prefix):
+            return media_type
+    return None
+
+
+def preallocate(path: str, size: int):
+    """Reserves `size` bytes on disk for the upload."""
+    with open(path, "wb") as f:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError as e:
+                # Some filesystems don't support it; a sparse file still works
+                if e.errno == errno.ENOSPC:
+                    raise
+        f.truncate(size)
+
+
+def expire_stale_sessions(db: Session, now: datetime.datetime = None) -> int:
+    """Deletes sessions idle for longer than SESSION_TTL_HOURS, with their files. Commits."""
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(hours=SESSION_TTL_HOURS)
+    stale = db.query(models.UploadSession).filter(models.UploadSession.updated_at < cutoff).all()
+    for upload in stale:
+        discard(db, upload)
+    if stale:
+        db.commit()
+    return len(stale)
+
+
+def discard(db: Session, upload: models.UploadSession):
+    """Deletes a session and its partial file. Does not commit."""
+    try:
+        os.remove(partial_path(upload.id))
+    except OSError:
+        pass
+    db.delete(upload)
+
+
+def create_session(db: Session, user: models.User, filename: str, content_type: str, size: int) -> models.UploadSession:
+    """Checks the quotas, preallocates the file and records the session. Commits."""
+    if media_type_for(content_type) is None:
+        raise UploadSessionError("Only image and video uploads are supported")
+    if size <= 0:
+        raise UploadSessionError("Upload size must be positive")
+    if size > MAX_FILE_BYTES:
+        raise UploadSessionError(f"File is larger than {MAX_FILE_BYTES // 1024 ** 2} MB", status_code=413)
+
+    expire_stale_sessions(db)
+    open_count, reserved = db.query(
+        func.count(models.UploadSession.id), func.coalesce(func.sum(models.UploadSession.size), 0)
+    ).filter(models.UploadSession.user_id == user.id).one()
+    if open_count >= USER_MAX_SESSIONS:
+        raise UploadSessionError(
+            f"You already have {open_count} uploads in progress; finish or cancel one first", status_code=429
+        )
+    if reserved + size > USER_QUOTA_BYTES:
+        raise UploadSessionError("Upload quota exceeded; finish or cancel other uploads first", status_code=413)
+
+    upload = models.UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        filename=os.path.basename(filename or "upload"),
+        content_type=content_type,
+        size=size,
+        received=0,
+    )
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    try:
+        preallocate(partial_path(upload.id), size)
+    except OSError:
+        try:
+            os.remove(partial_path(upload.id))
+        except OSError:
+            pass
+        raise UploadSessionError("Not enough storage space for this upload", status_code=507)
+
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def get_session(db: Session, upload_id: str, user: models.User) -> models.UploadSession:
+    upload = db.get(models.UploadSession, upload_id)
+    if upload is None or upload.user_id != user.id:
+        raise UploadSessionError("Upload not found", status_code=404)
+    return upload
+
+
+def check_offset(upload: models.UploadSession, offset: int):
+    if offset != upload.received:
+        raise UploadSessionError(
+            f"Upload is at offset {upload.received}, not {offset}",
+            status_code=409,
+            headers={"Upload-Offset": str(upload.received)},
+        )
+
+
+def open_for_chunk(upload: models.UploadSession, offset: int):
+    """Opens the partial file positioned at `offset`."""
+    f = open(partial_path(upload.id), "r+b")
+    f.seek(offset)
+    return f
+
+
+def max_chunk_length(upload: models.UploadSession, offset: int) -> int:
+    return min(MAX_CHUNK_BYTES, upload.size - offset)
+
+
+def sync(f):
+    """Makes sure written bytes are on disk before the offset says they are."""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def advance(db: Session, upload: models.UploadSession, offset: int, written: int) -> bool:
+    """
+    Moves the session's offset forward once the bytes are on disk. Uses a
+    compare-and-set on the old offset, so of two requests racing for the
+    same chunk only one wins. Commits.
+    """
+    updated = db.query(models.UploadSession).filter(
+        models.UploadSession.id == upload.id, models.UploadSession.received == offset
+    ).update(
+        {models.UploadSession.received: offset + written, models.UploadSession.updated_at: datetime.datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.commit()
+    db.refresh(upload)
+    return updated > 0
+
+
+def claim(db: Session, upload: models.UploadSession) -> bool:
+    """
+    Takes a complete session for finalizing by deleting its row, with the same
+    compare-and-set as advance(): of two requests completing the same upload
+    only one gets True, and only that one touches the file. Commits.
+    """
+    claimed = db.query(models.UploadSession).filter(
+        models.UploadSession.id == upload.id, models.UploadSession.received == upload.size
+    ).delete(synchronize_session=False)
+    db.commit()
+    return claimed > 0
+
+
+def finalize(db: Session, upload: models.UploadSession, shoutout: models.ShoutOut) -> models.ShoutOutMedia:
+    """
+    Moves a complete upload into the spool directory, attaches it to the
+    shoutout as pending media and hands it to the media pipeline. Commits.
+    """
+    if upload.received < upload.size:
+        raise UploadSessionError(
+            f"Upload is incomplete ({upload.received} of {upload.size} bytes)",
+            status_code=409,
+            headers={"Upload-Offset": str(upload.received)},
+        )
+
+    # The row is gone once claimed, so keep what is needed from it
+    fields = {column.key: getattr(upload, column.key) for column in models.UploadSession.__table__.columns}
+    if not claim(db, upload):
+        raise UploadSessionError("Upload is already being completed", status_code=409)
+    db.expunge(upload)
+
+    os.makedirs(media_pipeline.SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(fields["filename"])[1]
+    spooled_name = f"{uuid.uuid4()}{extension}"
+    try:
+        shutil.move(partial_path(fields["id"]), os.path.join(media_pipeline.SPOOL_DIR, spooled_name))
+    except OSError:
+        # Put the session back so the client can retry
+        db.add(models.UploadSession(**fields))
+        db.commit()
+        raise
+    spooled_url = f"/uploads/spool/{spooled_name}"
+
+    media = models.ShoutOutMedia(
+        shoutout_id=shoutout.id,
+        file_path=spooled_url,
+        media_type=media_type_for(fields["content_type"]),
+        status="pending",
+    )
+    db.add(media)
+    db.commit()
+    db.refresh(media)
+
+    media_pipeline.pipeline.enqueue(media.id, spooled_url, folder="shoutouts")
+    return media
@@ -0,0 +1,62 @@
+import csv
+import io
+
+from ..database import SessionLocal
+
+# Flush the buffer to the client once it holds roughly this many characters.
+CHUNK_SIZE = 64 * 1024
+# Rows fetched per round-trip from the server-side cursor.
+BATCH_SIZE = 1000
+
+
+def _drain(buffer: io.StringIO) -> str:
+    """Returns the buffered text and empties the buffer so it can be reused."""
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return chunk
+
+
+def iter_csv(header, rows, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields CSV text in chunks of about `chunk_size` characters.
+
+    The header is yielded on its own straight away so the client gets the first
+    bytes before the first row has been fetched. A single small buffer is reused
+    for every chunk, so memory does not grow with the number of rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield _drain(buffer)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield _drain(buffer)
+
+    tail = _drain(buffer)
+    if tail:
+        yield tail
+
+
+def stream_query_csv(stmt, header, batch_size: int = BATCH_SIZE, chunk_size: int = CHUNK_SIZE):
+    """
+    Runs `stmt` with a server-side cursor and yields it as CSV chunks. The
+    header goes out before the query runs, so a slow query doesn't keep the
+    client waiting for the first byte.
+
+    The generator owns its session because StreamingResponse keeps iterating
+    after the request's own dependencies have been torn down.
+    """
+    db = SessionLocal()
+    try:
+        yield from iter_csv(header, _execute(db, stmt, batch_size), chunk_size=chunk_size)
+    finally:
+        db.close()
+
+
+def _execute(db, stmt, batch_size: int):
+    # A generator, so the statement only runs once iter_csv asks for the first row
+    yield from db.execute(stmt.execution_options(yield_per=batch_size))
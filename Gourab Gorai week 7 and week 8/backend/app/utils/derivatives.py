@@ -0,0 +1,135 @@
+"""
+Resized copies of uploaded images for the feed.
+
+For every stored image we keep the original plus WebP and JPEG versions at a
+few widths, written next to it as `<name>_w<width>.<ext>`. The feed picks the
+smallest one that fits (e.g. via <img srcset>) instead of downloading an 8 MB
+phone photo. Cloudinary images are resized by Cloudinary itself, so for those
+only the transformation URLs are built.
+"""
+import os
+import uuid
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import storage
+
+WIDTHS = (320, 640, 1280)
+FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp"}
+EXIF_ORIENTATION = 0x0112
+# Orientations that turn the stored image by 90 degrees
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def derivative_path(source_path: str, width: int, extension: str) -> str:
+    stem = os.path.splitext(source_path)[0]
+    return f"{stem}_w{width}.{extension}"
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """JPEG has no alpha channel; put transparent images on white."""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_derivatives(source_path: str, widths=WIDTHS) -> list:
+    """
+    Writes the resized copies of a local image and returns them as
+    [{"width", "format", "path"}], smallest first.
+
+    Widths at or above the original's are skipped (never upscale), as are
+    animated images, whose frames would be lost. Returns [] for files that
+    are not images.
+    """
+    try:
+        image = Image.open(source_path)
+    except (UnidentifiedImageError, OSError):
+        return []
+
+    with image:
+        if getattr(image, "is_animated", False):
+            return []
+
+        # Widths refer to the image as displayed, i.e. after exif_transpose
+        transposed = image.getexif().get(EXIF_ORIENTATION, 1) in TRANSPOSED_ORIENTATIONS
+        display_width = image.height if transposed else image.width
+        widths = sorted((w for w in widths if w < display_width), reverse=True)
+        if not widths:
+            return []
+
+        # Let the JPEG decoder downscale while decoding when it can; draft()
+        # works on the stored, not yet rotated, image
+        image.draft("RGB", (1, widths[0]) if transposed else (widths[0], 1))
+        current = _flatten(ImageOps.exif_transpose(image))
+
+        derivatives = []
+        for width in widths:
+            # Each size is resized from the previous, larger one: cheaper than
+            # going back to the original every time
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.LANCZOS)
+
+            for extension, pil_format, options in FORMATS:
+                target = derivative_path(source_path, width, extension)
+                # Unique temp name: identical uploads may be processed at the same time
+                tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+                current.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, target)
+                derivatives.append({"width": width, "format": extension, "path": target})
+
+    derivatives.sort(key=lambda d: (d["width"], d["format"]))
+    return derivatives
+
+
+def cloudinary_derivatives(url: str, widths=WIDTHS) -> list:
+    """Builds on-the-fly Cloudinary transformation URLs for the same widths."""
+    if "/upload/" not in url:
+        return []
+    prefix, rest = url.split("/upload/", 1)
+    derivatives = [
+        {
+            "width": width,
+            "format": extension,
+            "url": f"{prefix}/upload/c_limit,w_{width},f_{extension},q_auto/{rest}",
+        }
+        for width in widths
+        for extension, _, _ in FORMATS
+    ]
+    derivatives.sort(key=lambda d: (d["width"], d["format"]))
+    return derivatives
+
+
+def build_derivatives(file_url: str) -> list:
+    """
+    Returns [{"width", "format", "url"}] for a stored image URL, generating
+    the files for images that live under /uploads.
+    """
+    if os.path.splitext(file_url.split("?")[0])[1].lower() not in IMAGE_EXTENSIONS:
+        return []
+    if "cloudinary.com" in file_url:
+        return cloudinary_derivatives(file_url)
+
+    # Generated from a local copy (the file itself for local storage) and
+    # stored next to the original: <key stem>_w<width>.<ext>
+    backend = storage.backend_for(file_url)
+    if backend is None:
+        return []
+    stem = os.path.splitext(backend.key_for_url(file_url))[0]
+    with backend.local_copy(file_url) as source_path:
+        return [
+            {
+                "width": d["width"],
+                "format": d["format"],
+                "url": backend.save_file(d["path"], f"{stem}_w{d['width']}.{d['format']}"),
+            }
+            for d in generate_derivatives(source_path)
+        ]
+
@@ -0,0 +1,254 @@
+"""
+Face detection for profile pictures, served from a separate process pool.
+
+The YOLO model lives only in the worker processes, so inference never runs on
+(or holds the GIL of) the API process. Requests that arrive within a few
+milliseconds of each other are grouped into one `predict` call, which is much
+cheaper per image than running them one by one. Waiting requests sit in a
+bounded queue; when it is full new requests are rejected straight away instead
+of piling up behind a slow model.
+
+Nothing is imported or loaded until the first profile picture arrives (or
+`warm_up()` is called). With FACE_DETECTION_BACKEND=auto an exported
+final_face_model.onnx is preferred over the PyTorch weights when
+onnxruntime is installed, which avoids loading torch in the workers at all.
+"""
+import importlib.util
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "face_model"))
+MODEL_PATH = os.path.join(MODEL_DIR, "final_face_model.pt")
+ONNX_MODEL_PATH = os.getenv("FACE_DETECTION_ONNX_MODEL", os.path.join(MODEL_DIR, "final_face_model.onnx"))
+CONFIDENCE = 0.5
+
+BACKEND = os.getenv("FACE_DETECTION_BACKEND", "auto")  # "auto", "onnx" or "torch"
+
+WORKERS = int(os.getenv("FACE_DETECTION_WORKERS", "1"))
+MAX_BATCH_SIZE = int(os.getenv("FACE_DETECTION_MAX_BATCH", "8"))
+# How long the first request of a batch waits for company
+BATCH_WINDOW_SECONDS = float(os.getenv("FACE_DETECTION_BATCH_WINDOW_MS", "5")) / 1000
+MAX_QUEUE_SIZE = int(os.getenv("FACE_DETECTION_MAX_QUEUE", "32"))
+TIMEOUT_SECONDS = float(os.getenv("FACE_DETECTION_TIMEOUT", "10"))
+
+
+class FaceDetectionOverloaded(Exception):
+    """Raised when the request queue is full."""
+
+
+class FaceDetectionTimeout(Exception):
+    """Raised when a request did not get a result in time."""
+
+
+def resolve_backend(backend: str = BACKEND):
+    """
+    Picks the backend and model file to use, as (backend, path), or None.
+
+    Only checks that the packages are installed; importing them is left to
+    the worker processes.
+    """
+    if backend in ("auto", "onnx") and importlib.util.find_spec("onnxruntime") and os.path.exists(ONNX_MODEL_PATH):
+        return "onnx", ONNX_MODEL_PATH
+    if backend in ("auto", "torch") and importlib.util.find_spec("ultralytics") and os.path.exists(MODEL_PATH):
+        return "torch", MODEL_PATH
+    return None
+
+
+def is_available(backend: str = BACKEND) -> bool:
+    return resolve_backend(backend) is not None
+
+
+def load_model(backend: str, model_path: str):
+    if backend == "onnx":
+        from .face_onnx import OnnxFaceModel
+        return OnnxFaceModel(model_path)
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+
+# --- Worker process side ---
+
+_worker_model = None
+
+
+def _init_worker(backend: str, model_path: str):
+    global _worker_model
+    _worker_model = load_model(backend, model_path)
+
+
+def predict_face_counts(model, images, conf: float = CONFIDENCE, device: str = "cpu"):
+    """
+    Runs one batched prediction and returns the face count for each image.
+
+    `images` may mix file paths and RGB uint8 arrays.
+    """
+    if hasattr(model, "count_faces"):
+        return model.count_faces(list(images), conf)
+    # ultralytics reads arrays as OpenCV-style BGR
+    sources = [image[..., ::-1] if hasattr(image, "shape") else image for image in images]
+    results = model.predict(sources, conf=conf, device=device, verbose=False)
+    return [len(r.boxes) for r in results]
+
+
+def _predict_batch(images, conf: float):
+    return predict_face_counts(_worker_model, images, conf)
+
+
+def _warm_up_worker(conf: float):
+    import numpy as np
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    return predict_face_counts(_worker_model, [blank], conf)
+
+
+# --- API process side ---
+
+class FaceDetectionService:
+    def __init__(self, backend: str = BACKEND, model_path: str = None, workers: int = WORKERS,
+                 max_batch_size: int = MAX_BATCH_SIZE, batch_window: float = BATCH_WINDOW_SECONDS,
+                 max_queue_size: int = MAX_QUEUE_SIZE, timeout: float = TIMEOUT_SECONDS,
+                 conf: float = CONFIDENCE):
+        self.backend = backend
+        self.model_path = model_path
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.conf = conf
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        # At most one batch queued behind each busy worker
+        self._in_flight = threading.BoundedSemaphore(workers * 2)
+        self._executor = None
+        self._dispatcher = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if self.model_path is None:
+                    resolved = resolve_backend(self.backend)
+                    if resolved is None:
+                        raise RuntimeError(f"No face detection model available for backend '{self.backend}'")
+                    self.backend, self.model_path = resolved
+                # spawn, not fork: the API process has threads and possibly torch state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.backend, self.model_path),
+                )
+            return self._executor
+
+    def _start(self):
+        self._get_executor()
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name="face-detection-dispatch", daemon=True
+                )
+                self._dispatcher.start()
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        # A crashed worker breaks the whole pool; the next batch gets a fresh one
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Starts the workers and runs one tiny inference in each, without waiting."""
+        self._start()
+        executor = self._get_executor()
+        return [executor.submit(_warm_up_worker, self.conf) for _ in range(self.workers)]
+
+    def count_faces(self, image) -> int:
+        """Blocks until the face count for `image` (a path or an RGB array) is known."""
+        self._start()
+        future = Future()
+        try:
+            self._queue.put_nowait((image, future, time.monotonic() + self.timeout))
+        except queue.Full:
+            raise FaceDetectionOverloaded("Face detection is busy, please try again shortly")
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise FaceDetectionTimeout("Face detection timed out")
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return None
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # Skip requests whose caller already gave up
+            now = time.monotonic()
+            live = [item for item in batch if item[2] > now and item[1].set_running_or_notify_cancel()]
+            if not live:
+                continue
+
+            self._in_flight.acquire()
+            executor = self._get_executor()
+            try:
+                batch_future = executor.submit(_predict_batch, [item[0] for item in live], self.conf)
+            except Exception as e:
+                self._in_flight.release()
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_executor(executor)
+                for _, future, _ in live:
+                    future.set_exception(e)
+                continue
+            batch_future.add_done_callback(
+                lambda f, live=live, executor=executor: self._resolve(live, f, executor)
+            )
+
+    def _resolve(self, live, batch_future, executor):
+        self._in_flight.release()
+        try:
+            counts = batch_future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor(executor)
+            for _, future, _ in live:
+                future.set_exception(e)
+            return
+        for (_, future, _), count in zip(live, counts):
+            future.set_result(count)
+
+    def shutdown(self):
+        with self._lock:
+            dispatcher, self._dispatcher = self._dispatcher, None
+            executor, self._executor = self._executor, None
+        if dispatcher is not None:
+            self._queue.put(None)
+            dispatcher.join(timeout=5)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+face_detector = FaceDetectionService()
@@ -0,0 +1,93 @@
+"""
+Face detection with ONNX Runtime on the CPU, without torch or ultralytics.
+
+Expects the face model exported with `scripts/export_face_model_onnx.py`
+(a YOLOv8 detection head with a single "face" class). Pre- and post-processing
+follow what ultralytics does for `predict`: letterbox to the model input size,
+drop boxes under the confidence threshold, then non-maximum suppression, so
+`count_faces` returns the same number of boxes as `len(result.boxes)`.
+"""
+import numpy as np
+from PIL import Image
+
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+PAD_COLOR = (114, 114, 114)
+
+
+def letterbox(image: Image.Image, size: int) -> np.ndarray:
+    """Resizes keeping the aspect ratio and pads to size x size. Returns CHW float32 in [0, 1]."""
+    image = image.convert("RGB")
+    scale = min(size / image.width, size / image.height)
+    new_w, new_h = round(image.width * scale), round(image.height * scale)
+    resized = image.resize((new_w, new_h), Image.BILINEAR)
+
+    canvas = Image.new("RGB", (size, size), PAD_COLOR)
+    canvas.paste(resized, ((size - new_w) // 2, (size - new_h) // 2))
+    return np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = IOU_THRESHOLD):
+    """Greedy NMS over xyxy boxes. Returns the indices that survive, best first."""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size and len(keep) < MAX_DETECTIONS:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+def count_detections(output: np.ndarray, conf: float, iou_threshold: float = IOU_THRESHOLD) -> int:
+    """Counts boxes in one image's raw output, shaped (4 + classes, anchors)."""
+    scores = output[4:].max(axis=0)
+    mask = scores > conf
+    if not mask.any():
+        return 0
+
+    cx, cy, w, h = output[:4, mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return len(non_max_suppression(boxes, scores[mask], iou_threshold))
+
+
+class OnnxFaceModel:
+    def __init__(self, model_path: str, threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else 640
+        # Models exported without dynamic=True only take one image at a time
+        self.max_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def _load(self, source) -> np.ndarray:
+        if isinstance(source, np.ndarray):
+            source = Image.fromarray(source)
+        elif not isinstance(source, Image.Image):
+            with Image.open(source) as image:
+                return letterbox(image, self.input_size)
+        return letterbox(source, self.input_size)
+
+    def count_faces(self, sources, conf: float) -> list:
+        """Face count for each image path (or PIL image / HWC array) in `sources`."""
+        images = [self._load(source) for source in sources]
+        step = self.max_batch or len(images) or 1
+
+        counts = []
+        for i in range(0, len(images), step):
+            outputs = self.session.run(None, {self.input_name: np.stack(images[i:i + step])})[0]
+            counts.extend(count_detections(output, conf) for output in outputs)
+        return counts
@@ -0,0 +1,76 @@
+"""
+Cheap checks and a single decode for uploaded images, all in memory.
+
+The upload is never written to disk for validation: the size is checked from
+the request, the image header is read straight from the spooled upload to
+reject decompression bombs before any pixels are decoded, and the pixels are
+then decoded once, at a reduced size, into the array the face detector gets.
+"""
+import os
+
+import numpy as np
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP"}
+# The detector letterboxes to 640px anyway, so there is no point decoding more
+DETECTION_MAX_SIDE = 1280
+
+
+class ImageValidationError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    current = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(current)
+    return size
+
+
+def open_image(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, max_pixels: int = MAX_PIXELS) -> Image.Image:
+    """
+    Opens the upload without decoding it and applies the size guards.
+
+    Only the header is parsed here, so an image that claims to be
+    50000x50000 is rejected after reading a few bytes.
+    """
+    if upload_size(file) > max_bytes:
+        raise ImageValidationError(f"Image is larger than {max_bytes // (1024 * 1024)} MB", status_code=413)
+
+    file.file.seek(0)
+    try:
+        image = Image.open(file.file)
+    except Image.DecompressionBombError:
+        raise ImageValidationError("Image has too many pixels", status_code=413)
+    except (UnidentifiedImageError, OSError):
+        raise ImageValidationError("File is not a valid image")
+
+    if image.format not in ALLOWED_FORMATS:
+        raise ImageValidationError(f"Unsupported image format: {image.format}")
+    if image.width * image.height > max_pixels:
+        raise ImageValidationError(
+            f"Image is too large ({image.width}x{image.height}); the limit is {max_pixels:,} pixels",
+            status_code=413,
+        )
+    return image
+
+
+def decode_for_detection(image: Image.Image, max_side: int = DETECTION_MAX_SIDE) -> np.ndarray:
+    """Decodes once into an RGB uint8 array no larger than max_side on either edge."""
+    try:
+        # For JPEGs this makes the decoder itself downscale, skipping most of the work
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side))
+        return np.asarray(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ImageValidationError("File is not a valid image")
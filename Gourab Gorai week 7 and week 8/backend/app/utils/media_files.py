@@ -0,0 +1,84 @@
+"""
+Serving of the /uploads mount.
+
+Stored media never changes in place: uploads get a fresh UUID name, and blobs
+(see blob_store.py) are named after the SHA-256 of their content. Responses can
+therefore be cached for a year as `immutable`, so browsers stop revalidating
+every image on each feed render.
+
+- Blobs and their derivatives get a strong ETag built from the digest in
+  their path; older uploads keep Starlette's mtime/size ETag.
+- Range requests (video seeking) are answered by FileResponse.
+- MEDIA_ACCEL_MODE=nginx returns an X-Accel-Redirect to MEDIA_ACCEL_PREFIX +
+  the file's path, and MEDIA_ACCEL_MODE=sendfile returns X-Sendfile with the
+  absolute path (Apache mod_xsendfile, lighttpd). The front proxy then sends
+  the bytes, including ranges, and Python only produces the headers.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ACCEL_MODE = os.getenv("MEDIA_ACCEL_MODE", "").lower()  # "", "nginx" or "sendfile"
+ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-uploads/")
+
+# blobs/ab/<62 hex>.jpg, or a derivative of it: blobs/ab/<62 hex>_w320.webp
+_BLOB_PATH = re.compile(r"(?:^|/)blobs/([0-9a-f]{2})/([0-9a-f]{62})(?:(_w\d+\.[a-z0-9]+)|\.[a-z0-9]{1,10})?$")
+
+
+def content_etag(relative_path: str):
+    """Strong ETag for content-addressed files, None for anything else."""
+    match = _BLOB_PATH.search(relative_path)
+    if not match:
+        return None
+    return f'"{match.group(1)}{match.group(2)}{match.group(3) or ""}"'
+
+
+def stat_etag(stat_result: os.stat_result) -> str:
+    """Same ETag FileResponse would send, for responses without a body."""
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+class MediaFiles(StaticFiles):
+    def __init__(self, *args, accel_mode: str = ACCEL_MODE, accel_prefix: str = ACCEL_PREFIX, **kwargs):
+        super().__init__(*args, **kwargs)
+        if accel_mode not in ("", "nginx", "sendfile"):
+            raise ValueError(f"Unknown MEDIA_ACCEL_MODE: {accel_mode}")
+        self.accel_mode = accel_mode
+        self.accel_prefix = accel_prefix.rstrip("/") + "/"
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+
+        headers = {"cache-control": IMMUTABLE_CACHE_CONTROL}
+        etag = content_etag(relative_path)
+        if etag:
+            headers["etag"] = etag
+
+        if self.accel_mode:
+            response = self.accel_response(full_path, relative_path, stat_result, headers, status_code)
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def accel_response(self, full_path, relative_path: str, stat_result, headers: dict, status_code: int) -> Response:
+        headers.setdefault("etag", stat_etag(stat_result))
+        headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        if self.accel_mode == "nginx":
+            headers["x-accel-redirect"] = self.accel_prefix + quote(relative_path)
+        else:
+            headers["x-sendfile"] = os.path.abspath(full_path)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,225 @@
+"""
+Mark-and-sweep garbage collection for stored media.
+
+Rows get deleted without their files in a few places (reported shoutouts,
+media uploaded before the blob store, uploads that crashed halfway), so files
+pile up under uploads/ and in Cloudinary. The collector:
+
+1. marks: streams every media URL the database still references (profile
+   pictures, shoutout media and their derivatives, blobs) into a set;
+2. sweeps: walks uploads/ with os.scandir in batches, and optionally lists
+   the Cloudinary folder page by page, and removes or quarantines whatever
+   is unreferenced and older than the grace period.
+
+The grace period protects uploads that are written before their row is
+committed. Removals go through a rate limiter, and the walk pauses between
+batches, so a sweep doesn't saturate disk I/O or the Cloudinary API.
+"""
+import datetime
+import os
+import shutil
+import time
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import storage
+
+UPLOAD_ROOT = "uploads"
+QUARANTINE_DIR = "media_quarantine"  # outside uploads/, so quarantined files aren't served
+GRACE_HOURS = float(os.getenv("MEDIA_GC_GRACE_HOURS", "24"))
+CLOUDINARY_PREFIX = "bragboard/"
+MODES = ("report", "quarantine", "delete")
+
+
+class RateLimiter:
+    """Lets at most `rate` operations through per second; 0 means unlimited."""
+
+    def __init__(self, rate: float, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self._next = clock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = self.clock()
+        if self._next > now:
+            self.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+class SweepStats:
+    def __init__(self):
+        self.scanned = 0
+        self.orphaned = 0
+        self.removed = 0
+        self.recent = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def __str__(self):
+        return (f"scanned {self.scanned}, orphaned {self.orphaned} ({self.bytes / 1024 ** 2:.1f} MB), "
+                f"removed {self.removed}, too recent {self.recent}, errors {self.errors}")
+
+
+def referenced_urls(db: Session, page_size: int = 1000):
+    """Streams every media URL referenced by the database."""
+    pictures = db.query(models.User.profile_picture).filter(models.User.profile_picture.isnot(None))
+    for (url,) in pictures.yield_per(page_size):
+        yield url
+
+    for model, column in ((models.ShoutOutMedia, models.ShoutOutMedia.file_path), (models.Blob, models.Blob.url)):
+        for url, media_derivatives in db.query(column, model.derivatives).yield_per(page_size):
+            yield url
+            for derivative in media_derivatives or []:
+                yield derivative.get("url")
+
+
+def mark(db: Session):
+    """Returns (referenced paths relative to uploads/, referenced Cloudinary public_ids)."""
+    local, remote = set(), set()
+    for url in referenced_urls(db):
+        if not url:
+            continue
+        if "cloudinary.com" in url:
+            public_id, _ = storage.cloudinary_public_id(url)
+            if public_id:
+                remote.add(public_id)
+        elif url.startswith("/uploads/"):
+            local.add(url[len("/uploads/"):])
+    return local, remote
+
+
+def scan_files(root: str, batch_size: int = 500):
+    """Walks `root` with os.scandir, yielding lists of at most batch_size file entries."""
+    pending = [root]
+    batch = []
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        batch.append(entry)
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+        except FileNotFoundError:
+            continue  # removed while we were walking
+    if batch:
+        yield batch
+
+
+def sweep_local(referenced: set, root: str = UPLOAD_ROOT, mode: str = "report", grace_hours: float = GRACE_HOURS,
+                rate: float = 50, batch_size: int = 500, pause: float = 0.05,
+                quarantine_dir: str = QUARANTINE_DIR, now: float = None) -> SweepStats:
+    """Removes (mode="delete"), moves (mode="quarantine") or lists unreferenced files under root."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    cutoff = (now or time.time()) - grace_hours * 3600
+    quarantine_root = os.path.join(quarantine_dir, datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S"))
+    limiter = RateLimiter(rate)
+    stats = SweepStats()
+
+    for batch in scan_files(root, batch_size):
+        for entry in batch:
+            stats.scanned += 1
+            relative_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            if relative_path in referenced or entry.name.startswith("."):
+                continue
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat_result.st_mtime > cutoff:
+                stats.recent += 1
+                continue
+
+            stats.orphaned += 1
+            stats.bytes += stat_result.st_size
+            if mode == "report":
+                print(f"orphan: {relative_path}")
+                continue
+
+            limiter.wait()
+            try:
+                if mode == "delete":
+                    os.remove(entry.path)
+                else:
+                    target = os.path.join(quarantine_root, relative_path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(entry.path, target)
+                stats.removed += 1
+            except OSError as e:
+                stats.errors += 1
+                print(f"Could not remove {relative_path}: {e}")
+        if pause:
+            time.sleep(pause)
+    return stats
+
+
+def sweep_cloudinary(referenced: set, mode: str = "report", grace_hours: float = GRACE_HOURS, rate: float = 2,
+                     prefix: str = CLOUDINARY_PREFIX, api=None, uploader=None, now: datetime.datetime = None) -> SweepStats:
+    """
+    Same as sweep_local for the Cloudinary folder. Listing and deletes use the
+    Admin API, which is rate limited per hour, so deletes go out in batches
+    of 100 public_ids and `rate` is in API calls per second. Quarantine
+    renames assets under "<prefix>quarantine/".
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if api is None:
+        import cloudinary.api as api
+    uploader = uploader or storage.cloudinary.uploader
+    cutoff = (now or datetime.datetime.utcnow()) - datetime.timedelta(hours=grace_hours)
+    quarantine_prefix = f"{prefix}quarantine/"
+    limiter = RateLimiter(rate)
+    stats = SweepStats()
+
+    for resource_type in ("image", "video", "raw"):
+        cursor = None
+        while True:
+            limiter.wait()
+            page = api.resources(type="upload", resource_type=resource_type, prefix=prefix,
+                                 max_results=500, next_cursor=cursor)
+            orphans = []
+            for resource in page.get("resources", []):
+                stats.scanned += 1
+                public_id = resource["public_id"]
+                if public_id in referenced or public_id.startswith(quarantine_prefix):
+                    continue
+                created_at = datetime.datetime.strptime(resource["created_at"], "%Y-%m-%dT%H:%M:%SZ")
+                if created_at > cutoff:
+                    stats.recent += 1
+                    continue
+                stats.orphaned += 1
+                stats.bytes += resource.get("bytes", 0)
+                orphans.append(public_id)
+
+            if mode == "report":
+                for public_id in orphans:
+                    print(f"orphan: {resource_type}/{public_id}")
+            elif mode == "delete":
+                for i in range(0, len(orphans), 100):
+                    limiter.wait()
+                    api.delete_resources(orphans[i:i + 100], resource_type=resource_type)
+                    stats.removed += len(orphans[i:i + 100])
+            else:
+                for public_id in orphans:
+                    limiter.wait()
+                    try:
+                        uploader.rename(public_id, quarantine_prefix + public_id, resource_type=resource_type)
+                        stats.removed += 1
+                    except Exception as e:
+                        stats.errors += 1
+                        print(f"Could not quarantine {public_id}: {e}")
+
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+    return stats
@@ -0,0 +1,204 @@
+"""
+Background media uploads for shoutouts.
+
+create_shoutout only spools each upload to uploads/spool/ and commits a
+ShoutOutMedia row with status "pending" pointing at the spooled copy (which is
+already servable through the /uploads mount). A worker pool then pushes the
+files to the configured storage backend concurrently, retries failures with
+exponential backoff, and patches the row with the final URL and the resized
+derivatives of images (see derivatives.py).
+
+Uploads are deduplicated by content (see blob_store.py): a file whose SHA-256
+is already stored is not uploaded again, the row just reuses the stored URL.
+spool_upload hashes the file while writing it; only spool files that come
+from elsewhere (chunked uploads, restarts) are read a second time to hash.
+"""
+import hashlib
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import UploadFile
+
+from ..database import SessionLocal
+from .. import models
+from . import blob_store, derivatives, storage
+
+SPOOL_DIR = os.path.join("uploads", "spool")
+MAX_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", "4"))
+MAX_ATTEMPTS = int(os.getenv("MEDIA_UPLOAD_MAX_ATTEMPTS", "5"))
+BACKOFF_SECONDS = float(os.getenv("MEDIA_UPLOAD_BACKOFF", "1.0"))
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def spool_upload(file: UploadFile) -> tuple:
+    """
+    Streams an upload into the spool directory, hashing it on the way.
+    Returns (/uploads URL, sha256 hex, size in bytes).
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(file.filename or "")[1]
+    unique_name = f"{uuid.uuid4()}{extension}"
+
+    digest = hashlib.sha256()
+    size = 0
+    file.file.seek(0)
+    with open(os.path.join(SPOOL_DIR, unique_name), "wb") as buffer:
+        while True:
+            chunk = file.file.read(blob_store.CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            buffer.write(chunk)
+            size += len(chunk)
+
+    return f"/uploads/spool/{unique_name}", digest.hexdigest(), size
+
+
+def local_path(url: str) -> str:
+    """Maps an /uploads/... URL back to its path on disk."""
+    return url.lstrip("/").replace("/", os.sep)
+
+
+def upload_spooled_file(spool_file: str, folder: str, filename: str = None) -> str:
+    """Moves a spooled file to its final home and returns the URL to store."""
+    key = f"{folder}/{filename}" if filename else storage.unique_key(folder, spool_file)
+    return storage.get_storage().save_file(spool_file, key)
+
+
+def upload_with_retry(spool_file: str, folder: str, max_attempts: int = MAX_ATTEMPTS,
+                      backoff: float = BACKOFF_SECONDS, sleep=time.sleep, filename: str = None) -> str:
+    """Retries upload_spooled_file with exponential backoff and jitter."""
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return upload_spooled_file(spool_file, folder, filename)
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            delay = min(BACKOFF_MAX_SECONDS, backoff * (2 ** (attempt - 1)))
+            delay = delay * (0.5 + random.random() / 2)
+            print(f"Media upload attempt {attempt} for {spool_file} failed: {e}. Retrying in {delay:.1f}s")
+            sleep(delay)
+
+
+class MediaUploadPipeline:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_attempts: int = MAX_ATTEMPTS,
+                 backoff: float = BACKOFF_SECONDS, session_factory=SessionLocal):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.session_factory = session_factory
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="media-upload")
+        return self._executor
+
+    def enqueue(self, media_id: int, spooled_url: str, folder: str = "shoutouts", digest: str = None, size: int = None):
+        """
+        Schedules a pending media row for upload. Call after the row is committed.
+        Pass the digest and size from spool_upload when known; otherwise the
+        spool file is hashed by the worker.
+        """
+        return self._get_executor().submit(self._process, media_id, spooled_url, folder, digest, size)
+
+    def _reuse_blob(self, digest: str):
+        """Takes a reference on an already stored copy; returns (url, derivatives) or None."""
+        db = self.session_factory()
+        try:
+            blob = blob_store.acquire(db, digest)
+            if blob is None:
+                return None
+            reused = (blob.url, blob.derivatives)
+            db.commit()
+            return reused
+        finally:
+            db.close()
+
+    def _process(self, media_id: int, spooled_url: str, folder: str, digest: str = None, size: int = None):
+        spool_file = local_path(spooled_url)
+        try:
+            if digest is None:
+                digest, size = blob_store.file_digest(spool_file)
+            reused = self._reuse_blob(digest)
+        except Exception as e:
+            print(f"Media {media_id}: could not read {spool_file}: {e}")
+            digest, reused = None, None
+
+        final_url, media_derivatives = None, None
+        status = "failed"
+        if reused:
+            final_url, media_derivatives = reused
+            status = "ready"
+            try:
+                os.remove(spool_file)
+            except OSError:
+                pass
+        elif digest:
+            # Blobs are filed under their hash where the backend keeps our names
+            # (Cloudinary picks its own)
+            filename = None
+            if storage.get_storage().stable_urls:
+                folder, filename = blob_store.blob_location(digest, spool_file)
+            try:
+                final_url = upload_with_retry(spool_file, folder, self.max_attempts, self.backoff, filename=filename)
+                status = "ready"
+            except Exception as e:
+                print(f"Media upload for media {media_id} gave up: {e}")
+
+            if final_url:
+                try:
+                    media_derivatives = derivatives.build_derivatives(final_url)
+                except Exception as e:
+                    # The original is stored; the feed just falls back to it
+                    print(f"Derivatives for media {media_id} failed: {e}")
+
+        db = self.session_factory()
+        try:
+            media = db.get(models.ShoutOutMedia, media_id)
+            if media is None:
+                # Shoutout was deleted while we were uploading. A stable blob URL
+                # may already belong to another upload's blob, so the copy is
+                # registered and released instead of deleted outright: the files
+                # only go if nobody else holds a reference.
+                if final_url:
+                    if not reused:
+                        final_url = blob_store.register(db, digest, final_url, size, media_derivatives).url
+                    blob_store.release(db, final_url)
+                    db.commit()
+                return
+            if final_url and not reused:
+                blob = blob_store.register(db, digest, final_url, size, media_derivatives)
+                final_url, media_derivatives = blob.url, blob.derivatives
+            if final_url:
+                media.file_path = final_url
+                media.derivatives = media_derivatives
+            media.status = status
+            db.commit()
+        finally:
+            db.close()
+
+    def resume_pending(self):
+        """Re-queues pending rows whose spool file survived a restart."""
+        db = self.session_factory()
+        try:
+            pending = db.query(models.ShoutOutMedia.id, models.ShoutOutMedia.file_path).filter(
+                models.ShoutOutMedia.status == "pending"
+            ).all()
+        finally:
+            db.close()
+
+        for media_id, file_path in pending:
+            if file_path and os.path.exists(local_path(file_path)):
+                self.enqueue(media_id, file_path)
+
+    def shutdown(self, wait: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+pipeline = MediaUploadPipeline()
@@ -0,0 +1,303 @@
+"""
+Push channel for new notifications.
+
+GET /users/me/notifications/stream is a Server-Sent Events stream. Every
+notification committed for the user is sent as one event whose id is the
+notification id. EventSource reconnects on its own and sends the last id it
+saw as Last-Event-ID, or a client passes ?last_event_id=; whatever was
+committed after that id is replayed from the database before live events
+(with a short overlap, see notifications.replay, so clients skip ids they
+already have). Connected clients therefore never need to poll.
+
+The NotificationHub keeps the open streams of this process, keyed by user.
+publish() goes through a broker:
+
+- LocalBroker hands events straight to this process's hub. It is enough for
+  a single worker and is the default.
+- RedisBroker publishes to a Redis channel per user,
+  "<prefix><user id>". Every worker listens on the pattern in a background
+  thread and forwards what it receives to its own hub, so a notification
+  created in one worker reaches streams held by another. It needs the redis
+  package and is used when NOTIFICATION_BROKER_URL is set (redis://...).
+  FakeRedis is an in-memory stand-in with the same publish / pubsub calls,
+  for tests and offline development.
+
+publish() may be called from any thread. Each stream buffers at most
+MAX_QUEUED events; a client that falls further behind is disconnected and
+catches up through the replay when it reconnects.
+
+uvicorn waits for open responses before it runs the shutdown handlers, so
+start it with --timeout-graceful-shutdown (a few seconds) or a restart waits
+for every client to leave.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+from typing import Dict, Optional, Set
+
+BROKER_URL = os.getenv("NOTIFICATION_BROKER_URL", "")
+CHANNEL_PREFIX = os.getenv("NOTIFICATION_CHANNEL_PREFIX", "bragboard:notifications:")
+MAX_QUEUED = int(os.getenv("NOTIFICATION_STREAM_MAX_QUEUED", "100"))
+HEARTBEAT_SECONDS = 15.0
+
+
+class Subscription:
+    """One open stream. Events arrive on `queue`; None means the stream must end."""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    def _put(self, event: Optional[dict]):
+        # Runs on the subscription's event loop
+        if self.closed:
+            return
+        if event is None or self.queue.qsize() >= MAX_QUEUED:
+            self.closed = True
+            event = None
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: Optional[dict]):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop has already been closed
+            pass
+
+
+class NotificationHub:
+    def __init__(self, broker=None):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.broker = broker or LocalBroker()
+        self.broker.bind(self)
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Must be called from the event loop the stream runs on."""
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def connected(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def dispatch(self, user_id: int, event: dict):
+        """Delivers to the streams held by this process only."""
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def publish(self, user_id: int, event: dict):
+        self.broker.publish(user_id, event)
+
+    def start(self):
+        """Starts the broker's listener, if it has one."""
+        self.broker.start()
+
+    def shutdown(self):
+        self.broker.stop()
+        with self._lock:
+            subscriptions = [s for group in self._subscribers.values() for s in group]
+        for subscription in subscriptions:
+            subscription.deliver(None)
+
+
+class LocalBroker:
+    name = "local"
+
+    def __init__(self):
+        self._hub = None
+
+    def bind(self, hub: NotificationHub):
+        self._hub = hub
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, user_id: int, event: dict):
+        if self._hub is not None:
+            self._hub.dispatch(user_id, event)
+
+
+class RedisBroker:
+    name = "redis"
+
+    def __init__(self, client, prefix: str = CHANNEL_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self._hub = None
+        self._pubsub = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisBroker":
+        import redis  # optional dependency, only needed with NOTIFICATION_BROKER_URL
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def bind(self, hub: NotificationHub):
+        self._hub = hub
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(self.prefix + "*")
+        self._thread = threading.Thread(target=self._listen, name="notification-broker", daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                print(f"Notification broker: {e}")
+                self._stop.wait(1.0)
+                continue
+            if not message or message.get("type") != "pmessage":
+                continue
+            channel, data = message["channel"], message["data"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                user_id = int(channel[len(self.prefix):])
+                event = json.loads(data)
+            except ValueError:
+                continue
+            self._hub.dispatch(user_id, event)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def publish(self, user_id: int, event: dict):
+        self.client.publish(f"{self.prefix}{user_id}", json.dumps(event, default=str))
+
+
+class FakeRedis:
+    """In-memory stand-in for the part of redis.Redis that RedisBroker uses."""
+
+    def __init__(self):
+        self._pubsubs = []
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message) -> int:
+        with self._lock:
+            pubsubs = list(self._pubsubs)
+        data = message.encode() if isinstance(message, str) else message
+        receivers = 0
+        for pubsub in pubsubs:
+            receivers += pubsub._receive(channel, data)
+        return receivers
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "FakePubSub":
+        pubsub = FakePubSub(self)
+        with self._lock:
+            self._pubsubs.append(pubsub)
+        return pubsub
+
+    def _remove(self, pubsub):
+        with self._lock:
+            if pubsub in self._pubsubs:
+                self._pubsubs.remove(pubsub)
+
+
+class FakePubSub:
+    def __init__(self, server: FakeRedis):
+        self._server = server
+        self._patterns = []
+        self._messages = queue.Queue()
+
+    def psubscribe(self, *patterns: str):
+        # Only trailing-"*" patterns, which is all RedisBroker uses
+        self._patterns.extend(patterns)
+
+    def _receive(self, channel: str, data: bytes) -> int:
+        for pattern in self._patterns:
+            if channel.startswith(pattern.rstrip("*")):
+                self._messages.put({
+                    "type": "pmessage", "pattern": pattern.encode(),
+                    "channel": channel.encode(), "data": data,
+                })
+                return 1
+        return 0
+
+    def get_message(self, timeout: float = 0.0):
+        try:
+            return self._messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._server._remove(self)
+
+
+def create_broker(url: str = BROKER_URL):
+    if not url:
+        return LocalBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker.from_url(url)
+    raise ValueError(f"Unsupported NOTIFICATION_BROKER_URL: {url}")
+
+
+def format_event(event: dict) -> str:
+    """One SSE message: the notification id as the event id, the notification as JSON data."""
+    return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def event_stream(subscription: Subscription, replay, hub: "NotificationHub" = None):
+    """
+    Yields the SSE body: `replay` (already committed events, oldest first),
+    then live events from `subscription` until the hub closes it. The
+    subscription is taken before the replay is read, so nothing committed in
+    between is lost; events seen in the replay are not sent twice.
+    """
+    hub = hub or notification_hub
+    try:
+        yield "retry: 3000\n\n"
+        replayed = set()
+        for event in replay:
+            replayed.add(event["id"])
+            yield format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing out an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            if event["id"] in replayed:
+                continue
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+notification_hub = NotificationHub(create_broker())
@@ -0,0 +1,101 @@
+"""
+Retention for the notifications table.
+
+Nothing else ever removes a notification, so a background thread deletes the
+ones older than NOTIFICATION_RETENTION_DAYS (read or not) every
+NOTIFICATION_PRUNE_INTERVAL seconds. It works in batches of BATCH_SIZE rows,
+each DELETE in its own short transaction with a pause in between, so on
+SQLite the write lock is never held long enough to stall requests.
+
+Deletes go through the ORM session, so the change log and the unread
+counters see them like any other bulk delete. Set the retention to 0 to turn
+the job off; scripts/prune_notifications.py runs a single pass by hand.
+"""
+import datetime
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+
+RETENTION_DAYS = float(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+PRUNE_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_PRUNE_INTERVAL", "3600"))
+BATCH_SIZE = int(os.getenv("NOTIFICATION_PRUNE_BATCH_SIZE", "500"))
+BATCH_PAUSE_SECONDS = 0.05
+
+
+def delete_batch(db: Session, cutoff: datetime.datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Deletes up to batch_size notifications created before cutoff; does not commit."""
+    ids = db.execute(
+        select(models.Notification.id)
+        .where(models.Notification.created_at < cutoff)
+        .order_by(models.Notification.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+    db.query(models.Notification).filter(models.Notification.id.in_(ids)).delete(synchronize_session=False)
+    return len(ids)
+
+
+def prune_expired(
+    retention_days: float = RETENTION_DAYS,
+    batch_size: int = BATCH_SIZE,
+    pause: float = BATCH_PAUSE_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """Deletes every notification older than retention_days, one committed batch at a time. Returns the count."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)
+    deleted = 0
+    while not (stop and stop.is_set()):
+        db = SessionLocal()
+        try:
+            count = delete_batch(db, cutoff, batch_size)
+            db.commit()
+        finally:
+            db.close()
+        deleted += count
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    return deleted
+
+
+class RetentionJob:
+    def __init__(self, retention_days: float = RETENTION_DAYS, interval: float = PRUNE_INTERVAL_SECONDS):
+        self.retention_days = retention_days
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.retention_days <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-retention", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                deleted = prune_expired(self.retention_days, stop=self._stop)
+                if deleted:
+                    print(f"Notification retention: deleted {deleted} notifications")
+            except Exception as e:
+                # Try again next round rather than let the thread die
+                print(f"Notification retention failed: {e}")
+            self._stop.wait(self.interval)
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+
+retention_job = RetentionJob()
@@ -0,0 +1,329 @@
+"""
+Bulk recipient and notification writes for shoutouts.
+
+Tagging a whole department used to cost one SELECT per recipient to check it
+exists plus one INSERT each for the ShoutOutRecipient and the Notification.
+Here recipients are validated with a single IN query and both kinds of row
+are written with one multi-row INSERT per batch.
+
+Fan-outs above BACKGROUND_THRESHOLD recipients are handed to a background
+task, which writes the notifications in its own session after the response
+has been sent; the recipient rows are always written with the shoutout.
+
+Bulk INSERTs bypass the ORM unit of work, so the new rows are passed to
+changefeed.record_inserts explicitly.
+
+Every notification written through a session of SessionLocal, by notify() or
+as an ORM object, is pushed to its recipient's open streams once the
+transaction commits (see notification_hub.py); a rollback drops them.
+notify() also bumps the recipients' unread counters (unread_counters.py).
+
+Reactions go through coalesce() instead: a burst on one shoutout becomes a
+single unread row per recipient and type ("Alice and 41 others reacted ...")
+whose actor_count is bumped, rather than one row per reaction. Only new rows
+are pushed; a merged row reaches the client with its next fetch.
+
+mark_read() and delete_read_before() change a user's notifications with one
+UPDATE / DELETE each; expired ones are pruned by notification_retention.py.
+"""
+import datetime
+import os
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy import and_, event, false, insert, or_, select, true
+from sqlalchemy.orm import Session
+
+from .. import changefeed, models, unread_counters
+from ..database import SessionLocal
+from .notification_hub import notification_hub
+
+BACKGROUND_THRESHOLD = int(os.getenv("NOTIFICATION_BACKGROUND_THRESHOLD", "200"))
+BATCH_SIZE = 1000
+# Most events replayed to a reconnecting stream; older ones are left to the list endpoint
+REPLAY_LIMIT = 500
+# Ids are taken at INSERT but rows appear at COMMIT, so a row with a lower id than the
+# last one a client saw may commit after it. Replay also resends rows created this close
+# to that one; the client drops ids it already has.
+REPLAY_OVERLAP = datetime.timedelta(seconds=10)
+# An unread notification absorbs same-kind ones arriving within this long of its latest
+COALESCE_WINDOW = datetime.timedelta(seconds=int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "3600")))
+
+
+def _batches(items: list, size: int = BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_user_ids(db: Session, user_ids: Iterable[int]) -> List[int]:
+    """The ids that belong to a user, in the order given and without duplicates."""
+    wanted = list(dict.fromkeys(user_ids))
+    found = set()
+    for batch in _batches(wanted):
+        found.update(db.execute(select(models.User.id).where(models.User.id.in_(batch))).scalars())
+    return [user_id for user_id in wanted if user_id in found]
+
+
+def _bulk_insert(db: Session, model, rows: List[dict]) -> List[int]:
+    ids = []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    for batch in _batches(rows):
+        ids.extend(db.execute(statement, batch).scalars())
+    changefeed.record_inserts(db, model.__tablename__, ids)
+    return ids
+
+
+def to_event(notification) -> dict:
+    """The JSON pushed to streams for a Notification row (or a dict of its columns)."""
+    get = notification.get if isinstance(notification, dict) else lambda key: getattr(notification, key)
+    created_at = get("created_at")
+    return {
+        "id": get("id"),
+        "recipient_id": get("recipient_id"),
+        "sender_id": get("sender_id"),
+        "shoutout_id": get("shoutout_id"),
+        "comment_id": get("comment_id"),
+        "type": get("type"),
+        "message": get("message"),
+        "is_read": "true" if get("is_read") else "false",
+        "actor_count": get("actor_count") or 1,
+        "created_at": created_at.isoformat() if created_at else None,
+    }
+
+
+def _queue_push(session: Session, events: List[dict]):
+    session.info.setdefault("pending_notification_events", []).extend(events)
+
+
+def _after_flush(session: Session, flush_context):
+    _queue_push(session, [to_event(obj) for obj in session.new if isinstance(obj, models.Notification)])
+
+
+def _after_commit(session: Session):
+    for pushed in session.info.pop("pending_notification_events", []):
+        try:
+            notification_hub.publish(pushed["recipient_id"], pushed)
+        except Exception as e:
+            # Clients still get it through the replay when they reconnect
+            print(f"Notification push failed: {e}")
+
+
+def _after_rollback(session: Session):
+    session.info.pop("pending_notification_events", None)
+
+
+def register(session_factory=SessionLocal):
+    """Attach the push listeners to a sessionmaker (idempotent)."""
+    for name, listener in (("after_flush", _after_flush), ("after_commit", _after_commit),
+                           ("after_rollback", _after_rollback)):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)
+
+
+def replay(db: Session, recipient_id: int, after_id: Optional[int]) -> List[dict]:
+    """
+    Events for notifications committed after after_id, oldest first; none
+    without an id. Includes the ones within REPLAY_OVERLAP of after_id's, so
+    may repeat events the client already has.
+    """
+    if after_id is None:
+        return []
+    seen_at = db.query(models.Notification.created_at).filter(
+        models.Notification.recipient_id == recipient_id,
+        models.Notification.id <= after_id,
+    ).order_by(models.Notification.id.desc()).limit(1).scalar()
+    missed = models.Notification.id > after_id
+    if seen_at is not None:
+        missed = or_(missed, and_(models.Notification.id < after_id,
+                                  models.Notification.created_at >= seen_at - REPLAY_OVERLAP))
+    rows = db.query(models.Notification).filter(
+        models.Notification.recipient_id == recipient_id,
+        missed,
+    ).order_by(models.Notification.id).limit(REPLAY_LIMIT).all()
+    return [to_event(row) for row in rows]
+
+
+def add_recipients(db: Session, shoutout_id: int, recipient_ids: List[int]) -> List[int]:
+    """Writes one ShoutOutRecipient per id; does not commit."""
+    return _bulk_insert(db, models.ShoutOutRecipient, [
+        {"shoutout_id": shoutout_id, "recipient_id": recipient_id}
+        for recipient_id in recipient_ids
+    ])
+
+
+def notify(
+    db: Session,
+    recipient_ids: List[int],
+    sender_id: int,
+    type: str,
+    message: str,
+    shoutout_id: Optional[int] = None,
+    comment_id: Optional[int] = None,
+) -> List[int]:
+    """Writes the same notification for every recipient; does not commit."""
+    created_at = datetime.datetime.utcnow()
+    rows = [
+        {
+            "recipient_id": recipient_id,
+            "sender_id": sender_id,
+            "shoutout_id": shoutout_id,
+            "comment_id": comment_id,
+            "type": type,
+            "message": message,
+            "is_read": False,
+            "created_at": created_at,
+        }
+        for recipient_id in recipient_ids
+    ]
+    ids = _bulk_insert(db, models.Notification, rows)
+    unread_counters.adjust(db, Counter(recipient_ids))
+    _queue_push(db, [to_event({**row, "id": row_id}) for row, row_id in zip(rows, ids)])
+    return ids
+
+
+def mark_read(db: Session, recipient_id: int, notification_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Marks the recipient's unread notifications read, all of them or the ones in
+    notification_ids, with a single UPDATE. Does not commit; returns the count.
+    """
+    query = db.query(models.Notification).filter(
+        models.Notification.recipient_id == recipient_id,
+        models.Notification.is_read == false(),
+    )
+    if notification_ids is not None:
+        query = query.filter(models.Notification.id.in_(list(notification_ids)))
+    updated = query.update({models.Notification.is_read: True}, synchronize_session=False)
+    # A bulk UPDATE skips the flush listeners, so the counter is adjusted here
+    unread_counters.adjust(db, {recipient_id: -updated})
+    return updated
+
+
+def delete_read_before(db: Session, recipient_id: int, before: datetime.datetime) -> int:
+    """Deletes the recipient's read notifications created before `before` in one DELETE; does not commit."""
+    return db.query(models.Notification).filter(
+        models.Notification.recipient_id == recipient_id,
+        models.Notification.is_read == true(),
+        models.Notification.created_at < before,
+    ).delete(synchronize_session=False)
+
+
+def describe_actors(name: str, actor_count: int) -> str:
+    """'Alice', 'Alice and 1 other', 'Alice and 41 others'."""
+    others = actor_count - 1
+    if others <= 0:
+        return name
+    return f"{name} and {others} other{'s' if others > 1 else ''}"
+
+
+def coalesce(
+    db: Session,
+    recipient_id: int,
+    sender: models.User,
+    type: str,
+    action: str,
+    shoutout_id: Optional[int] = None,
+    actor_count: Optional[int] = None,
+) -> models.Notification:
+    """
+    Notifies recipient_id that sender did `action` ("reacted with like to your
+    shoutout!"), folding it into their unread notification of the same type for
+    the same shoutout if that one is less than COALESCE_WINDOW old. The merged
+    row names the latest sender and moves to the top of the inbox.
+
+    actor_count is how many distinct people are behind the notification now,
+    e.g. counted from the Reaction rows. Without it the sender counts as one
+    more actor unless they were also the previous one. Does not commit.
+    """
+    now = datetime.datetime.utcnow()
+    notification = _coalescible(db, recipient_id, type, shoutout_id, now)
+
+    if notification is None:
+        notification = models.Notification(
+            recipient_id=recipient_id,
+            sender_id=sender.id,
+            shoutout_id=shoutout_id,
+            type=type,
+            message=f"{sender.name} {action}",
+            created_at=now,
+        )
+        db.add(notification)
+        return notification
+
+    if actor_count is not None:
+        notification.actor_count = max(actor_count, 1)
+    elif notification.sender_id != sender.id:
+        notification.actor_count += 1
+    notification.sender_id = sender.id
+    notification.message = f"{describe_actors(sender.name, notification.actor_count)} {action}"
+    notification.created_at = now
+    return notification
+
+
+def recount(
+    db: Session,
+    recipient_id: int,
+    type: str,
+    action: str,
+    shoutout_id: Optional[int],
+    actor_count: int,
+    sender: Optional[models.User] = None,
+) -> Optional[models.Notification]:
+    """
+    Sets the actor count of the notification coalesce() would merge into, e.g.
+    after a reaction is taken back, naming `sender` (someone still behind it)
+    and keeping its place in the inbox. With no actors left the notification
+    is deleted, which also takes it off the unread badge. Returns None when
+    there is no notification left. Does not commit.
+    """
+    notification = _coalescible(db, recipient_id, type, shoutout_id, datetime.datetime.utcnow())
+    if notification is None:
+        return None
+    if actor_count <= 0:
+        db.delete(notification)
+        return None
+    if sender is not None:
+        notification.sender_id = sender.id
+    notification.actor_count = actor_count
+    name = sender.name if sender is not None else notification.sender.name
+    notification.message = f"{describe_actors(name, actor_count)} {action}"
+    return notification
+
+
+def _coalescible(
+    db: Session, recipient_id: int, type: str, shoutout_id: Optional[int], now: datetime.datetime
+) -> Optional[models.Notification]:
+    # Served by ix_notifications_recipient_unread; the row lock keeps concurrent
+    # reactions from both missing it on databases that support FOR UPDATE
+    return db.query(models.Notification).filter(
+        models.Notification.recipient_id == recipient_id,
+        models.Notification.is_read == false(),
+        models.Notification.created_at >= now - COALESCE_WINDOW,
+        models.Notification.shoutout_id == shoutout_id,
+        models.Notification.type == type,
+    ).order_by(models.Notification.created_at.desc()).with_for_update().first()
+
+
+def notify_in_background(recipient_ids: List[int], **notification):
+    """Background-task entry point: commits every BATCH_SIZE notifications."""
+    db = SessionLocal()
+    try:
+        for batch in _batches(recipient_ids):
+            notify(db, batch, **notification)
+            db.commit()
+    finally:
+        db.close()
+
+
+def fan_out(db: Session, background_tasks: BackgroundTasks, recipient_ids: List[int], **notification):
+    """
+    Notifies recipient_ids in this transaction, or after the response when
+    there are more than BACKGROUND_THRESHOLD of them. Callers commit.
+    """
+    if len(recipient_ids) > BACKGROUND_THRESHOLD:
+        background_tasks.add_task(notify_in_background, list(recipient_ids), **notification)
+    else:
+        notify(db, recipient_ids, **notification)
+
+
+register()
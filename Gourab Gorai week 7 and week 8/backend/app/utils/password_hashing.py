@@ -0,0 +1,138 @@
+"""
+Password hashing in a separate process pool.
+
+pbkdf2_sha256 and bcrypt spend 100+ ms of pure CPU per call. Run in FastAPI's
+threadpool they hold the GIL for that long, so a burst of logins slows down
+every other endpoint. Here they run in a small pool of worker processes and
+the auth routes `await` the result, which leaves the event loop and the
+threadpool free for everything else.
+
+At most `max_pending` hashes may be queued or running at once; beyond that
+new requests are rejected straight away with PasswordHashingOverloaded (the
+routes answer 503 with Retry-After) instead of queueing for minutes behind a
+login storm.
+
+With PASSWORD_HASH_TARGET_MS set, the pbkdf2 round count is calibrated at
+startup so that one verification takes about that long on this machine
+(scripts/calibrate_password_hashing.py prints the same measurement).
+"""
+import asyncio
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .. import security
+
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "0"))
+# passlib's own default; calibration never goes below it
+MIN_ROUNDS = 29000
+
+
+class PasswordHashingOverloaded(Exception):
+    """Raised when too many hashes are already waiting."""
+
+
+def _warm_up_worker():
+    # Unpickling this imports this module, and with it passlib: the slow part of a worker's first call
+    return os.getpid()
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the API process has threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        # A crashed worker breaks the whole pool; the next call gets a fresh one
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingOverloaded("Too many sign-ins at once, please try again shortly")
+        executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(security.hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(security.verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        """(valid, new_hash), see security.verify_and_update_password."""
+        return await self._run(security.verify_and_update_password, plain_password, hashed_password)
+
+    def warm_up(self):
+        """Starts the workers now instead of on the first login."""
+        executor = self._get_executor()
+        return [executor.submit(_warm_up_worker) for _ in range(self.workers)]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def measure_verify_seconds(rounds: int, samples: int = 3) -> float:
+    """Median time of one pbkdf2 verification with `rounds` iterations on this machine."""
+    context = security.build_context(rounds)
+    hashed = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def calibrate_rounds(target_ms: float) -> int:
+    """pbkdf2 rounds for which one verification takes about target_ms here."""
+    rounds = 100_000
+    # The cost is linear in rounds; the second pass corrects for fixed overhead
+    for _ in range(2):
+        rounds = max(MIN_ROUNDS, int(rounds * target_ms / 1000 / measure_verify_seconds(rounds)))
+    return round(rounds, -3)
+
+
+def apply_calibration(target_ms: float) -> int:
+    """
+    Calibrates and switches this process to the result. Must run before the
+    pool starts: spawned workers read PASSWORD_HASH_ROUNDS from the environment.
+    """
+    rounds = calibrate_rounds(target_ms)
+    os.environ["PASSWORD_HASH_ROUNDS"] = str(rounds)
+    security.PBKDF2_ROUNDS = rounds
+    security.pwd_context = security.build_context(rounds)
+    return rounds
+
+
+password_hasher = PasswordHasher()
@@ -1,9 +1,49 @@
+"""
+Storage backends for uploaded media.
+
+Everything that stores, deletes or links to a media file goes through a
+StorageBackend:
+
+- LocalStorage writes under uploads/, which is served by the /uploads mount;
+- FakeCloudinaryStorage is the offline stand-in under uploads/fake_cloudinary;
+- CloudinaryStorage uploads through the Cloudinary SDK;
+- S3Storage talks to any S3-compatible service (AWS S3, MinIO, R2, ...) and
+  FakeS3 is an in-memory server for it, for tests and offline development.
+
+get_storage() builds the configured backend once per process from
+STORAGE_BACKEND (and the CLOUDINARY_* / S3_* variables) instead of re-reading
+the environment on every call. backend_for(url) finds the backend an already
+stored URL belongs to: after switching backends old rows still point at the
+previous one.
+
+Backends are shared by all threads and keep one pooled HTTP client for their
+whole life. save_file, delete and signed_url block; async code awaits the a*
+variants instead, which run them in the threadpool on the same client.
+"""
+import abc
+import contextlib
+import datetime
+import functools
+import hashlib
+import hmac
+import mimetypes
 import os
+import random
+import re
 import shutil
+import tempfile
+import threading
+import time
 import uuid
+from typing import Optional
+from urllib.parse import quote, unquote, urlparse
+
 import cloudinary
+import cloudinary.api_client.call_api
 import cloudinary.uploader
-from fastapi import UploadFile
+import cloudinary.utils
+import httpx
+from fastapi.concurrency import run_in_threadpool
 
 # Configure Cloudinary
 # It will automatically pick up CLOUDINARY_URL or CLOUDINARY_* vars from env/dotenv
@@ -11,180 +51,534 @@ cloudinary.config(
     secure=True
 )
 
-def get_storage_type():
-    """Returns 'cloudinary' or 'local' based on env vars."""
-    # Priority: Explicit var > Presence of Cloudinary Creds > Default local
-    storage_type = os.getenv("STORAGE_TYPE", "").lower()
-    if storage_type == "cloudinary":
-        return "cloudinary"
-    if storage_type == "local":
-        return "local"
-    
-    # Auto-detect
-    if os.getenv("CLOUDINARY_CLOUD_NAME") and os.getenv("CLOUDINARY_API_KEY"):
-        return "cloudinary"
-    
-    return "local"
+UPLOAD_ROOT = "uploads"
+FAKE_CLOUDINARY_DIR = os.path.join(UPLOAD_ROOT, "fake_cloudinary")
+CLOUDINARY_FOLDER = "bragboard"
+POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "10"))
+HTTP_TIMEOUT = float(os.getenv("STORAGE_HTTP_TIMEOUT", "60"))
+COPY_CHUNK_SIZE = 1024 * 1024
+
 
-def save_file(file: UploadFile, folder: str = "uploads") -> str:
+def unique_key(folder: str, filename: str = None) -> str:
+    """Returns "<folder>/<uuid><extension of filename>", the key new uploads are stored under."""
+    return f"{folder}/{uuid.uuid4()}{os.path.splitext(filename or '')[1].lower()}"
+
+
+class StorageBackend(abc.ABC):
     """
-    Saves a file to either Cloudinary or local storage.
-    
-    Args:
-        file: The FastAPI UploadFile object.
-        folder: The folder/path context (e.g., "profile_pics" or "shoutouts").
-                For local, this is appended to "uploads/".
-                For Cloudinary, this is used as the 'folder' parameter.
-    
-    Returns:
-        str: The URL (Cloudinary) or relative path (Local) to the saved file.
+    Keys are relative, "/"-separated names such as "profile_pics/<uuid>.jpg";
+    rows store the URL that save_file returns.
     """
-    storage = get_storage_type()
-    
-    if storage == "cloudinary":
+    name = "base"
+    # save_file stores under exactly the given key, so a key always maps to the same URL
+    stable_urls = True
+
+    @abc.abstractmethod
+    def save_file(self, path: str, key: str, content_type: str = None, keep_source: bool = False) -> str:
+        """
+        Stores the local file at `path` under `key` and returns its URL. The
+        local file is moved or removed afterwards unless keep_source is set.
+        """
+
+    def save_upload(self, fileobj, key: str, content_type: str = None) -> str:
+        """Same as save_file for an open binary stream, e.g. UploadFile.file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.staging_dir())
         try:
-            # Upload to Cloudinary
-            # use_filename=True uses the original filename if possible, unique_filename=True ensures uniqueness
-            result = cloudinary.uploader.upload(
-                file.file,
-                folder=f"bragboard/{folder}",
-                resource_type="auto"
-            )
-            return result.get("secure_url")
-        except Exception as e:
-            print(f"Cloudinary upload failed: {e}. Falling back to local if possible or raising error.")
-            # For specific error handling, we might want to just raise
-            raise e
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(fileobj, out, COPY_CHUNK_SIZE)
+            return self.save_file(tmp_path, key, content_type)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
-    else:
-        # Local Storage
-        # Ensure directory exists
-        base_dir = "uploads"
-        target_dir = os.path.join(base_dir, folder)
-        os.makedirs(target_dir, exist_ok=True)
-        
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_name = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(target_dir, unique_name)
-        
-        # Save
-        # Reset file cursor just in case it was read
-        file.file.seek(0)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Return proper relative path for frontend (assuming /uploads mount)
-        # We need to return exactly what the frontend expects.
-        # Previously it stored: /uploads/profile_pics/filename
-        # So we return: /uploads/{folder}/{unique_name}
-        return f"/uploads/{folder}/{unique_name}"
-
-def delete_file(file_path: str):
+    def staging_dir(self) -> str:
+        """Where save_upload buffers streams before handing them to save_file."""
+        return tempfile.gettempdir()
+
+    def owns(self, url: str) -> bool:
+        return self.key_for_url(url) is not None
+
+    @abc.abstractmethod
+    def key_for_url(self, url: str) -> Optional[str]:
+        """The key behind a URL this backend returned, None for anyone else's URL."""
+
+    @abc.abstractmethod
+    def delete(self, url: str) -> bool:
+        """Removes the file behind `url`; False if there was nothing to remove."""
+
+    def signed_url(self, url: str, expires_in: int = 3600) -> str:
+        """A link to the file that stops working after expires_in seconds (if the backend supports that)."""
+        return url
+
+    @abc.abstractmethod
+    def local_copy(self, url: str):
+        """
+        Context manager yielding a path on disk holding the file. Remote
+        backends download it to a temporary directory, which is removed
+        afterwards together with anything written next to the copy.
+        """
+
+    async def asave_file(self, path: str, key: str, content_type: str = None, keep_source: bool = False) -> str:
+        return await run_in_threadpool(self.save_file, path, key, content_type, keep_source)
+
+    async def asave_upload(self, fileobj, key: str, content_type: str = None) -> str:
+        return await run_in_threadpool(self.save_upload, fileobj, key, content_type)
+
+    async def adelete(self, url: str) -> bool:
+        return await run_in_threadpool(self.delete, url)
+
+    async def asigned_url(self, url: str, expires_in: int = 3600) -> str:
+        return await run_in_threadpool(self.signed_url, url, expires_in)
+
+    def close(self):
+        pass
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str = UPLOAD_ROOT, base_url: str = "/uploads"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        if not url or not url.startswith(self.base_url + "/"):
+            return None
+        key = url[len(self.base_url) + 1:]
+        if ".." in key.split("/"):
+            return None
+        return key
+
+    def staging_dir(self) -> str:
+        # Same filesystem as the final location, so save_file is a rename
+        spool_dir = os.path.join(self.root, "spool")
+        os.makedirs(spool_dir, exist_ok=True)
+        return spool_dir
+
+    def save_file(self, path: str, key: str, content_type: str = None, keep_source: bool = False) -> str:
+        target = self.path_for(key)
+        if os.path.abspath(path) == os.path.abspath(target):
+            return self.url_for(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if keep_source:
+            shutil.copyfile(path, target)
+        else:
+            try:
+                os.replace(path, target)
+            except OSError:
+                shutil.move(path, target)  # different filesystem
+        return self.url_for(key)
+
+    def delete(self, url: str) -> bool:
+        key = self.key_for_url(url)
+        if key is None:
+            return False
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Could not delete {url}: {e}")
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def local_copy(self, url: str):
+        # Already on disk; derivatives are meant to be written next to it
+        yield self.path_for(self.key_for_url(url))
+
+
+def simulate_fake_cloudinary_network():
     """
-    Deletes a file from storage.
-    
-    Args:
-        file_path: The path or URL of the file to delete.
+    FAKE_CLOUDINARY_LATENCY (seconds) and FAKE_CLOUDINARY_FAIL_RATE (0-1) simulate a
+    slow or flaky remote for exercising retries.
+    """
+    latency = float(os.getenv("FAKE_CLOUDINARY_LATENCY", "0"))
+    if latency > 0:
+        time.sleep(latency)
+    if random.random() < float(os.getenv("FAKE_CLOUDINARY_FAIL_RATE", "0")):
+        raise ConnectionError("Fake Cloudinary: simulated upload failure")
+
+
+class FakeCloudinaryStorage(LocalStorage):
+    """
+    Offline stand-in for Cloudinary (STORAGE_BACKEND=fake_cloudinary). Files go
+    to uploads/fake_cloudinary/bragboard/ and are served by the /uploads
+    mount, so the app keeps working without credentials or network.
+    """
+    name = "fake_cloudinary"
+
+    def __init__(self):
+        super().__init__(os.path.join(FAKE_CLOUDINARY_DIR, CLOUDINARY_FOLDER),
+                         f"/uploads/fake_cloudinary/{CLOUDINARY_FOLDER}")
+
+    def save_file(self, path: str, key: str, content_type: str = None, keep_source: bool = False) -> str:
+        simulate_fake_cloudinary_network()
+        return super().save_file(path, key, content_type, keep_source)
+
+
+def cloudinary_public_id(url: str):
+    """
+    Returns (public_id, resource_type) for a Cloudinary delivery URL, or (None, None).
+
+    https://res.cloudinary.com/<cloud>/image/upload/[<transformations>/][v123/]bragboard/shoutouts/abc.jpg
+    -> ("bragboard/shoutouts/abc", "image")
     """
-    if not file_path:
-        return
+    path = urlparse(url).path
+    if "/upload/" not in path:
+        return None, None
+    head, rest = path.split("/upload/", 1)
+    resource_type = head.rstrip("/").rsplit("/", 1)[-1] or "image"
+    segments = [s for s in rest.split("/") if s]
+
+    versions = [i for i, s in enumerate(segments) if re.fullmatch(r"v\d+", s)]
+    if versions:
+        segments = segments[versions[0] + 1:]
+    else:
+        # No version: drop leading transformation segments like "c_limit,w_320"
+        while segments and re.match(r"^[a-z]{1,3}_[^/]*$", segments[0]) and len(segments) > 1:
+            segments = segments[1:]
+    if not segments:
+        return None, None
+
+    public_id = "/".join(segments)
+    if resource_type != "raw":  # raw public_ids keep their extension
+        public_id = os.path.splitext(public_id)[0]
+    return public_id, resource_type
+
+
+class CloudinaryStorage(StorageBackend):
+    name = "cloudinary"
+    # Cloudinary names the asset itself and delivery URLs carry a version
+    stable_urls = False
+
+    def __init__(self, folder: str = CLOUDINARY_FOLDER, pool_size: int = POOL_SIZE):
+        self.folder = folder
+        # The SDK sends every call through module-level urllib3 pools that keep
+        # a single connection per host; give them room for concurrent uploads
+        options = dict(cloudinary.CERT_KWARGS, maxsize=pool_size)
+        for module in (cloudinary.uploader, cloudinary.api_client.call_api):
+            if hasattr(module, "_http"):
+                module._http = cloudinary.utils.get_http_connector(cloudinary.config(), options)
+
+    def save_file(self, path: str, key: str, content_type: str = None, keep_source: bool = False) -> str:
+        # Only the key's folder is used; Cloudinary picks a unique public_id
+        folder = f"{self.folder}/{os.path.dirname(key)}".rstrip("/")
+        result = cloudinary.uploader.upload(path, folder=folder, resource_type="auto")
+        if not keep_source:
+            os.remove(path)
+        return result.get("secure_url")
 
-    # Check if it's a Cloudinary URL
-    if "cloudinary.com" in file_path:
+    def key_for_url(self, url: str) -> Optional[str]:
+        if not url or "cloudinary.com" not in url:
+            return None
+        public_id, _ = cloudinary_public_id(url)
+        return public_id
+
+    def delete(self, url: str) -> bool:
+        public_id, resource_type = cloudinary_public_id(url)
+        if not public_id:
+            print(f"Could not find the Cloudinary public_id in {url}")
+            return False
         try:
-            # Extract public_id
-            # URL format: https://res.cloudinary.com/cloud_name/type/upload/v12345/folder/filename.ext
-            # We want 'folder/filename' (without extension matches public_id usually)
-            
-            # Simple extraction strategy:
-            # split by '/' and take the last parts.
-            # This is brittle. Better strategy:
-            # Cloudinary public_id usually includes folder. 
-            
-            # For now, simplistic "destroy" might need the public_id.
-            # If we don't store public_id, deletion is harder.
-            # However, for this task, 'deletion' might be less critical than 'viewing'.
-            # We will attempt a best-effort parse.
-            
-            parts = file_path.split("/")
-            # find version "v..."
-            # public_id is everything after version and before extension
-            
-            # Hacky parse:
-            # bragboard/profile_pics/filename (no ext)
-            
-            filename_with_ext = parts[-1]
-            public_id_key = os.path.splitext(filename_with_ext)[0]
-            
-            # If we used folders, we need to include them.
-            # We used 'bragboard/{folder}'
-            # Let's try to reconstruct based on known folders?
-            # Or just ignore deletion for now to avoid errors on the "Fix Image Loading" task.
-            # Deletion is nice to have.
-            
-            print(f"Attempting to delete Cloudinary image: {file_path} - Not fully implemented to avoid regressing public_id parsing issues.")
-            # cloudinary.uploader.destroy(public_id)
-            pass
+            result = cloudinary.uploader.destroy(public_id, resource_type=resource_type, invalidate=True)
         except Exception as e:
             print(f"Error deleting from Cloudinary: {e}")
-            
-    else:
-        # Local file
-        # file_path is likely "/uploads/..." -> relative from root if we strip start?
-        # or relative to CWD?
-        # The app runs from backend/
-        # file_path stored in DB: "/uploads/profile_pics/..."
-        
-        real_path = file_path.lstrip("/") # remove leading slash
-        real_path = real_path.replace("/", os.sep) # fix separators
-        
-        if os.path.exists(real_path):
-            try:
-                os.remove(real_path)
-            except OSError:
-                pass
+            return False
+        return result.get("result") == "ok"
+
+    def signed_url(self, url: str, expires_in: int = 3600) -> str:
+        public_id, resource_type = cloudinary_public_id(url)
+        if not public_id:
+            return url
+        file_format = os.path.splitext(urlparse(url).path)[1].lstrip(".")
+        if resource_type == "raw":
+            file_format = ""
+        return cloudinary.utils.private_download_url(
+            public_id, file_format, resource_type=resource_type, type="upload",
+            expires_at=int(time.time()) + expires_in,
+        )
+
+    @contextlib.contextmanager
+    def local_copy(self, url: str):
+        tmp_dir = tempfile.mkdtemp(prefix="storage-")
+        try:
+            path = os.path.join(tmp_dir, os.path.basename(urlparse(url).path))
+            with httpx.stream("GET", url, timeout=HTTP_TIMEOUT, follow_redirects=True) as response:
+                response.raise_for_status()
+                with open(path, "wb") as out:
+                    for chunk in response.iter_bytes(COPY_CHUNK_SIZE):
+                        out.write(chunk)
+            yield path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
 
-def upload_local_file(file_path: str, folder: str = "uploads") -> str:
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+def _uri_encode(value: str, safe: str = "") -> str:
+    return quote(value, safe="-_.~" + safe)
+
+
+def sigv4_signature(secret_key: str, region: str, method: str, canonical_uri: str, query: dict,
+                    headers: dict, payload_hash: str, amz_date: str, service: str = "s3") -> str:
+    """AWS Signature Version 4 over the given (lower-case) headers; all of them are signed."""
+    canonical_query = "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+    names = sorted(headers)
+    canonical_headers = "".join(f"{name}:{' '.join(str(headers[name]).split())}\n" for name in names)
+    canonical_request = "\n".join([
+        method, canonical_uri, canonical_query, canonical_headers, ";".join(names), payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+
+    key = ("AWS4" + secret_key).encode()
+    for part in (amz_date[:8], region, service, "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+class S3Storage(StorageBackend):
     """
-    Uploads a local file to Cloudinary (if configured) or returns the relative local path.
-    Used for migration and workflows where a local file already exists (e.g. after face detection).
-    
-    Args:
-        file_path: Absolute or relative path to the local file.
-        folder: Target folder in Cloudinary (e.g. 'profile_pics').
-        
-    Returns:
-        str: Cloudinary URL or local relative path.
+    S3-compatible object storage with path-style addressing
+    (<endpoint>/<bucket>/<key>). Requests go through one pooled httpx.Client;
+    uploads stream the file from disk with an unsigned payload, so nothing is
+    read twice. public_url is where objects are served from (the bucket
+    endpoint by default, or a CDN in front of it).
     """
-    storage = get_storage_type()
-    
-    if storage == "cloudinary":
+    name = "s3"
+
+    def __init__(self, bucket: str, endpoint_url: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", public_url: str = None, prefix: str = "",
+                 pool_size: int = POOL_SIZE, timeout: float = HTTP_TIMEOUT, transport=None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.public_url = (public_url or f"{self.endpoint_url}/{bucket}").rstrip("/")
+        self.prefix = prefix
+        self.host = urlparse(self.endpoint_url).netloc
+        self.client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_env(cls, transport=None) -> "S3Storage":
+        return cls(
+            bucket=os.getenv("S3_BUCKET", "bragboard"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com"),
+            access_key=os.getenv("S3_ACCESS_KEY_ID", ""),
+            secret_key=os.getenv("S3_SECRET_ACCESS_KEY", ""),
+            region=os.getenv("S3_REGION", "us-east-1"),
+            public_url=os.getenv("S3_PUBLIC_URL") or None,
+            prefix=os.getenv("S3_PREFIX", ""),
+            transport=transport,
+        )
+
+    def _object_path(self, key: str) -> str:
+        return f"/{self.bucket}/{_uri_encode(self.prefix + key, safe='/')}"
+
+    def _request(self, method: str, key: str, headers: dict = None, **kwargs) -> httpx.Response:
+        amz_date = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        signed = {"host": self.host, "x-amz-date": amz_date, "x-amz-content-sha256": UNSIGNED_PAYLOAD}
+        signed.update({name.lower(): value for name, value in (headers or {}).items()})
+        path = self._object_path(key)
+        signature = sigv4_signature(self.secret_key, self.region, method, path, {}, signed, UNSIGNED_PAYLOAD, amz_date)
+        signed["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={';'.join(sorted(signed))}, Signature={signature}"
+        )
+        del signed["host"]  # httpx sets it
+        return self.client.request(method, self.endpoint_url + path, headers=signed, **kwargs)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}/{_uri_encode(self.prefix + key, safe='/')}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        if not url or not url.startswith(self.public_url + "/"):
+            return None
+        key = unquote(url[len(self.public_url) + 1:].split("?")[0])
+        if not key.startswith(self.prefix):
+            return None
+        return key[len(self.prefix):]
+
+    def save_file(self, path: str, key: str, content_type: str = None, keep_source: bool = False) -> str:
+        headers = {
+            "content-type": content_type or mimetypes.guess_type(key)[0] or "application/octet-stream",
+            "content-length": str(os.path.getsize(path)),
+        }
+        with open(path, "rb") as f:
+            response = self._request("PUT", key, headers, content=f)
+        response.raise_for_status()
+        if not keep_source:
+            os.remove(path)
+        return self.url_for(key)
+
+    def delete(self, url: str) -> bool:
+        key = self.key_for_url(url)
+        if key is None:
+            return False
         try:
-            filename = os.path.basename(file_path)
-            # Upload
-            result = cloudinary.uploader.upload(
-                file_path,
-                folder=f"bragboard/{folder}",
-                resource_type="auto"
-            )
-            return result.get("secure_url")
-        except Exception as e:
-            print(f"Cloudinary upload failed: {e}")
-            raise e
-    else:
-        # It's already local. Just return the relative path expected by frontend.
-        # We assume file_path is something like "uploads/profile_pics/foo.jpg"
-        # We need to normalise it to "/uploads/profile_pics/foo.jpg"
-        
-        # normalize path separators
-        normalized = file_path.replace("\\", "/")
-        
-        # Ensure it starts with /uploads if it's in the uploads dir
-        if "uploads/" in normalized:
-            # find index of uploads/
-            idx = normalized.find("uploads/")
-            return "/" + normalized[idx:]
-        
-        return normalized
+            response = self._request("DELETE", key)
+        except httpx.HTTPError as e:
+            print(f"Error deleting {url} from S3: {e}")
+            return False
+        return response.status_code in (200, 204)
+
+    def signed_url(self, url: str, expires_in: int = 3600) -> str:
+        key = self.key_for_url(url)
+        if key is None:
+            return url
+        amz_date = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        path = self._object_path(key)
+        query["X-Amz-Signature"] = sigv4_signature(
+            self.secret_key, self.region, "GET", path, query, {"host": self.host}, UNSIGNED_PAYLOAD, amz_date
+        )
+        return f"{self.endpoint_url}{path}?" + "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in query.items())
+
+    @contextlib.contextmanager
+    def local_copy(self, url: str):
+        key = self.key_for_url(url)
+        tmp_dir = tempfile.mkdtemp(prefix="storage-")
+        try:
+            path = os.path.join(tmp_dir, os.path.basename(key))
+            with self.client.stream("GET", self.signed_url(url, expires_in=300)) as response:
+                response.raise_for_status()
+                with open(path, "wb") as out:
+                    for chunk in response.iter_bytes(COPY_CHUNK_SIZE):
+                        out.write(chunk)
+            yield path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def close(self):
+        self.client.close()
 
+
+class FakeS3(httpx.BaseTransport):
+    """
+    In-memory S3 for tests and offline development (STORAGE_BACKEND=fake_s3):
+    S3Storage(..., transport=FakeS3()) talks to it instead of the network.
+    Handles PUT, GET, HEAD and DELETE of single objects and rejects requests
+    that aren't signed.
+    """
+
+    def __init__(self):
+        self.objects = {}  # "<bucket>/<key>" -> (body, content type)
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        authorization = request.headers.get("authorization", "")
+        if not authorization.startswith("AWS4-HMAC-SHA256 ") and "X-Amz-Signature" not in request.url.params:
+            return httpx.Response(403, text="AccessDenied")
+
+        name = unquote(request.url.path).lstrip("/")
+        if request.method == "PUT":
+            body = request.read()
+            with self._lock:
+                self.objects[name] = (body, request.headers.get("content-type", "application/octet-stream"))
+            return httpx.Response(200, headers={"etag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "DELETE":
+            with self._lock:
+                self.objects.pop(name, None)
+            return httpx.Response(204)
+        if request.method not in ("GET", "HEAD"):
+            return httpx.Response(405)
+
+        with self._lock:
+            stored = self.objects.get(name)
+        if stored is None:
+            return httpx.Response(404, text="NoSuchKey")
+        body, content_type = stored
+        headers = {"content-type": content_type, "content-length": str(len(body))}
+        return httpx.Response(200, headers=headers, content=body if request.method == "GET" else b"")
+
+
+def _storage_type() -> str:
+    # Priority: Explicit var > Presence of Cloudinary Creds > Default local.
+    # STORAGE_BACKEND is what the other backends read; STORAGE_TYPE is the older name.
+    storage_type = (os.getenv("STORAGE_BACKEND") or os.getenv("STORAGE_TYPE") or "").lower()
+    if storage_type in ("cloudinary", "fake_cloudinary", "s3", "fake_s3", "local"):
+        return storage_type
+
+    # Auto-detect
+    if os.getenv("CLOUDINARY_CLOUD_NAME") and os.getenv("CLOUDINARY_API_KEY"):
+        return "cloudinary"
+
+    return "local"
+
+
+@functools.lru_cache(maxsize=None)
+def get_storage() -> StorageBackend:
+    """The configured backend, created on first use and shared by the whole process."""
+    storage_type = _storage_type()
+    if storage_type == "cloudinary":
+        return CloudinaryStorage()
+    if storage_type == "fake_cloudinary":
+        return FakeCloudinaryStorage()
+    if storage_type == "s3":
+        return S3Storage.from_env()
+    if storage_type == "fake_s3":
+        return S3Storage.from_env(transport=FakeS3())
+    return LocalStorage()
+
+
+def close_storage():
+    if get_storage.cache_info().currsize:
+        get_storage().close()
+        get_storage.cache_clear()
+
+
+def get_storage_type() -> str:
+    """Returns the configured backend's name: 'local', 'cloudinary', 'fake_cloudinary' or 's3'."""
+    return get_storage().name
+
+
+@functools.lru_cache(maxsize=None)
+def _legacy_backends() -> tuple:
+    return (LocalStorage(), CloudinaryStorage())
+
+
+def backend_for(url: str) -> Optional[StorageBackend]:
+    """The backend holding an already stored URL, which need not be the configured one."""
+    if not url:
+        return None
+    configured = get_storage()
+    if configured.owns(url):
+        return configured
+    for backend in _legacy_backends():
+        if backend.owns(url):
+            return backend
+    return None
+
+
+def delete_file(file_path: str) -> bool:
+    """
+    Deletes a file from storage.
+
+    Args:
+        file_path: The URL of the file to delete, as returned by save_file.
+    """
+    backend = backend_for(file_path)
+    if backend is None:
+        return False
+    return backend.delete(file_path)
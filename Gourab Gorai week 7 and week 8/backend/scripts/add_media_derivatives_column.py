@@ -0,0 +1,48 @@
+import sys
+import os
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import inspect, text
+from app import models
+from app.database import engine, SessionLocal
+from app.utils import derivatives
+
+# Usage: python scripts/add_media_derivatives_column.py [--backfill]
+# --backfill also generates derivatives for images uploaded before this change.
+
+def add_media_derivatives_column():
+    columns = [c["name"] for c in inspect(engine).get_columns("shoutout_media")]
+    if "derivatives" in columns:
+        print("shoutout_media.derivatives already exists.")
+        return
+
+    print("Adding shoutout_media.derivatives column...")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE shoutout_media ADD COLUMN derivatives JSON"))
+    print("Migration complete.")
+
+def backfill_derivatives():
+    db = SessionLocal()
+    try:
+        media = db.query(models.ShoutOutMedia).filter(
+            models.ShoutOutMedia.media_type == models.MediaType.IMAGE,
+            models.ShoutOutMedia.status == "ready",
+            models.ShoutOutMedia.derivatives == None,
+        ).all()
+        print(f"Generating derivatives for {len(media)} images...")
+        for item in media:
+            try:
+                item.derivatives = derivatives.build_derivatives(item.file_path)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"  Failed for media {item.id}: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_media_derivatives_column()
+    if "--backfill" in sys.argv:
+        backfill_derivatives()
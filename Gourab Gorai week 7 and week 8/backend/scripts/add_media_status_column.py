@@ -0,0 +1,24 @@
+import sys
+import os
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import inspect, text
+from app.database import engine
+
+def add_media_status_column():
+    columns = [c["name"] for c in inspect(engine).get_columns("shoutout_media")]
+    if "status" in columns:
+        print("shoutout_media.status already exists.")
+        return
+
+    print("Adding shoutout_media.status column...")
+    with engine.begin() as conn:
+        # Existing media is already uploaded, so it starts out 'ready'
+        conn.execute(text("ALTER TABLE shoutout_media ADD COLUMN status VARCHAR DEFAULT 'ready'"))
+        conn.execute(text("UPDATE shoutout_media SET status = 'ready' WHERE status IS NULL"))
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    add_media_status_column()
@@ -0,0 +1,23 @@
+import sys
+import os
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import inspect, text
+from app.database import engine
+
+def add_notification_actor_count_column():
+    columns = [c["name"] for c in inspect(engine).get_columns("notifications")]
+    if "actor_count" in columns:
+        print("notifications.actor_count already exists.")
+        return
+
+    print("Adding notifications.actor_count column...")
+    with engine.begin() as conn:
+        # Every existing notification stands for a single actor
+        conn.execute(text("ALTER TABLE notifications ADD COLUMN actor_count INTEGER NOT NULL DEFAULT 1"))
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    add_notification_actor_count_column()
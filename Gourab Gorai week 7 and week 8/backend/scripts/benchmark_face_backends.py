@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils import face_detection
+
+# Usage: python scripts/benchmark_face_backends.py [iterations] [image]
+# Compares the PyTorch (ultralytics) and ONNX Runtime face models on the CPU.
+# Each backend is measured in a fresh interpreter so import and load times are real.
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+from app.routers import users
+t_router = time.perf_counter() - t0
+
+from app.utils import face_detection
+backend, path, image, iterations = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+t1 = time.perf_counter()
+model = face_detection.load_model(backend, path)
+t_load = time.perf_counter() - t1
+
+t2 = time.perf_counter()
+count = face_detection.predict_face_counts(model, [image])[0]
+t_first = time.perf_counter() - t2
+
+latencies = []
+for _ in range(iterations):
+    t = time.perf_counter()
+    face_detection.predict_face_counts(model, [image])
+    latencies.append(time.perf_counter() - t)
+latencies.sort()
+
+print(json.dumps({
+    "router_import_s": t_router,
+    "model_load_s": t_load,
+    "first_inference_s": t_first,
+    "p50_ms": latencies[len(latencies) // 2] * 1000,
+    "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "faces": count,
+}))
+"""
+
+
+def run_probe(backend, model_path, image, iterations):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, backend, model_path, image, str(iterations)],
+        cwd=BACKEND_ROOT, capture_output=True, text=True,
+        env={**os.environ, "DATABASE_URL": os.getenv("DATABASE_URL", "sqlite://")},
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image = sys.argv[2] if len(sys.argv) > 2 else None
+        if image is None:
+            from PIL import Image
+            image = os.path.join(tmp, "blank.jpg")
+            Image.new("RGB", (640, 640), (200, 180, 160)).save(image)
+
+        rows = {}
+        for backend in ("torch", "onnx"):
+            resolved = face_detection.resolve_backend(backend)
+            if resolved is None:
+                print(f"{backend}: not available, skipped")
+                continue
+            rows[backend] = run_probe(*resolved, image, iterations)
+
+    metrics = ["router_import_s", "model_load_s", "first_inference_s", "p50_ms", "p95_ms", "max_rss_mb", "faces"]
+    print(f"{'':>18} " + " ".join(f"{b:>10}" for b in rows))
+    for metric in metrics:
+        values = " ".join(f"{rows[b][metric]:>10.3f}" if rows[b] else f"{'error':>10}" for b in rows)
+        print(f"{metric:>18} {values}")
@@ -0,0 +1,85 @@
+import sys
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+import numpy as np
+
+from app.utils import face_detection
+
+# Usage: python scripts/benchmark_face_detection.py [images] [image_dir]
+# Runs on CPU only. Without an image_dir, random 640x640 images are used.
+
+BATCH_SIZES = [1, 2, 4, 8, 16]
+
+
+def make_images(count, directory):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i}.jpg")
+        Image.fromarray(rng.integers(0, 255, (640, 640, 3), dtype=np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def bench_batch_sizes(paths):
+    """Calls the model directly, one predict() per batch."""
+    backend, model_path = face_detection.resolve_backend()
+    print(f"backend: {backend} ({model_path})")
+    model = face_detection.load_model(backend, model_path)
+    face_detection.predict_face_counts(model, paths[:1])  # warm-up
+
+    print("batch size | images/s | ms/image")
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        for i in range(0, len(paths), batch_size):
+            face_detection.predict_face_counts(model, paths[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>10} | {len(paths) / elapsed:>8.1f} | {elapsed / len(paths) * 1000:>8.1f}")
+
+
+def bench_service(paths, concurrency=16):
+    """Sends concurrent requests through the micro-batching service."""
+    print(f"\nservice, {concurrency} concurrent clients")
+    print("max batch | images/s | rejected")
+    for batch_size in BATCH_SIZES:
+        service = face_detection.FaceDetectionService(max_batch_size=batch_size, max_queue_size=len(paths))
+        service.count_faces(paths[0])  # starts the worker and loads the model
+
+        rejected = 0
+        def call(path):
+            nonlocal rejected
+            try:
+                service.count_faces(path)
+            except face_detection.FaceDetectionOverloaded:
+                rejected += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, paths))
+        elapsed = time.perf_counter() - start
+        service.shutdown()
+        print(f"{batch_size:>9} | {len(paths) / elapsed:>8.1f} | {rejected:>8}")
+
+
+if __name__ == "__main__":
+    if not face_detection.is_available():
+        print("No face model available (see FACE_DETECTION_BACKEND).")
+        sys.exit(1)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 2:
+            image_dir = sys.argv[2]
+            paths = sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir))[:count]
+        else:
+            paths = make_images(count, tmp)
+
+        bench_batch_sizes(paths)
+        bench_service(paths)
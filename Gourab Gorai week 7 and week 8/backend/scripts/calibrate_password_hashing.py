@@ -0,0 +1,33 @@
+import sys
+import os
+import argparse
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import security
+from app.utils import password_hashing
+
+# Usage: python scripts/calibrate_password_hashing.py [--target-ms 250]
+# Run on the deployment hardware. Prints how long one login's password check
+# takes at a few pbkdf2 round counts, then the PASSWORD_HASH_ROUNDS value that
+# hits the target. Put that in .env, or set PASSWORD_HASH_TARGET_MS to have the
+# API calibrate itself at startup. Stored hashes with fewer rounds (and legacy
+# bcrypt hashes) are upgraded the next time their user logs in.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick a pbkdf2 round count for this machine.")
+    parser.add_argument("--target-ms", type=float, default=250, help="time one verification should take")
+    args = parser.parse_args()
+
+    print("   rounds | ms per verify")
+    for rounds in (password_hashing.MIN_ROUNDS, 100_000, 300_000, 600_000):
+        print(f"{rounds:>9} | {password_hashing.measure_verify_seconds(rounds) * 1000:>13.1f}")
+
+    rounds = password_hashing.calibrate_rounds(args.target_ms)
+    print(f"\nPASSWORD_HASH_ROUNDS={rounds}  (current: {security.PBKDF2_ROUNDS or 'passlib default'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import sys
+import os
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils import face_detection
+
+# Exports final_face_model.pt to final_face_model.onnx next to it.
+# Needs ultralytics (and onnx) on the machine doing the export only; the API
+# then needs just onnxruntime.
+
+def export_onnx(imgsz: int = 640):
+    from ultralytics import YOLO
+
+    if not os.path.exists(face_detection.MODEL_PATH):
+        print(f"Model not found: {face_detection.MODEL_PATH}")
+        return
+
+    model = YOLO(face_detection.MODEL_PATH)
+    # dynamic=True keeps the batch dimension open so requests can be batched
+    exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    target = face_detection.ONNX_MODEL_PATH
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    print(f"Exported ONNX model to {target}")
+
+if __name__ == "__main__":
+    export_onnx(int(sys.argv[1]) if len(sys.argv) > 1 else 640)
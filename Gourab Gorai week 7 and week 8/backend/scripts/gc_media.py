@@ -0,0 +1,53 @@
+import sys
+import os
+import argparse
+import time
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import database
+from app.utils import media_gc, storage
+
+# Usage: python scripts/gc_media.py [--mode report|quarantine|delete] [--grace-hours 24] [--remote]
+# Run from the backend directory. The default mode only lists orphaned files.
+# Quarantined local files go to media_quarantine/<timestamp>/ and can be moved
+# back if something turns out to still need them.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove media files no database row refers to.")
+    parser.add_argument("--mode", choices=media_gc.MODES, default="report")
+    parser.add_argument("--grace-hours", type=float, default=media_gc.GRACE_HOURS,
+                        help="leave files younger than this alone")
+    parser.add_argument("--rate", type=float, default=50, help="max local removals per second (0 = no limit)")
+    parser.add_argument("--batch-size", type=int, default=500, help="files per directory-walk batch")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--remote", action="store_true", help="also sweep the Cloudinary folder")
+    parser.add_argument("--remote-rate", type=float, default=2, help="max Cloudinary API calls per second")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        local, remote = media_gc.mark(db)
+    finally:
+        db.close()
+    print(f"Marked {len(local)} local files and {len(remote)} Cloudinary assets as in use "
+          f"({time.perf_counter() - start:.1f}s).")
+
+    stats = media_gc.sweep_local(local, mode=args.mode, grace_hours=args.grace_hours, rate=args.rate,
+                                 batch_size=args.batch_size, pause=args.pause)
+    print(f"Local: {stats}")
+
+    if args.remote:
+        if storage.get_storage_type() != "cloudinary":
+            print("Skipping Cloudinary: credentials not configured.")
+        else:
+            stats = media_gc.sweep_cloudinary(remote, mode=args.mode, grace_hours=args.grace_hours, rate=args.remote_rate)
+            print(f"Cloudinary: {stats}")
+    print(f"Done in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import inspect, text
+from app.database import engine, SessionLocal
+from app.models import Notification, NotificationUnreadCount
+from app import unread_counters
+
+# Usage: python scripts/migrate_notification_unread.py
+#
+# Turns notifications.is_read from the "true"/"false" strings into a boolean,
+# adds the (recipient_id, is_read, created_at) index and fills
+# notification_unread_counts from the existing rows. Safe to run again.
+
+def _is_read_is_boolean(conn):
+    for column in inspect(conn).get_columns("notifications"):
+        if column["name"] == "is_read":
+            return column["type"].python_type is bool
+    return False
+
+def convert_is_read(conn):
+    if _is_read_is_boolean(conn):
+        print("notifications.is_read is already a boolean.")
+        return
+
+    print("Converting notifications.is_read to a boolean...")
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE notifications ALTER COLUMN is_read DROP DEFAULT"))
+        conn.execute(text(
+            "ALTER TABLE notifications ALTER COLUMN is_read TYPE BOOLEAN "
+            "USING COALESCE(is_read = 'true', false)"
+        ))
+        conn.execute(text("ALTER TABLE notifications ALTER COLUMN is_read SET DEFAULT false"))
+        conn.execute(text("ALTER TABLE notifications ALTER COLUMN is_read SET NOT NULL"))
+        return
+
+    # SQLite cannot change a column's type: rebuild the table around it
+    old_indexes = [index["name"] for index in inspect(conn).get_indexes("notifications")]
+    old_columns = {column["name"] for column in inspect(conn).get_columns("notifications")}
+    conn.execute(text("ALTER TABLE notifications RENAME TO notifications_old"))
+    for name in old_indexes:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    Notification.__table__.create(conn)
+    # Columns added since (e.g. actor_count) take their defaults
+    columns = [c.name for c in Notification.__table__.columns if c.name != "is_read" and c.name in old_columns]
+    column_list = ", ".join(columns)
+    conn.execute(text(
+        f"INSERT INTO notifications ({column_list}, is_read) "
+        f"SELECT {column_list}, CASE WHEN is_read IN ('true', '1', 1) THEN 1 ELSE 0 END FROM notifications_old"
+    ))
+    conn.execute(text("DROP TABLE notifications_old"))
+
+def migrate_notification_unread():
+    with engine.begin() as conn:
+        convert_is_read(conn)
+        # Postgres keeps the old table, so the index may still be missing there
+        for index in Notification.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        NotificationUnreadCount.__table__.create(conn, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        users = unread_counters.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Unread counters rebuilt for {users} users.")
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    migrate_notification_unread()
@@ -1,103 +1,282 @@
-import sys
-import os
-
-# Add parent directory to path so we can import app modules
-sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-
-from sqlalchemy.orm import Session
-from app import models, database
-from app.utils import storage
-
-def migrate_images():
-    print("Starting migration to Cloudinary...")
-    
-    # Ensure we are in Cloudinary mode for upload, even if env var is not set explicitly to 'cloudinary'
-    # we can force it or just rely on storage.get_storage_type() which checks for keys.
-    # But usually we run this script with the intention to upload.
-    # Let's check keys.
-    if storage.get_storage_type() != "cloudinary":
-        print("Error: Cloudinary credentials not found or STORAGE_TYPE is explicitly 'local'.")
-        print("Please set CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET in your environment.")
-        return
-
-    db = database.SessionLocal()
-    
-    try:
-        # Migrate User Profile Pictures
-        users = db.query(models.User).filter(models.User.profile_picture != None).all()
-        print(f"Checking {len(users)} users for local profile pictures...")
-        
-        for user in users:
-            pic = user.profile_picture
-            if pic and pic.startswith("/uploads/"):
-                # It's a local path.
-                # Convert to absolute file path.
-                # stored as: /uploads/profile_pics/filename
-                # we are in backend/scripts/..
-                # backend/uploads/...
-                
-                # relative_path = pic.lstrip("/")
-                # file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", relative_path))
-                
-                # Simpler: The backend root is parent of scripts.
-                # uploads is in backend root.
-                
-                relative_path = pic.lstrip("/") # uploads/profile_pics/...
-                backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                file_path = os.path.join(backend_root, relative_path)
-                
-                if os.path.exists(file_path):
-                    print(f"Uploading {file_path}...")
-                    try:
-                        new_url = storage.upload_local_file(file_path, folder="profile_pics")
-                        if new_url and "http" in new_url:
-                            user.profile_picture = new_url
-                            print(f" -> Uploaded: {new_url}")
-                        else:
-                            print(" -> Upload returned non-http path, skipping DB update.")
-                    except Exception as e:
-                        print(f" -> Failed: {e}")
-                else:
-                    print(f" -> File not found: {file_path}")
-        
-        db.commit()
-        
-        # Migrate Shoutout Media
-        media_items = db.query(models.ShoutOutMedia).all()
-        print(f"Checking {len(media_items)} media items...")
-        
-        for item in media_items:
-            path = item.file_path
-            # Check if local. Shoutouts saved as "uploads/..." (no leading slash sometimes, or yes?)
-            # In shoutouts.py before my change: file_path = f"uploads/{unique_filename}"
-            # So likely "uploads/..." without leading slash.
-            
-            # Helper to check if it looks like a url
-            if path and not path.startswith("http"):
-                # It is local
-                # normalize path to locate it
-                
-                # if starts with /, remove it for joining
-                rel = path.lstrip("/")
-                backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                file_path = os.path.join(backend_root, rel)
-                
-                if os.path.exists(file_path):
-                    print(f"Uploading {file_path}...")
-                    try:
-                        new_url = storage.upload_local_file(file_path, folder="shoutouts")
-                        item.file_path = new_url
-                        print(f" -> Uploaded: {new_url}")
-                    except Exception as e:
-                        print(f" -> Failed: {e}")
-                else:
-                    print(f" -> File not found: {file_path}")
-
-        db.commit()
-        print("Migration complete.")
-        
-    finally:
-        db.close()
-
-if __name__ == "__main__":
-    migrate_images()
+import sys
+import os
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import models, database
+from app.utils import derivatives, storage
+
+# Usage: python scripts/migrate_to_cloudinary.py [--workers 8] [--batch-size 200] [--dry-run]
+#
+# Uploads every local profile picture and shoutout media file to Cloudinary and
+# points the rows at the new URLs.
+# - Uploads run on a bounded thread pool; DB rows are updated from the main
+#   thread and committed every --batch-size files.
+# - Every finished upload is appended to the checkpoint file straight away, so
+#   after a crash a rerun skips files that were already uploaded (and applies
+#   their URLs if that batch was never committed). Failed files are simply
+#   retried by the next run.
+# - Each distinct file is uploaded once, even when several rows share it
+#   (content-addressed blobs).
+# - Feed derivatives are built by the worker right after the upload, and only
+#   for files attached to a shoutout; the checkpoint keeps them too.
+# - --target fake uploads to the offline stand-in under uploads/fake_cloudinary
+#   (see storage.FakeCloudinaryStorage), for trying the migration locally.
+#
+# Local files are left in place; delete them once the migration is verified.
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CHECKPOINT = os.path.join(BACKEND_ROOT, "migrate_to_cloudinary.checkpoint.jsonl")
+FAKE_PREFIX = "/uploads/fake_cloudinary/"
+
+
+def is_local(url):
+    return bool(url) and url.startswith("/uploads/") and not url.startswith(FAKE_PREFIX)
+
+
+def local_file(url):
+    return os.path.join(BACKEND_ROOT, url.lstrip("/").replace("/", os.sep))
+
+
+def collect_work(db):
+    """
+    Returns [(kind, folder, url, in_shoutout)], one entry per distinct local
+    file; in_shoutout says whether a shoutout uses it, i.e. needs derivatives.
+    """
+    work = []
+    seen = set()
+
+    # Pending media is still on its way through the media pipeline
+    media = [url for (url,) in db.query(models.ShoutOutMedia.file_path).filter(
+        models.ShoutOutMedia.file_path.like("/uploads/%"),
+        models.ShoutOutMedia.status == "ready",
+    ).distinct().order_by(models.ShoutOutMedia.file_path) if is_local(url)]
+    media_urls = set(media)
+
+    pictures = db.query(models.User.profile_picture).filter(
+        models.User.profile_picture.like("/uploads/%")
+    ).distinct().order_by(models.User.profile_picture)
+    for (url,) in pictures:
+        if is_local(url):
+            work.append(("profile", "profile_pics", url, url in media_urls))
+            seen.add(url)
+
+    for url in media:
+        if url not in seen:
+            work.append(("media", "shoutouts", url, True))
+    return work
+
+
+def load_checkpoint(path):
+    """Reads {local url: (uploaded url, derivatives)} from the checkpoint file."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # half-written last line from a crash
+            done[entry["url"]] = (entry["new_url"], entry.get("derivatives"))
+    return done
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def record(self, url, new_url, media_derivatives):
+        with self._lock:
+            self._file.write(json.dumps({"url": url, "new_url": new_url, "derivatives": media_derivatives}) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def make_uploader(target):
+    backend = storage.FakeCloudinaryStorage() if target == "fake" else storage.get_storage()
+
+    def upload(file_path, folder):
+        # keep_source: local files stay in place until the migration is verified
+        return backend.save_file(file_path, storage.unique_key(folder, file_path), keep_source=True)
+    return upload
+
+
+def upload_one(upload, url, folder, retries, in_shoutout):
+    """Runs on a worker: uploads the file, then builds its derivatives if a shoutout shows it."""
+    file_path = local_file(url)
+    for attempt in range(1, retries + 1):
+        try:
+            new_url = upload(file_path, folder=folder)
+            if not new_url or new_url == url:
+                raise RuntimeError(f"upload returned {new_url!r}")
+            break
+        except FileNotFoundError:
+            raise
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(min(30, 2 ** attempt))
+
+    media_derivatives = None
+    if in_shoutout:
+        try:
+            media_derivatives = derivatives.build_derivatives(new_url) or None
+        except Exception as e:
+            # The original is uploaded; the feed just falls back to it
+            print(f" -> Derivatives for {new_url} failed: {e}")
+    return new_url, media_derivatives
+
+
+def apply_update(db, kind, url, new_url, media_derivatives):
+    """Points every row that uses `url` at `new_url`. Does not commit."""
+    if kind == "profile":
+        db.query(models.User).filter(models.User.profile_picture == url).update(
+            {models.User.profile_picture: new_url}, synchronize_session=False
+        )
+    # A profile picture can also be attached to a shoutout, so media rows are updated for every kind
+    db.query(models.ShoutOutMedia).filter(models.ShoutOutMedia.file_path == url).update(
+        {models.ShoutOutMedia.file_path: new_url, models.ShoutOutMedia.derivatives: media_derivatives},
+        synchronize_session=False,
+    )
+    db.query(models.Blob).filter(models.Blob.url == url).update(
+        {models.Blob.url: new_url, models.Blob.derivatives: media_derivatives}, synchronize_session=False
+    )
+
+
+class Progress:
+    def __init__(self, total, interval=5.0):
+        self.total = total
+        self.interval = interval
+        self.done = self.failed = self.skipped = self.bytes = 0
+        self.start = self.last_report = time.perf_counter()
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        finished = self.done + self.failed + self.skipped
+        rate = self.done / elapsed
+        eta = (self.total - finished) / rate if rate else float("inf")
+        print(
+            f"[{finished}/{self.total}] uploaded {self.done}, resumed {self.skipped}, failed {self.failed} | "
+            f"{rate:.1f} files/s, {self.bytes / elapsed / 1024 ** 2:.2f} MB/s | ETA {eta:.0f}s"
+        )
+
+
+def migrate_images(workers=8, batch_size=200, checkpoint_path=DEFAULT_CHECKPOINT, dry_run=False,
+                   target="cloudinary", retries=3, limit=None):
+    print("Starting migration to Cloudinary...")
+
+    if target == "cloudinary" and storage.get_storage_type() != "cloudinary":
+        print("Error: Cloudinary credentials not found or STORAGE_BACKEND is explicitly 'local'.")
+        print("Please set CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET in your environment.")
+        print("Use --target fake to try the migration against the local stand-in.")
+        return
+
+    db = database.SessionLocal()
+    try:
+        work = collect_work(db)
+        if limit:
+            work = work[:limit]
+        done = load_checkpoint(checkpoint_path)
+        resumed = [(kind, url) for kind, _, url, _ in work if url in done]
+        pending = [item for item in work if item[2] not in done]
+        print(f"{len(work)} local files: {len(resumed)} already uploaded (checkpoint), {len(pending)} to upload.")
+
+        if dry_run:
+            missing = [url for _, _, url, _ in pending if not os.path.exists(local_file(url))]
+            total_bytes = sum(os.path.getsize(local_file(url)) for _, _, url, _ in pending if os.path.exists(local_file(url)))
+            print(f"Dry run: would upload {len(pending) - len(missing)} files ({total_bytes / 1024 ** 2:.1f} MB) "
+                  f"with {workers} workers; {len(missing)} files are missing on disk.")
+            for url in missing[:20]:
+                print(f" -> File not found: {local_file(url)}")
+            return
+
+        progress = Progress(len(work))
+        uncommitted = 0
+
+        def apply(kind, url, new_url, media_derivatives):
+            nonlocal uncommitted
+            apply_update(db, kind, url, new_url, media_derivatives)
+            uncommitted += 1
+            if uncommitted >= batch_size:
+                db.commit()
+                uncommitted = 0
+
+        # Uploads that finished before a crash but whose batch wasn't committed
+        for kind, url in resumed:
+            apply(kind, url, *done[url])
+            progress.skipped += 1
+
+        checkpoint = Checkpoint(checkpoint_path)
+        upload = make_uploader(target)
+        failures = []
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migrate") as pool:
+                in_flight = {}
+                queue = iter(pending)
+                while True:
+                    # Keep a bounded number of uploads queued instead of one future per file
+                    while len(in_flight) < workers * 2:
+                        item = next(queue, None)
+                        if item is None:
+                            break
+                        kind, folder, url, in_shoutout = item
+                        in_flight[pool.submit(upload_one, upload, url, folder, retries, in_shoutout)] = item
+                    if not in_flight:
+                        break
+
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        kind, folder, url, _ = in_flight.pop(future)
+                        try:
+                            new_url, media_derivatives = future.result()
+                        except Exception as e:
+                            progress.failed += 1
+                            failures.append((url, e))
+                            continue
+                        checkpoint.record(url, new_url, media_derivatives)
+                        apply(kind, url, new_url, media_derivatives)
+                        progress.done += 1
+                        progress.bytes += os.path.getsize(local_file(url))
+                    progress.report()
+        finally:
+            db.commit()
+            checkpoint.close()
+
+        progress.report(force=True)
+        for url, e in failures[:20]:
+            print(f" -> Failed: {url}: {e}")
+        if failures:
+            print(f"{len(failures)} files failed; run the script again to retry them.")
+        else:
+            print("Migration complete.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload local images and media to Cloudinary.")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent uploads")
+    parser.add_argument("--batch-size", type=int, default=200, help="files per DB commit")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="resume file")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be uploaded")
+    parser.add_argument("--target", choices=["cloudinary", "fake"], default="cloudinary",
+                        help="'fake' uploads to the local stand-in under uploads/fake_cloudinary")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--limit", type=int, help="only migrate the first N files")
+    args = parser.parse_args()
+    migrate_images(args.workers, args.batch_size, args.checkpoint, args.dry_run, args.target, args.retries, args.limit)
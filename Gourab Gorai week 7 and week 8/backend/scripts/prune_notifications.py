@@ -0,0 +1,33 @@
+import sys
+import os
+import argparse
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import engine
+from app.models import Notification
+from app import changefeed, unread_counters  # deletes are logged and counted as in the server
+from app.utils import notification_retention
+
+# Usage: python scripts/prune_notifications.py [--days 90] [--batch-size 500]
+# One retention pass by hand, the same the server runs in the background.
+# Also creates the created_at index on databases that predate it.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete notifications older than the retention period.")
+    parser.add_argument("--days", type=float, default=notification_retention.RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=notification_retention.BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=notification_retention.BATCH_PAUSE_SECONDS,
+                        help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    for index in Notification.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    deleted = notification_retention.prune_expired(args.days, args.batch_size, args.pause)
+    print(f"Deleted {deleted} notifications older than {args.days:g} days.")
+
+
+if __name__ == "__main__":
+    main()
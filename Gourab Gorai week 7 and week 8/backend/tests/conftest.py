@@ -0,0 +1,43 @@
+import os
+
+# app.database reads this at import time
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.utils import storage
+
+# One in-memory database shared by every thread (the media pipeline uses workers)
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def session_factory(db_session):
+    """For code that opens its own sessions (background workers); same database as db_session."""
+    return TestingSessionLocal
+
+@pytest.fixture
+def fake_cloudinary(tmp_path, monkeypatch):
+    """Runs the test in tmp_path with STORAGE_BACKEND=fake_cloudinary; yields the backend."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("STORAGE_BACKEND", "fake_cloudinary")
+    monkeypatch.setenv("FAKE_CLOUDINARY_FAIL_RATE", "0")
+    storage.get_storage.cache_clear()
+    yield storage.get_storage()
+    storage.get_storage.cache_clear()
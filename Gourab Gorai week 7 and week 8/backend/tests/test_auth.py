@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.routers import auth
+from app.utils.password_hashing import PasswordHasher
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    hasher = PasswordHasher(workers=1)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+
+    def get_test_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.dependency_overrides[get_db] = get_test_db
+    try:
+        yield TestClient(app)
+    finally:
+        hasher.shutdown()
+
+
+def _off_event_loop(monkeypatch, name, calls):
+    """Wraps an auth DB helper so it fails if it's called on the event loop."""
+    original = getattr(auth, name)
+
+    def wrapper(*args):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            calls.append(name)
+            return original(*args)
+        raise AssertionError(f"{name} ran on the event loop")
+
+    monkeypatch.setattr(auth, name, wrapper)
+
+
+def test_register_login_and_reset_run_queries_in_the_threadpool(client, monkeypatch):
+    calls = []
+    for name in ("_find_user", "_add_user", "_set_password"):
+        _off_event_loop(monkeypatch, name, calls)
+    user = {"name": "Alice", "email": "Alice@Example.com", "password": "first-password",
+            "department": "Eng", "role": "employee"}
+
+    assert client.post("/auth/register", json=user).status_code == 201
+    assert client.post("/auth/register", json=user).status_code == 400
+    assert client.post("/auth/login", json={"email": "alice@example.com", "password": "wrong"}).status_code == 401
+    assert client.post("/auth/login", json={"email": "alice@example.com", "password": "first-password"}).status_code == 200
+
+    reset = {"email": "alice@example.com", "new_password": "second-password"}
+    assert client.post("/auth/reset-password", json=reset).status_code == 200
+    assert client.post("/auth/token", data={"username": "alice@example.com", "password": "first-password"}).status_code == 401
+    token = client.post("/auth/token", data={"username": "alice@example.com", "password": "second-password"})
+    assert token.status_code == 200 and token.json()["access_token"]
+    assert set(calls) == {"_find_user", "_add_user", "_set_password"}
@@ -0,0 +1,37 @@
+import os
+
+from app import models
+from app.utils import blob_store, media_pipeline
+
+
+def _stored_blob(db, backend, name):
+    path = os.path.join(os.getcwd(), name)
+    with open(path, "wb") as f:
+        f.write(name.encode())
+    url = backend.save_file(path, f"blobs/{name}")
+    blob = models.Blob(sha256=name.ljust(64, "0"), url=url, size=1, ref_count=1)
+    db.add(blob)
+    db.commit()
+    return url
+
+
+def test_last_release_deletes_files_only_after_commit(db_session, fake_cloudinary):
+    url = _stored_blob(db_session, fake_cloudinary, "a.png")
+    path = media_pipeline.local_path(url)
+
+    assert blob_store.release(db_session, url)
+    db_session.flush()
+    assert os.path.exists(path)  # still there until the commit
+    db_session.commit()
+    assert not os.path.exists(path)
+    assert db_session.query(models.Blob).count() == 0
+
+
+def test_rolled_back_release_keeps_the_files(db_session, fake_cloudinary):
+    url = _stored_blob(db_session, fake_cloudinary, "b.png")
+
+    assert blob_store.release(db_session, url)
+    db_session.rollback()
+    db_session.commit()  # a later commit must not pick up the discarded delete
+    assert os.path.exists(media_pipeline.local_path(url))
+    assert db_session.query(models.Blob).one().ref_count == 1
@@ -0,0 +1,103 @@
+import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import changefeed, models
+from app.database import get_db
+from app.deps import get_current_admin
+from app.routers import admin
+
+
+@pytest.fixture
+def feed(db_session, session_factory, monkeypatch):
+    changefeed.register(session_factory)
+    monkeypatch.setattr(changefeed, "SAFETY_LAG", datetime.timedelta(0))
+    return db_session
+
+
+def _log(db):
+    return [(e.table_name, e.row_id, e.operation) for e in db.query(models.ChangeLog).order_by(models.ChangeLog.id)]
+
+
+def _user(db, name):
+    user = models.User(name=name, email=f"{name}@example.com", password="secret", department="Eng")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_orm_writes_are_logged_at_commit(feed):
+    user = models.User(name="a", email="a@example.com", password="secret", department="Eng")
+    feed.add(user)
+    feed.flush()
+    assert _log(feed) == []  # nothing before the commit
+
+    flushed_at = datetime.datetime.utcnow()
+    feed.commit()
+    # Stamped at commit, not at the flush, so a slow transaction doesn't fall behind the lag
+    assert feed.query(models.ChangeLog).one().changed_at >= flushed_at
+    user.name = "b"
+    feed.commit()
+    feed.delete(user)
+    feed.commit()
+    assert _log(feed) == [("users", user.id, "upsert")] * 2 + [("users", user.id, "delete")]
+
+
+def test_rolled_back_writes_are_not_logged(feed):
+    feed.add(models.User(name="a", email="a@example.com", password="secret", department="Eng"))
+    feed.flush()
+    feed.rollback()
+    _user(feed, "b")
+    assert [entry[0] for entry in _log(feed)] == ["users"]
+
+
+def test_bulk_update_and_delete_are_captured(feed):
+    a, b, c = (_user(feed, name).id for name in "abc")
+    feed.query(models.User).filter(models.User.id.in_([a, b])).update(
+        {models.User.department: "Ops"}, synchronize_session=False
+    )
+    feed.query(models.User).filter(models.User.id == c).delete(synchronize_session=False)
+    feed.commit()
+    assert _log(feed)[3:] == [("users", a, "upsert"), ("users", b, "upsert"), ("users", c, "delete")]
+
+
+def test_pages_follow_the_cursor_and_hide_excluded_columns(feed):
+    ids = [_user(feed, name).id for name in "abcde"]
+    feed.delete(feed.get(models.User, ids[4]))
+    feed.commit()
+
+    seen, since, after_id = [], None, 0
+    while True:
+        page = changefeed.fetch_changes(feed, since=since, after_id=after_id, limit=2)
+        seen += page["changes"]
+        since, after_id = page["next_since"], page["next_after_id"]
+        if not page["has_more"]:
+            break
+
+    # The last page holds e's insert and delete, which collapse into one tombstone
+    assert [(c["id"], c["operation"]) for c in seen] == [(i, "upsert") for i in ids[:4]] + [(ids[4], "delete")]
+    assert seen[0]["data"]["name"] == "a" and "password" not in seen[0]["data"]
+    assert seen[4]["data"] is None
+    assert changefeed.fetch_changes(feed, since=since, after_id=after_id)["changes"] == []
+
+
+def test_recent_entries_wait_for_the_safety_lag(feed, monkeypatch):
+    _user(feed, "a")
+    monkeypatch.setattr(changefeed, "SAFETY_LAG", datetime.timedelta(minutes=1))
+    assert changefeed.fetch_changes(feed)["changes"] == []
+
+
+def test_changes_endpoint(feed):
+    user = _user(feed, "a")
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.dependency_overrides[get_db] = lambda: feed
+    app.dependency_overrides[get_current_admin] = lambda: user
+    client = TestClient(app)
+
+    response = client.get("/admin/changes", params={"tables": "users"})
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()["changes"]] == [user.id]
+    assert client.get("/admin/changes", params={"tables": "users,secrets"}).status_code == 400
@@ -0,0 +1,109 @@
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import models
+from app.database import get_db
+from app.deps import get_current_user
+from app.routers import uploads
+from app.utils import chunked_uploads, media_pipeline
+
+@pytest.fixture
+def client(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    user = models.User(name="a", email="a@example.com", password="x", department="Eng")
+    db_session.add(user)
+    db_session.commit()
+    queued = []
+    monkeypatch.setattr(media_pipeline.pipeline, "enqueue", lambda *args, **kwargs: queued.append(args))
+
+    app = FastAPI()
+    app.include_router(uploads.router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: user
+    test_client = TestClient(app)
+    test_client.user, test_client.queued = user, queued
+    return test_client
+
+def _create(client, size, content_type="video/mp4"):
+    return client.post("/media/uploads", json={"filename": "clip.mp4", "content_type": content_type, "size": size})
+
+def _patch(client, upload_id, offset, data):
+    return client.patch(f"/media/uploads/{upload_id}", content=data, headers={"Upload-Offset": str(offset)})
+
+def test_chunks_are_written_in_place_and_completed(client, db_session):
+    content = os.urandom(3000)
+    created = _create(client, len(content))
+    assert created.status_code == 201 and created.headers["Upload-Offset"] == "0"
+    upload_id = created.json()["id"]
+    assert os.path.getsize(chunked_uploads.partial_path(upload_id)) == len(content)
+
+    assert _patch(client, upload_id, 0, content[:1000]).json()["received"] == 1000
+    # A retried chunk from the old offset is refused with the current one
+    stale = _patch(client, upload_id, 0, content[:1000])
+    assert stale.status_code == 409 and stale.headers["Upload-Offset"] == "1000"
+    assert client.get(f"/media/uploads/{upload_id}").headers["Upload-Offset"] == "1000"
+
+    shoutout = models.ShoutOut(sender_id=client.user.id, message="video")
+    db_session.add(shoutout)
+    db_session.commit()
+    early = client.post(f"/media/uploads/{upload_id}/complete", json={"shoutout_id": shoutout.id})
+    assert early.status_code == 409
+
+    assert _patch(client, upload_id, 1000, content[1000:]).json()["received"] == 3000
+    completed = client.post(f"/media/uploads/{upload_id}/complete", json={"shoutout_id": shoutout.id})
+    assert completed.status_code == 200
+
+    media = db_session.query(models.ShoutOutMedia).one()
+    assert media.status == "pending" and media.media_type == models.MediaType.VIDEO
+    with open(media_pipeline.local_path(media.file_path), "rb") as f:
+        assert f.read() == content
+    assert client.queued == [(media.id, media.file_path)]
+    assert db_session.query(models.UploadSession).count() == 0
+
+def test_oversized_chunk_is_cut_off(client, monkeypatch):
+    monkeypatch.setattr(chunked_uploads, "MAX_CHUNK_BYTES", 100)
+    upload_id = _create(client, 1000).json()["id"]
+
+    response = _patch(client, upload_id, 0, b"x" * 500)
+
+    assert response.status_code == 413
+    assert int(response.headers["Upload-Offset"]) <= 100
+
+def test_session_count_and_byte_quotas(client, monkeypatch):
+    monkeypatch.setattr(chunked_uploads, "USER_MAX_SESSIONS", 2)
+    monkeypatch.setattr(chunked_uploads, "USER_QUOTA_BYTES", 1500)
+
+    assert _create(client, 1000).status_code == 201
+    assert _create(client, 600).status_code == 413
+    assert _create(client, 500).status_code == 201
+    assert _create(client, 1).status_code == 429
+
+def test_rejects_other_types_and_other_users_sessions(client, db_session):
+    assert _create(client, 10, content_type="application/pdf").status_code == 400
+    upload_id = _create(client, 10).json()["id"]
+
+    other = models.User(name="b", email="b@example.com", password="x", department="Eng")
+    db_session.add(other)
+    db_session.commit()
+    client.app.dependency_overrides[get_current_user] = lambda: other
+    assert client.get(f"/media/uploads/{upload_id}").status_code == 404
+    assert _patch(client, upload_id, 0, b"x").status_code == 404
+
+def test_concurrent_completes_leave_one_winner(client, db_session, session_factory):
+    upload_id = _create(client, 10).json()["id"]
+    _patch(client, upload_id, 0, b"x" * 10)
+    shoutout = models.ShoutOut(sender_id=client.user.id, message="video")
+    db_session.add(shoutout)
+    db_session.commit()
+
+    # The loser read the session before the winner finalized it
+    other_db = session_factory()
+    stale = chunked_uploads.get_session(other_db, upload_id, client.user)
+    assert client.post(f"/media/uploads/{upload_id}/complete", json={"shoutout_id": shoutout.id}).status_code == 200
+
+    with pytest.raises(chunked_uploads.UploadSessionError) as lost:
+        chunked_uploads.finalize(other_db, stale, other_db.get(models.ShoutOut, shoutout.id))
+    other_db.close()
+    assert lost.value.status_code == 409
+    assert db_session.query(models.ShoutOutMedia).count() == 1
@@ -0,0 +1,22 @@
+from sqlalchemy import select
+
+from app import models
+from app.utils import csv_export
+
+
+def test_header_is_sent_before_the_query_runs(db_session, session_factory, monkeypatch):
+    db_session.add(models.User(name="a", email="a@example.com", password="x", department="Eng"))
+    db_session.commit()
+    executed = []
+
+    def session():
+        db = session_factory()
+        execute = db.execute
+        db.execute = lambda *args, **kwargs: executed.append(True) or execute(*args, **kwargs)
+        return db
+    monkeypatch.setattr(csv_export, "SessionLocal", session)
+
+    chunks = csv_export.stream_query_csv(select(models.User.name, models.User.email), ["Name", "Email"])
+    assert next(chunks) == "Name,Email\r\n"
+    assert executed == []
+    assert list(chunks) == ["a,a@example.com\r\n"] and executed == [True]
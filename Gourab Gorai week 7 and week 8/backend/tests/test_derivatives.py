@@ -0,0 +1,26 @@
+from PIL import Image
+from app.utils.derivatives import generate_derivatives
+
+def test_generate_derivatives_never_upscales(tmp_path):
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (800, 600), (200, 100, 50)).save(source)
+
+    derivatives = generate_derivatives(str(source))
+
+    assert [(d["width"], d["format"]) for d in derivatives] == [
+        (320, "jpg"), (320, "webp"), (640, "jpg"), (640, "webp"),
+    ]
+
+def test_generate_derivatives_uses_the_rotated_size(tmp_path):
+    # Stored landscape, shown as a 700 px wide portrait once EXIF orientation 6 is applied
+    source = tmp_path / "portrait.jpg"
+    image = Image.new("RGB", (1400, 700), (200, 100, 50))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    image.save(source, exif=exif.tobytes())
+
+    derivatives = generate_derivatives(str(source))
+
+    assert sorted({d["width"] for d in derivatives}) == [320, 640]
+    with Image.open(tmp_path / "portrait_w640.webp") as copy:
+        assert copy.size == (640, 1280)
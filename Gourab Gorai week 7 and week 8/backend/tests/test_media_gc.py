@@ -0,0 +1,121 @@
+import datetime
+import os
+import time
+
+from app import models
+from app.utils import media_gc
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0, 0)
+CLOUD = "https://res.cloudinary.com/demo/image/upload"
+
+
+class FakeAdminApi:
+    """Stands in for cloudinary.api: serves `resources` two per page and records deletes."""
+
+    def __init__(self, resources):
+        self.resources_by_type = resources
+        self.deleted = []
+
+    def resources(self, type, resource_type, prefix, max_results, next_cursor=None):
+        resources = [r for r in self.resources_by_type.get(resource_type, []) if r["public_id"].startswith(prefix)]
+        start = int(next_cursor or 0)
+        page = {"resources": resources[start:start + 2]}
+        if start + 2 < len(resources):
+            page["next_cursor"] = str(start + 2)
+        return page
+
+    def delete_resources(self, public_ids, resource_type):
+        self.deleted.extend((resource_type, public_id) for public_id in public_ids)
+
+
+class FakeUploader:
+    def __init__(self):
+        self.renamed = []
+
+    def rename(self, public_id, new_public_id, resource_type):
+        self.renamed.append((public_id, new_public_id))
+
+
+def _resource(public_id, age_hours):
+    created_at = NOW - datetime.timedelta(hours=age_hours)
+    return {"public_id": public_id, "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%SZ"), "bytes": 100}
+
+
+def _write(path, age_hours):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * 10)
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+
+
+def test_mark_splits_local_and_cloudinary_references(db_session):
+    user = models.User(name="a", email="a@example.com", password="x", department="Eng",
+                       profile_picture="/uploads/profile_pics/a.png")
+    db_session.add(user)
+    db_session.commit()
+    shoutout = models.ShoutOut(sender_id=user.id, message="hi")
+    db_session.add(shoutout)
+    db_session.commit()
+    db_session.add(models.ShoutOutMedia(
+        shoutout_id=shoutout.id, file_path=f"{CLOUD}/v1/bragboard/shoutouts/photo.jpg",
+        derivatives=[{"width": 320, "format": "webp", "url": f"{CLOUD}/c_limit,w_320/bragboard/shoutouts/photo.webp"}]))
+    db_session.add(models.Blob(sha256="0" * 64, url="/uploads/blobs/00/" + "0" * 62 + ".png", size=1))
+    db_session.commit()
+
+    local, remote = media_gc.mark(db_session)
+
+    assert local == {"profile_pics/a.png", "blobs/00/" + "0" * 62 + ".png"}
+    assert remote == {"bragboard/shoutouts/photo"}
+
+
+def test_sweep_local_deletes_only_old_orphans(tmp_path):
+    root = tmp_path / "uploads"
+    _write(root / "shoutouts" / "kept.jpg", age_hours=48)
+    _write(root / "shoutouts" / "orphan.jpg", age_hours=48)
+    _write(root / "shoutouts" / "just_uploaded.jpg", age_hours=0)
+
+    stats = media_gc.sweep_local({"shoutouts/kept.jpg"}, root=str(root), mode="delete", rate=0, pause=0)
+
+    assert (stats.orphaned, stats.removed, stats.recent) == (1, 1, 1)
+    assert sorted(p.name for p in root.rglob("*") if p.is_file()) == ["just_uploaded.jpg", "kept.jpg"]
+
+
+def test_sweep_cloudinary_deletes_old_orphans_across_pages():
+    api = FakeAdminApi({
+        "image": [_resource("bragboard/shoutouts/kept", 48), _resource("bragboard/shoutouts/old", 48),
+                  _resource("bragboard/shoutouts/new", 1), _resource("bragboard/quarantine/moved", 48),
+                  _resource("other_app/photo", 48)],
+        "video": [_resource("bragboard/shoutouts/clip", 48)],
+    })
+
+    stats = media_gc.sweep_cloudinary({"bragboard/shoutouts/kept"}, mode="delete", rate=0, api=api,
+                                      uploader=FakeUploader(), now=NOW)
+
+    assert sorted(api.deleted) == [("image", "bragboard/shoutouts/old"), ("video", "bragboard/shoutouts/clip")]
+    assert (stats.scanned, stats.orphaned, stats.removed, stats.recent) == (5, 2, 2, 1)
+
+
+def test_sweep_cloudinary_quarantine_renames_instead_of_deleting():
+    api = FakeAdminApi({"image": [_resource("bragboard/shoutouts/old", 48)]})
+    uploader = FakeUploader()
+
+    stats = media_gc.sweep_cloudinary(set(), mode="quarantine", rate=0, api=api, uploader=uploader, now=NOW)
+
+    assert api.deleted == []
+    assert uploader.renamed == [("bragboard/shoutouts/old", "bragboard/quarantine/bragboard/shoutouts/old")]
+    assert stats.removed == 1
+
+
+def test_rate_limiter_spaces_calls():
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    limiter = media_gc.RateLimiter(4, clock=lambda: clock[0], sleep=sleep)
+    for _ in range(3):
+        limiter.wait()
+
+    assert sleeps == [0.25, 0.25]
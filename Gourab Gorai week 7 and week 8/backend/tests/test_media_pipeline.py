@@ -0,0 +1,127 @@
+import pytest
+from app import models
+from app.utils import media_pipeline, storage
+
+def _spool(name, content=b"media bytes"):
+    path = media_pipeline.local_path(f"/uploads/spool/{name}")
+    media_pipeline.os.makedirs(media_pipeline.SPOOL_DIR, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return f"/uploads/spool/{name}"
+
+def _pending_media(db, *spooled_urls):
+    user = models.User(name="a", email="a@example.com", password="x", department="Eng")
+    db.add(user)
+    db.commit()
+    shoutout = models.ShoutOut(sender_id=user.id, message="hi")
+    db.add(shoutout)
+    db.commit()
+    media = [models.ShoutOutMedia(shoutout_id=shoutout.id, file_path=url, media_type=models.MediaType.VIDEO,
+                                  status="pending") for url in spooled_urls]
+    db.add_all(media)
+    db.commit()
+    return [m.id for m in media]
+
+def _flaky_network(monkeypatch, failures):
+    calls = []
+    def network():
+        calls.append(1)
+        if failures is None or len(calls) <= failures:
+            raise ConnectionError("simulated")
+    monkeypatch.setattr(storage, "simulate_fake_cloudinary_network", network)
+    return calls
+
+def test_upload_retries_with_exponential_backoff(fake_cloudinary, monkeypatch):
+    calls = _flaky_network(monkeypatch, failures=2)
+    monkeypatch.setattr(media_pipeline.random, "random", lambda: 1.0)  # no jitter
+    sleeps = []
+
+    url = media_pipeline.upload_with_retry(media_pipeline.local_path(_spool("a.mp4")), "shoutouts",
+                                           max_attempts=5, backoff=1.0, sleep=sleeps.append)
+
+    assert len(calls) == 3 and sleeps == [1.0, 2.0]
+    assert url.startswith("/uploads/fake_cloudinary/bragboard/shoutouts/")
+
+def test_upload_gives_up_after_max_attempts(fake_cloudinary, monkeypatch):
+    calls = _flaky_network(monkeypatch, failures=None)
+    sleeps = []
+    with pytest.raises(ConnectionError):
+        media_pipeline.upload_with_retry(media_pipeline.local_path(_spool("a.mp4")), "shoutouts",
+                                         max_attempts=3, backoff=0.5, sleep=sleeps.append)
+    assert len(calls) == 3 and len(sleeps) == 2
+    # Jitter keeps each delay between half and all of the exponential step
+    assert 0.25 <= sleeps[0] <= 0.5 and 0.5 <= sleeps[1] <= 1.0
+
+def test_failed_upload_marks_media_failed(db_session, session_factory, fake_cloudinary, monkeypatch):
+    _flaky_network(monkeypatch, failures=None)
+    spooled = _spool("a.mp4")
+    (media_id,) = _pending_media(db_session, spooled)
+    pipeline = media_pipeline.MediaUploadPipeline(max_workers=1, max_attempts=2, backoff=0,
+                                                  session_factory=session_factory)
+
+    pipeline.enqueue(media_id, spooled).result()
+    pipeline.shutdown(wait=True)
+
+    db_session.expire_all()
+    media = db_session.get(models.ShoutOutMedia, media_id)
+    assert media.status == "failed" and media.file_path == spooled
+    assert db_session.query(models.Blob).count() == 0
+
+def test_identical_uploads_share_one_blob(db_session, session_factory, fake_cloudinary):
+    first, second = _spool("a.mp4"), _spool("b.mp4")
+    ids = _pending_media(db_session, first, second)
+    pipeline = media_pipeline.MediaUploadPipeline(max_workers=1, session_factory=session_factory)
+
+    for media_id, url in zip(ids, (first, second)):
+        pipeline.enqueue(media_id, url).result()
+    pipeline.shutdown(wait=True)
+
+    db_session.expire_all()
+    rows = [db_session.get(models.ShoutOutMedia, media_id) for media_id in ids]
+    assert [m.status for m in rows] == ["ready", "ready"]
+    assert rows[0].file_path == rows[1].file_path
+    assert rows[0].file_path.startswith("/uploads/fake_cloudinary/bragboard/blobs/")
+    blob = db_session.query(models.Blob).one()
+    assert blob.ref_count == 2
+    assert not media_pipeline.os.path.exists(media_pipeline.local_path(second))
+
+def test_resume_pending_requeues_surviving_spool_files(db_session, session_factory, fake_cloudinary, monkeypatch):
+    kept = _spool("kept.mp4")
+    ids = _pending_media(db_session, kept, "/uploads/spool/lost.mp4")
+    pipeline = media_pipeline.MediaUploadPipeline(session_factory=session_factory)
+    queued = []
+    monkeypatch.setattr(pipeline, "enqueue", lambda media_id, url, *args, **kwargs: queued.append((media_id, url)))
+
+    pipeline.resume_pending()
+
+    assert queued == [(ids[0], kept)]
+
+def test_deleted_media_does_not_remove_a_shared_blob(db_session, session_factory, fake_cloudinary, monkeypatch):
+    first, second = _spool("a.mp4"), _spool("b.mp4")
+    ids = _pending_media(db_session, first, second)
+    pipeline = media_pipeline.MediaUploadPipeline(max_workers=1, session_factory=session_factory)
+    pipeline.enqueue(ids[0], first).result()
+    db_session.expire_all()
+    stored = db_session.get(models.ShoutOutMedia, ids[0]).file_path
+
+    # The second upload raced the first (it saw no blob) and its shoutout is gone by the time it finishes
+    monkeypatch.setattr(pipeline, "_reuse_blob", lambda digest: None)
+    db_session.delete(db_session.get(models.ShoutOutMedia, ids[1]))
+    db_session.commit()
+    pipeline.enqueue(ids[1], second).result()
+    pipeline.shutdown(wait=True)
+
+    db_session.expire_all()
+    assert media_pipeline.os.path.exists(media_pipeline.local_path(stored))
+    assert db_session.query(models.Blob).one().ref_count == 1
+
+def test_spool_upload_hashes_while_writing(fake_cloudinary):
+    import hashlib, io
+    from fastapi import UploadFile
+    content = b"x" * (3 * 1024 * 1024 + 5)
+
+    url, digest, size = media_pipeline.spool_upload(UploadFile(io.BytesIO(content), filename="clip.mp4"))
+
+    assert (digest, size) == (hashlib.sha256(content).hexdigest(), len(content))
+    with open(media_pipeline.local_path(url), "rb") as f:
+        assert f.read() == content
@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models, unread_counters
+from app.database import get_db
+from app.deps import get_current_user
+from app.routers import shoutouts
+from app.utils import notifications
+
+
+def _users(db, count):
+    users = [models.User(name=f"u{i}", email=f"u{i}@example.com", password="x", department="Eng")
+             for i in range(count)]
+    db.add_all(users)
+    db.commit()
+    return users
+
+
+def test_replay_resends_notifications_that_committed_late(db_session):
+    alice, bob = _users(db_session, 2)
+    now = datetime.datetime.utcnow()
+    old, late, seen = [
+        models.Notification(recipient_id=alice.id, sender_id=bob.id, type="comment", message=message, created_at=at)
+        for message, at in (("old", now - datetime.timedelta(hours=1)), ("late", now), ("seen", now))
+    ]
+    db_session.add_all([old, late, seen])
+    db_session.commit()
+
+    # The client saw `seen` before `late`, which has a lower id, had committed
+    assert [e["id"] for e in notifications.replay(db_session, alice.id, seen.id)] == [late.id]
+    assert [e["id"] for e in notifications.replay(db_session, alice.id, old.id)] == [late.id, seen.id]
+    assert notifications.replay(db_session, alice.id, None) == []
+
+
+@pytest.fixture
+def reactions(db_session, session_factory):
+    """Users u0..u2 and a shoutout by u0; react(user) toggles user's like through the route."""
+    unread_counters.register(session_factory)
+    users = _users(db_session, 3)
+    shoutout = models.ShoutOut(sender_id=users[0].id, message="shipped it")
+    db_session.add(shoutout)
+    db_session.commit()
+
+    acting = {}
+    app = FastAPI()
+    app.include_router(shoutouts.router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: acting["user"]
+    client = TestClient(app)
+
+    def react(user):
+        acting["user"] = user
+        assert client.post(f"/shoutouts/{shoutout.id}/react", json={"type": "like"}).status_code == 200
+        return db_session.query(models.Notification).filter_by(recipient_id=users[0].id).one_or_none()
+    return users, react
+
+
+def test_merged_reactions_count_people_not_events(reactions):
+    (alice, bob, carol), react = reactions
+
+    react(bob)
+    assert react(carol).actor_count == 2
+    # Bob takes his like back: Carol is the one left, then Bob likes it again
+    notification = react(bob)
+    assert notification.actor_count == 1 and notification.message == "u2 reacted with like to your shoutout!"
+    notification = react(bob)
+    assert notification.actor_count == 2
+    assert notification.message == "u1 and 1 other reacted with like to your shoutout!"
+
+
+def test_withdrawn_reaction_removes_its_notification(reactions, db_session):
+    (alice, bob, _), react = reactions
+
+    assert react(bob) is not None
+    assert unread_counters.unread_count(db_session, alice.id) == 1
+    assert react(bob) is None
+    assert unread_counters.unread_count(db_session, alice.id) == 0
@@ -0,0 +1,25 @@
+import pytest
+from app.utils import storage
+
+
+@pytest.fixture
+def configured(monkeypatch):
+    for name in ("STORAGE_BACKEND", "STORAGE_TYPE", "CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    storage.get_storage.cache_clear()
+    yield monkeypatch
+    storage.get_storage.cache_clear()
+
+
+def test_storage_backend_selects_the_backend(configured):
+    configured.setenv("STORAGE_BACKEND", "fake_s3")
+    assert storage.get_storage_type() == "s3"
+
+
+def test_storage_type_is_still_read_and_loses_to_storage_backend(configured):
+    configured.setenv("STORAGE_TYPE", "fake_cloudinary")
+    assert storage.get_storage_type() == "fake_cloudinary"
+
+    storage.get_storage.cache_clear()
+    configured.setenv("STORAGE_BACKEND", "local")
+    assert storage.get_storage_type() == "local"
@@ -22,18 +22,62 @@ const NotificationSection = () => {
             if (res.ok) {
                 const data = await res.json();
                 setNotifications(data);
-                const unread = data.filter(n => n.is_read === "false").length;
-                setUnreadCount(unread);
+                return data;
             }
         } catch (err) {
             console.error("Failed to fetch notifications", err);
         }
     };
 
+    // The list only holds the latest 20; the server keeps the real count
+    const fetchUnreadCount = async () => {
+        try {
+            const token = sessionStorage.getItem('access_token');
+            if (!token) return;
+
+            const res = await fetch(`${API_BASE}/users/me/notifications/unread-count`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+
+            if (res.ok) {
+                const data = await res.json();
+                setUnreadCount(data.unread);
+            }
+        } catch (err) {
+            console.error("Failed to fetch unread count", err);
+        }
+    };
+
     useEffect(() => {
-        fetchNotifications();
-        const interval = setInterval(fetchNotifications, 60000);
-        return () => clearInterval(interval);
+        let source = null;
+        let cancelled = false;
+
+        // New notifications are pushed over Server-Sent Events instead of polling. The stream
+        // replays whatever is newer than the list we loaded, and again after a reconnect.
+        fetchUnreadCount();
+        fetchNotifications().then((data) => {
+            const token = sessionStorage.getItem('access_token');
+            if (cancelled || !token || typeof EventSource === 'undefined') return;
+            const params = new URLSearchParams({ access_token: token });
+            if (data) params.set('last_event_id', Math.max(0, ...data.map(n => n.id)));
+            source = new EventSource(`${API_BASE}/users/me/notifications/stream?${params}`);
+            source.addEventListener('notification', (event) => {
+                const notification = JSON.parse(event.data);
+                setNotifications(prev => {
+                    // Replays overlap what we have already
+                    if (prev.some(n => n.id === notification.id)) return prev;
+                    return [notification, ...prev].slice(0, 20);
+                });
+                fetchUnreadCount();
+            });
+        });
+
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+        };
     }, []);
 
     const markAsRead = async (id) => {
@@ -0,0 +1,123 @@
+# app/blob_store.py
+"""
+Content-addressed storage for attachments.
+
+Every upload is streamed to a temp file while its SHA-256 is computed and then
+handed once to the storage backend (see storage.py) under the key
+blobs/<ab>/<cdef...><ext> (ab = first two hex chars of the digest).
+Attachment.filename holds that key. The blobs table counts how many
+attachments share each file; the file is removed with the last one.
+
+Uploads are copied in CHUNK_SIZE pieces, so memory use doesn't grow with the
+file, and an upload over max_size is aborted as soon as it crosses the limit.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, storage
+
+DEFAULT_UPLOAD_DIR = storage.UPLOAD_DIR
+CHUNK_SIZE = 1024 * 1024
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(25 * 1024 * 1024)))
+_SAFE_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+class AttachmentTooLarge(ValueError):
+    def __init__(self, max_size: int):
+        super().__init__(f"Attachment exceeds the maximum size of {max_size} bytes")
+        self.max_size = max_size
+
+
+def blob_filename(digest: str, original_filename: Optional[str]) -> str:
+    """Storage key of a blob, e.g. blobs/ab/cdef....png"""
+    extension = Path(original_filename or "").suffix.lower()
+    if not _SAFE_EXTENSION.match(extension):
+        extension = ""
+    return f"blobs/{digest[:2]}/{digest[2:]}{extension}"
+
+
+def _write_temp(fileobj, max_size: Optional[int] = None) -> Tuple[str, str, int]:
+    """Stream to a local temp file while hashing; returns (temp path, sha256 hex, size)"""
+    tmp_dir = DEFAULT_UPLOAD_DIR / "blobs" / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise AttachmentTooLarge(max_size)
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def _acquire(db: Session, digest: str) -> Optional[models.Blob]:
+    """Add a reference to an existing blob, if there is one"""
+    updated = db.query(models.Blob).filter(models.Blob.sha256 == digest).update(
+        {models.Blob.ref_count: models.Blob.ref_count + 1}, synchronize_session=False
+    )
+    if not updated:
+        return None
+    return db.query(models.Blob).filter(models.Blob.sha256 == digest).populate_existing().first()
+
+
+def store(db: Session, fileobj, original_filename: Optional[str], backend: Optional[storage.StorageBackend] = None,
+          max_size: Optional[int] = None) -> models.Blob:
+    """Store an upload, reusing an identical stored file when there is one. Does not commit."""
+    backend = backend or storage.get_storage()
+    tmp_path, digest, size = _write_temp(fileobj, max_size)
+    try:
+        blob = _acquire(db, digest)
+        if blob is not None:
+            if not backend.exists(backend.url_for(blob.filename)):
+                # The row outlived its file; put the content back
+                backend.save_file(tmp_path, blob.filename)
+            return blob
+
+        filename = blob_filename(digest, original_filename)
+        backend.save_file(tmp_path, filename)
+
+        try:
+            with db.begin_nested():
+                blob = models.Blob(sha256=digest, filename=filename, size=size, ref_count=1)
+                db.add(blob)
+            return blob
+        except IntegrityError:
+            # Same content stored concurrently by another request
+            return _acquire(db, digest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def release(db: Session, filename: Optional[str], backend: Optional[storage.StorageBackend] = None):
+    """Drop one reference; the file is deleted with the last one. Does not commit."""
+    if not filename:
+        return
+    blob = db.query(models.Blob).filter(models.Blob.filename == filename).first()
+    if blob is None:
+        # Uploaded before the blob store existed
+        return
+
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        db.delete(blob)
+        backend = backend or storage.get_storage()
+        backend.delete(backend.url_for(filename))
@@ -3,10 +3,14 @@ import bcrypt
 from typing import List
 from datetime import datetime
 import os
-import uuid
-from pathlib import Path
 
-from . import models, schemas
+from . import models, schemas, blob_store, storage
+
+
+# bcrypt cost factor; each extra round doubles the work. Stored hashes with a
+# lower cost are upgraded at the next login (see verify_and_update_password).
+# password_hashing.apply_calibration can pick it for the machine at startup.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 
 # ---------------- INTERNAL UTILS ----------------
@@ -27,21 +31,27 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def create_user(db: Session, user: schemas.UserCreate):
+def hash_password(password: str) -> str:
     # Truncate password to safe length before hashing
-    truncated_password = _truncate_password(user.password)
+    truncated_password = _truncate_password(password)
 
     # Hash password with bcrypt
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return bcrypt.hashpw(
         truncated_password.encode("utf-8"),
         salt
     ).decode("utf-8")
 
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    """
+    hashed_password lets the auth router hash in the password_hashing pool
+    first; without it the password is hashed here.
+    """
     db_user = models.User(
         name=user.name,
         email=user.email,
-        password=hashed,
+        password=hashed_password or hash_password(user.password),
         department=user.department,
         role=user.role if user.role else models.RoleEnum.employee
     )
@@ -60,6 +70,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash ("$2b$<cost>$...")
+    uses a lower cost than BCRYPT_ROUNDS; higher costs are left alone.
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if int(hashed_password.split("$")[2]) < BCRYPT_ROUNDS:
+        return True, hash_password(plain_password)
+    return True, None
+
+
 def get_all_departments(db: Session):
     """Get all unique departments from registered users"""
     departments = db.query(models.User.department).distinct().all()
@@ -156,64 +178,58 @@ def get_department_activity(db: Session, department: str, limit: int = 10):
 
 # ---------------- BRAGS ----------------
 
-def save_attachment(db: Session, file, brag_id: int, upload_dir: str = None):
-    """Save an uploaded file as an attachment"""
-    # Use absolute path to uploads directory relative to backend directory
-    if upload_dir is None:
-        # Get the directory where this script is located (backend/app)
-        current_dir = Path(__file__).parent
-        # Go up one level to get to backend directory
-        backend_dir = current_dir.parent
-        upload_dir = backend_dir / "uploads"
-    
-    upload_path = Path(upload_dir)
-    upload_path.mkdir(exist_ok=True)
+def save_attachment(db: Session, file, brag_id: int, backend: storage.StorageBackend = None,
+                    max_size: int = blob_store.MAX_ATTACHMENT_BYTES):
+    """Stream an uploaded file into the blob store and add its attachment row (does not commit)"""
+    backend = backend or storage.get_storage()
 
-    # Generate unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = upload_path / unique_filename
-
-    # Save file
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
+    # Identical files are stored once and shared between attachments;
+    # raises blob_store.AttachmentTooLarge as soon as max_size is exceeded
+    blob = blob_store.store(db, file.file, file.filename, backend, max_size)
 
     # Create attachment record
     db_attachment = models.Attachment(
-        filename=unique_filename,
+        filename=blob.filename,
         original_filename=file.filename,
-        file_path=str(file_path),
-        file_size=file_path.stat().st_size,
+        file_path=backend.url_for(blob.filename),
+        file_size=blob.size,
         content_type=file.content_type,
         brag_id=brag_id
     )
 
     db.add(db_attachment)
-    db.commit()
-    db.refresh(db_attachment)
     return db_attachment
 
-def create_brag(db: Session, brag: schemas.BragCreate, author_id: int):
-    """Create a new brag with recipients"""
+
+def create_brag(db: Session, brag: schemas.BragCreate, author_id: int, files=(),
+                backend: storage.StorageBackend = None, max_size: int = blob_store.MAX_ATTACHMENT_BYTES):
+    """Create a new brag with recipients and attachments in one commit; nothing is saved if a file fails"""
     db_brag = models.Brag(
         content=brag.content,
         author_id=author_id
     )
 
-    db.add(db_brag)
-    db.commit()
-    db.refresh(db_brag)
+    try:
+        db.add(db_brag)
+        db.flush()
 
-    # Attach recipients
-    for recipient_id in brag.recipient_ids:
-        recipient = db.query(models.User).filter(
-            models.User.id == recipient_id
-        ).first()
+        # Attach recipients
+        for recipient_id in brag.recipient_ids:
+            recipient = db.query(models.User).filter(
+                models.User.id == recipient_id
+            ).first()
 
-        if recipient:
-            db_brag.recipients.append(recipient)
+            if recipient:
+                db_brag.recipients.append(recipient)
 
-    db.commit()
+        for file in files:
+            save_attachment(db, file, db_brag.id, backend, max_size)
+
+        db.commit()
+    except Exception:
+        # Files already written are unreferenced now and are cleaned up by gc_media.py
+        db.rollback()
+        raise
     db.refresh(db_brag)
     
     # Update author's leaderboard (they sent a brag)
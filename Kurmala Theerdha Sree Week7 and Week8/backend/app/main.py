@@ -1,9 +1,11 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from .database import Base, engine
+from .media_files import MediaFiles
+from . import storage
+from . import password_hashing
 from .routers.auth_router import router as auth_router
 from .routers.users_router import router as users_router
 from .routers.brag_router import router as brag_router
@@ -27,7 +29,7 @@ app = FastAPI(title="BragBoard API")
 
 # Mount the uploads directory inside the backend package so attachments saved to
 # backend/uploads are available at /uploads/<filename>
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+app.mount("/uploads", MediaFiles(directory=uploads_dir), name="uploads")
 
 
 # ---------------- CORS CONFIG ----------------
@@ -54,3 +56,23 @@ app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(brag_router)
 app.include_router(leaderboard_router)
+
+
+# ---------------- STARTUP / SHUTDOWN ----------------
+
+@app.on_event("startup")
+def start_password_hashing():
+    if password_hashing.TARGET_MS:
+        rounds = password_hashing.apply_calibration(password_hashing.TARGET_MS)
+        print(f"Password hashing: bcrypt cost {rounds} for a {password_hashing.TARGET_MS:.0f} ms target")
+    password_hashing.password_hasher.warm_up()
+
+
+@app.on_event("shutdown")
+def close_storage():
+    storage.close_storage()
+
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    password_hashing.password_hasher.shutdown()
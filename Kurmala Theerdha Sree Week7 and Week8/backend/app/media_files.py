@@ -0,0 +1,78 @@
+# app/media_files.py
+"""
+Serving of /uploads with caching headers.
+
+Attachments are stored under UUID or content-hash (blobs/ab/...) names and never
+change, so they are served with an immutable, year-long Cache-Control. Blobs get
+a strong ETag made from their SHA-256, and Range requests work through
+FileResponse. MEDIA_ACCEL_MODE=nginx or sendfile hands the actual file transfer
+to a front proxy via X-Accel-Redirect / X-Sendfile.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ACCEL_MODE = os.getenv("MEDIA_ACCEL_MODE", "").lower()  # "", "nginx" or "sendfile"
+ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-uploads/")
+
+# blobs/ab/<62 hex>.pdf; attachments have no resized copies
+_BLOB_PATH = re.compile(r"(?:^|/)blobs/([0-9a-f]{2})/([0-9a-f]{62})(?:\.[a-z0-9]{1,10})?$")
+
+
+def content_etag(relative_path: str):
+    """Strong ETag for content-addressed files, None for anything else."""
+    match = _BLOB_PATH.search(relative_path)
+    if not match:
+        return None
+    return f'"{match.group(1)}{match.group(2)}"'
+
+
+def stat_etag(stat_result: os.stat_result) -> str:
+    """Same ETag FileResponse would send, for responses without a body."""
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+class MediaFiles(StaticFiles):
+    def __init__(self, *args, accel_mode: str = ACCEL_MODE, accel_prefix: str = ACCEL_PREFIX, **kwargs):
+        super().__init__(*args, **kwargs)
+        if accel_mode not in ("", "nginx", "sendfile"):
+            raise ValueError(f"Unknown MEDIA_ACCEL_MODE: {accel_mode}")
+        self.accel_mode = accel_mode
+        self.accel_prefix = accel_prefix.rstrip("/") + "/"
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+
+        headers = {"cache-control": IMMUTABLE_CACHE_CONTROL}
+        etag = content_etag(relative_path)
+        if etag:
+            headers["etag"] = etag
+
+        if self.accel_mode:
+            response = self.accel_response(full_path, relative_path, stat_result, headers, status_code)
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def accel_response(self, full_path, relative_path: str, stat_result, headers: dict, status_code: int) -> Response:
+        headers.setdefault("etag", stat_etag(stat_result))
+        headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        if self.accel_mode == "nginx":
+            headers["x-accel-redirect"] = self.accel_prefix + quote(relative_path)
+        else:
+            headers["x-sendfile"] = os.path.abspath(full_path)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
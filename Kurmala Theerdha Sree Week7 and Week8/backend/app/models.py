@@ -3,6 +3,7 @@ from sqlalchemy import Column, Integer, String, Enum, TIMESTAMP, ForeignKey, Tab
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
+from . import storage
 import enum
 
 class RoleEnum(str, enum.Enum):
@@ -54,7 +55,7 @@ class Brag(Base):
 class Attachment(Base):
     __tablename__ = "attachments"
     id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, nullable=False)
+    filename = Column(String, nullable=False)  # storage key, see storage.py
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
@@ -62,6 +63,23 @@ class Attachment(Base):
     brag_id = Column(Integer, ForeignKey('brags.id'), nullable=False)
     uploaded_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
+    @property
+    def url(self):
+        # The URL the file was saved under (relative for local storage, absolute for S3), so
+        # switching STORAGE_BACKEND keeps old links working. Older rows hold a path on disk.
+        if self.file_path.startswith(("/uploads/", "http://", "https://")):
+            return self.file_path
+        return storage.LocalStorage().url_for(self.filename)
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    filename = Column(String, unique=True, nullable=False)  # blobs/ab/cdef..., relative to uploads/
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
 class Reaction(Base):
     __tablename__ = "reactions"
     id = Column(Integer, primary_key=True, index=True)
@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from . import crud
+
+# Password hashing (bcrypt, 12 rounds) is 100+ ms of pure CPU per call.
+# In FastAPI's threadpool it holds the GIL for that long, so a burst of
+# logins slows down every other endpoint. The auth routes await it from a
+# small pool of worker processes instead. At most MAX_PENDING hashes may be
+# queued or running; beyond that PasswordHashingOverloaded is raised and the
+# routes answer 503 with Retry-After.
+#
+# With PASSWORD_HASH_TARGET_MS set, the bcrypt cost is calibrated at startup
+# so one verification takes at most about that long on this machine
+# (calibrate_password_hashing.py prints the same measurement).
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "0"))
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class PasswordHashingOverloaded(Exception):
+    """Raised when too many hashes are already waiting."""
+
+
+def _warm_up_worker():
+    # Unpickling this imports this module, and with it crud and bcrypt
+    return os.getpid()
+
+
+class PasswordHasher:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the API process has threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset_executor(self, broken):
+        # A crashed worker breaks the whole pool; the next call gets a fresh one
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingOverloaded("Too many sign-ins at once, please try again shortly")
+        executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(crud.hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(crud.verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        # (valid, new_hash), see crud.verify_and_update_password
+        return await self._run(crud.verify_and_update_password, plain_password, hashed_password)
+
+    def warm_up(self):
+        # Starts the workers now instead of on the first login
+        executor = self._get_executor()
+        return [executor.submit(_warm_up_worker) for _ in range(self.workers)]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def measure_verify_seconds(rounds, samples=3):
+    # Median time of one bcrypt check at this cost on this machine
+    hashed = bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=rounds))
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.checkpw(b"calibration-password", hashed)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def calibrate_rounds(target_ms):
+    # Highest cost that stays within target_ms; each extra round doubles the time
+    rounds = MIN_ROUNDS
+    expected_ms = measure_verify_seconds(rounds) * 1000
+    while rounds < MAX_ROUNDS and expected_ms * 2 <= target_ms:
+        rounds += 1
+        expected_ms *= 2
+    return rounds
+
+
+def apply_calibration(target_ms):
+    # Must run before the pool starts: spawned workers read BCRYPT_ROUNDS from the environment
+    rounds = calibrate_rounds(target_ms)
+    os.environ["BCRYPT_ROUNDS"] = str(rounds)
+    crud.BCRYPT_ROUNDS = rounds
+    return rounds
+
+
+password_hasher = PasswordHasher()
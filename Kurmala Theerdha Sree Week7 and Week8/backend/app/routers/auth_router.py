@@ -1,20 +1,34 @@
 # app/routers/auth_router.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from .. import schemas, crud, auth
+from .. import schemas, crud, auth, models
 from ..deps import get_db
+from ..password_hashing import password_hasher, PasswordHashingOverloaded
 from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+
+# Hashing runs in a process pool (see password_hashing.py); these routes are
+# async so they can wait for it without holding a threadpool slot. They close
+# the session before awaiting, so the DB connection goes back to the pool
+# instead of being held for the whole hash (loaded attributes stay).
+def _overloaded(e: PasswordHashingOverloaded):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+
 @router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     try:
         existing = crud.get_user_by_email(db, user.email)
         if existing:
             raise HTTPException(status_code=400, detail="Email already registered")
-        created = crud.create_user(db, user)
+        db.close()
+        hashed_password = await password_hasher.hash(user.password)
+        created = crud.create_user(db, user, hashed_password)
         return created
+    except PasswordHashingOverloaded as e:
+        raise _overloaded(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -22,10 +36,20 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = crud.get_user_by_email(db, form_data.username)
-    if not user or not crud.verify_password(form_data.password, user.password):
+    db.close()
+    try:
+        valid, new_hash = (await password_hasher.verify_and_update(form_data.password, user.password)
+                           if user else (False, None))
+    except PasswordHashingOverloaded as e:
+        raise _overloaded(e)
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
+    if new_hash:
+        # Hashed with a lower bcrypt cost than today's: upgrade while we have the password
+        db.query(models.User).filter(models.User.id == user.id).update({models.User.password: new_hash})
+        db.commit()
     access_token = auth.create_access_token({"sub": user.email})
     # For simplicity, treat refresh token same function or create separate token with longer expiry
     refresh_token = auth.create_access_token({"sub": user.email}, expires_delta=60*24*30)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from .. import crud, models, schemas
+from .. import crud, models, schemas, blob_store
 from ..deps import get_db
 from ..deps import get_current_user
 from typing import List
@@ -15,23 +15,21 @@ def create_brag(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    files = [file for file in files or [] if file.filename]
+    # Reject oversized uploads before the brag is created, when the size is known up front
+    for file in files:
+        if file.size is not None and file.size > blob_store.MAX_ATTACHMENT_BYTES:
+            raise HTTPException(status_code=413, detail=str(blob_store.AttachmentTooLarge(blob_store.MAX_ATTACHMENT_BYTES)))
+
     try:
         import json
         brag_data = schemas.BragCreate(
             content=content,
             recipient_ids=json.loads(recipient_ids)
         )
-        brag = crud.create_brag(db, brag_data, current_user.id)
-        
-        # Handle file uploads
-        if files:
-            for file in files:
-                if file.filename:
-                    crud.save_attachment(db, file, brag.id)
-        
-        # Refresh to include attachments
-        db.refresh(brag)
-        return brag
+        return crud.create_brag(db, brag_data, current_user.id, files)
+    except blob_store.AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -75,6 +73,8 @@ def delete_brag(
     
     # delete related reactions and attachments first to avoid FK constraint issues
     db.query(models.Reaction).filter(models.Reaction.brag_id == brag_id).delete(synchronize_session=False)
+    for attachment in db.query(models.Attachment).filter(models.Attachment.brag_id == brag_id).all():
+        blob_store.release(db, attachment.filename)
     db.query(models.Attachment).filter(models.Attachment.brag_id == brag_id).delete(synchronize_session=False)
     db.query(models.Comment).filter(models.Comment.brag_id == brag_id).delete(synchronize_session=False)
     # remove association table entries
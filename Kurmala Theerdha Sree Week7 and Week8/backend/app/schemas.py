@@ -111,6 +111,7 @@ class AttachmentOut(BaseModel):
     filename: str
     original_filename: str
     file_path: str
+    url: str
     file_size: int
     content_type: str
     uploaded_at: datetime
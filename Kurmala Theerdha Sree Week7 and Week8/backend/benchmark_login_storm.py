@@ -0,0 +1,131 @@
+import sys
+import os
+import argparse
+import asyncio
+import socket
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+# Usage: python benchmark_login_storm.py [--logins 40] [--duration 15] [--url http://localhost:8000]
+#
+# Fires --logins concurrent login loops at /auth/login while one client keeps
+# calling GET /users/me, and reports logins/s, 503s (hashing queue full) and the
+# latency of /users/me during the storm next to its latency with no logins.
+# Without --url a server is started on a free port with a throwaway SQLite
+# database; PASSWORD_HASH_WORKERS / PASSWORD_HASH_MAX_PENDING are passed on to it.
+
+BACKEND_ROOT = os.path.abspath(os.path.dirname(__file__))
+PASSWORD = "benchmark-password"
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def start_server(database_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_ROOT,
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{database_path}",
+             "SECRET_KEY": os.getenv("SECRET_KEY", "benchmark-secret")},
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(url + "/docs", timeout=1)
+            return process, url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def create_users(client, count):
+    emails = [f"loadtest{i}@example.com" for i in range(count)]
+    for email in emails:
+        # 400 = already registered by an earlier run
+        await client.post("/auth/register", json={
+            "name": email.split("@")[0], "email": email, "password": PASSWORD, "role": "employee",
+        })
+    response = await client.post("/auth/login", data={"username": emails[0], "password": PASSWORD})
+    response.raise_for_status()
+    return emails, response.json()["access_token"]
+
+
+async def probe(client, token, stop):
+    """Calls an unrelated endpoint back to back until `stop` is set; returns latencies in ms."""
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/users/me", headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def login_loop(client, email, stop, counts):
+    while not stop.is_set():
+        response = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            # Back off like a well-behaved client would
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+
+async def run(url, logins, duration):
+    limits = httpx.Limits(max_connections=logins + 10)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        emails, token = await create_users(client, logins)
+
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe(client, token, stop))
+        await asyncio.sleep(min(duration, 5))
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        counts = {}
+        storm_probe = asyncio.create_task(probe(client, token, stop))
+        loops = [asyncio.create_task(login_loop(client, email, stop, counts)) for email in emails]
+        start = time.perf_counter()
+        await asyncio.sleep(duration)
+        stop.set()
+        storm = await storm_probe
+        await asyncio.gather(*loops)
+        elapsed = time.perf_counter() - start
+
+    print(f"{logins} concurrent login loops for {elapsed:.1f}s")
+    print(f"logins/s: {counts.get(200, 0) / elapsed:.1f} (ok {counts.get(200, 0)}, "
+          f"503 {counts.get(503, 0)}, other {sum(v for k, v in counts.items() if k not in (200, 503))})")
+    print("GET /users/me  |  p50 ms |  p99 ms | requests")
+    for label, latencies in (("idle", idle), ("during storm", storm)):
+        print(f"{label:<14} | {percentile(latencies, 50):>7.1f} | {percentile(latencies, 99):>7.1f} | {len(latencies):>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure login throughput and its effect on other endpoints.")
+    parser.add_argument("--logins", type=int, default=40, help="concurrent login loops (one user each)")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of login storm")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args.url, args.logins, args.duration))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            server, url = start_server(os.path.join(tmp, "benchmark.db"))
+            try:
+                asyncio.run(run(url, args.logins, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
@@ -0,0 +1,26 @@
+import argparse
+
+from app import crud, password_hashing
+
+# Picks a bcrypt cost for this machine, e.g.: python calibrate_password_hashing.py --target-ms 250
+# Run it on the deployment hardware and put the printed BCRYPT_ROUNDS in the
+# environment, or set PASSWORD_HASH_TARGET_MS to calibrate at startup. Stored
+# hashes with a lower cost are upgraded the next time their user logs in.
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick a bcrypt cost for this machine")
+    parser.add_argument("--target-ms", type=float, default=250, help="time one password check should take")
+    args = parser.parse_args()
+
+    print("cost | ms per check")
+    for rounds in range(password_hashing.MIN_ROUNDS, password_hashing.MAX_ROUNDS + 1):
+        elapsed_ms = password_hashing.measure_verify_seconds(rounds, samples=1) * 1000
+        print(f"{rounds:>4} | {elapsed_ms:>12.1f}")
+        if elapsed_ms > args.target_ms * 2:
+            break
+
+    rounds = password_hashing.calibrate_rounds(args.target_ms)
+    print(f"\nBCRYPT_ROUNDS={rounds}  (current: {crud.BCRYPT_ROUNDS})")
+
+if __name__ == "__main__":
+    main()
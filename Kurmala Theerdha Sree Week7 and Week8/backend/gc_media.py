@@ -0,0 +1,30 @@
+import argparse
+
+from app.database import SessionLocal
+from app import media_gc
+
+# Lists (default), quarantines or deletes files in uploads/ that no attachment
+# refers to, e.g.: python gc_media.py --mode quarantine --grace-hours 24
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean up orphaned attachment files")
+    parser.add_argument("--mode", choices=media_gc.MODES, default="report")
+    parser.add_argument("--grace-hours", type=float, default=media_gc.GRACE_HOURS)
+    parser.add_argument("--rate", type=float, default=50, help="max removals per second (0 = no limit)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds between batches")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        referenced = media_gc.mark(db)
+    finally:
+        db.close()
+    print(f"{len(referenced)} files in use.")
+
+    stats = media_gc.sweep(referenced, mode=args.mode, grace_hours=args.grace_hours, rate=args.rate,
+                           batch_size=args.batch_size, pause=args.pause)
+    print(", ".join(f"{key}: {value}" for key, value in stats.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+from app import blob_store, crud, schemas, storage
+from app.models import Attachment, Blob, Brag, User
+
+class Upload:
+    def __init__(self, filename, data, content_type="application/pdf"):
+        self.filename = filename
+        self.file = io.BytesIO(data)
+        self.content_type = content_type
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "DEFAULT_UPLOAD_DIR", tmp_path)
+    return storage.LocalStorage(root=tmp_path)
+
+def _users(db_session):
+    author = User(name="a", email="a@example.com", password="x")
+    recipient = User(name="b", email="b@example.com", password="x")
+    db_session.add_all([author, recipient])
+    db_session.commit()
+    return author, recipient
+
+def test_create_brag_saves_recipients_and_attachments(db_session, backend):
+    author, recipient = _users(db_session)
+    files = [Upload("report.pdf", b"report"), Upload("copy.pdf", b"report")]
+
+    brag = crud.create_brag(db_session, schemas.BragCreate(content="shipped", recipient_ids=[recipient.id]),
+                            author.id, files, backend)
+
+    assert [user.id for user in brag.recipients] == [recipient.id]
+    assert sorted(a.original_filename for a in brag.attachments) == ["copy.pdf", "report.pdf"]
+    assert db_session.query(Blob).one().ref_count == 2
+
+def test_create_brag_saves_nothing_when_an_attachment_is_too_large(db_session, backend):
+    author, recipient = _users(db_session)
+    files = [Upload("small.pdf", b"ok"), Upload("big.pdf", b"x" * 100)]
+
+    with pytest.raises(blob_store.AttachmentTooLarge):
+        crud.create_brag(db_session, schemas.BragCreate(content="shipped", recipient_ids=[recipient.id]),
+                         author.id, files, backend, max_size=10)
+
+    assert db_session.query(Brag).count() == 0
+    assert db_session.query(Attachment).count() == 0
+    assert db_session.query(Blob).count() == 0
+
+def test_attachment_links_survive_a_storage_switch(db_session, backend, monkeypatch):
+    author, recipient = _users(db_session)
+    s3 = storage.S3Storage("bragboard", "https://s3.example.com", "key", "secret", transport=storage.FakeS3())
+    brag = crud.create_brag(db_session, schemas.BragCreate(content="shipped", recipient_ids=[]),
+                            author.id, [Upload("report.pdf", b"report")], s3)
+    legacy = Attachment(filename="old.pdf", original_filename="old.pdf", file_path=str(backend.root) + "/old.pdf",
+                        file_size=1, content_type="application/pdf", brag_id=brag.id)
+
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    storage.get_storage.cache_clear()
+    attachment = brag.attachments[0]
+    assert attachment.url == s3.url_for(attachment.filename)
+    assert attachment.url.startswith("https://s3.example.com/bragboard/blobs/")
+    assert legacy.url == "/uploads/old.pdf"
@@ -0,0 +1,40 @@
+import os
+import time
+
+from app import media_gc
+from app.models import Attachment, Blob, Brag, User
+
+def _write(path, age_hours):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * 10)
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+
+def test_mark_collects_attachment_and_blob_files(db_session):
+    user = User(name="a", email="a@example.com", password="x")
+    db_session.add(user)
+    db_session.commit()
+    brag = Brag(content="shipped it", author_id=user.id)
+    db_session.add(brag)
+    db_session.commit()
+    blob_key = "blobs/ab/" + "c" * 62 + ".pdf"
+    db_session.add(Attachment(filename="legacy.pdf", original_filename="report.pdf", file_path="/uploads/legacy.pdf",
+                              file_size=10, content_type="application/pdf", brag_id=brag.id))
+    db_session.add(Attachment(filename=blob_key, original_filename="report.pdf", file_path="/uploads/" + blob_key,
+                              file_size=10, content_type="application/pdf", brag_id=brag.id))
+    db_session.add(Blob(sha256="ab" + "c" * 62, filename=blob_key, size=10))
+    db_session.commit()
+
+    assert media_gc.mark(db_session) == {"legacy.pdf", blob_key}
+
+def test_sweep_deletes_unmarked_files_after_the_grace_period(tmp_path):
+    root = tmp_path / "uploads"
+    _write(root / "legacy.pdf", age_hours=48)
+    _write(root / "orphan.pdf", age_hours=48)
+    _write(root / "blobs" / "ab" / "orphan.png", age_hours=48)
+    _write(root / "just_uploaded.pdf", age_hours=0)
+
+    stats = media_gc.sweep({"legacy.pdf"}, root=str(root), mode="delete", rate=0, pause=0)
+
+    assert stats["orphaned"] == 2 and stats["removed"] == 2 and stats["recent"] == 1
+    assert sorted(p.name for p in root.rglob("*") if p.is_file()) == ["just_uploaded.pdf", "legacy.pdf"]
@@ -1287,7 +1287,7 @@ export default function Dashboard() {
                             <div key={attachment.id} className="brag-attachment">
                               {attachment.content_type.startsWith('image/') ? (
                                 <img
-                                  src={`http://localhost:8000/uploads/${attachment.filename}`}
+                                  src={attachment.url.startsWith('/') ? `http://localhost:8000${attachment.url}` : attachment.url}
                                   alt={attachment.original_filename}
                                   className="brag-attachment-image"
                                   onError={(e) => {
@@ -1625,7 +1625,7 @@ export default function Dashboard() {
                                     {brag.attachments.map((attachment) => (
                                       <div key={attachment.id} className="attachment-item">
                                         <img
-                                          src={`http://localhost:8000/uploads/${attachment.filename}`}
+                                          src={attachment.url.startsWith('/') ? `http://localhost:8000${attachment.url}` : attachment.url}
                                           alt={attachment.original_filename}
                                           className="attachment-image"
                                           onError={(e) => {
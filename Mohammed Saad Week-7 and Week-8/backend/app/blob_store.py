@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+import tempfile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+
+# Uploads are stored by content: uploads/blobs/<ab>/<cdef...><ext>, where
+# ab are the first two hex chars of the SHA-256. The same file uploaded twice
+# is stored once, and the `blobs` table counts how many rows point at it.
+UPLOAD_DIR = "uploads"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+CHUNK_SIZE = 1024 * 1024
+_SAFE_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+def blob_path(digest, extension=""):
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:] + extension)
+
+
+def blob_url(path):
+    return "/" + path.replace(os.sep, "/")
+
+
+def local_path(url):
+    return url.lstrip("/").replace("/", os.sep)
+
+
+def _write_temp(fileobj):
+    """Streams the upload to a temp file, hashing as it goes. Returns (path, digest, size)."""
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest, size = hashlib.sha256(), 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def _acquire(db: Session, digest):
+    updated = db.query(models.Blob).filter(models.Blob.sha256 == digest).update(
+        {models.Blob.ref_count: models.Blob.ref_count + 1}, synchronize_session=False
+    )
+    if updated:
+        return db.query(models.Blob.path).filter(models.Blob.sha256 == digest).scalar()
+    return None
+
+
+def store(db: Session, fileobj, filename=None):
+    """Stores an upload (or reuses an identical one) and returns its /uploads URL. Does not commit."""
+    tmp_path, digest, size = _write_temp(fileobj)
+    try:
+        url = _acquire(db, digest)
+        if url:
+            if not os.path.exists(local_path(url)):
+                # Row survived but the file didn't; put it back
+                os.makedirs(os.path.dirname(local_path(url)), exist_ok=True)
+                os.replace(tmp_path, local_path(url))
+            return url
+
+        extension = os.path.splitext(filename or "")[1].lower()
+        path = blob_path(digest, extension if _SAFE_EXTENSION.match(extension) else "")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        try:
+            with db.begin_nested():
+                db.add(models.Blob(sha256=digest, path=blob_url(path), size=size, ref_count=1))
+        except IntegrityError:
+            # Same content stored concurrently by another request
+            return _acquire(db, digest)
+        return blob_url(path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def release(db: Session, url):
+    """Drops one reference; the file goes with the last one. Non-blob URLs are ignored. Does not commit."""
+    if not url:
+        return
+    blob = db.query(models.Blob).filter(models.Blob.path == url).first()
+    if blob is None:
+        return
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        db.delete(blob)
+        path = local_path(url)
+        if os.path.exists(path):
+            os.remove(path)
@@ -4,6 +4,7 @@ from fastapi.staticfiles import StaticFiles
 from .routers import auth, users, shoutouts
 from .database import engine
 from . import models
+from .password_hashing import password_hasher
 import os
 
 # Create database tables
@@ -30,6 +31,14 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(shoutouts.router)
 
+@app.on_event("startup")
+def start_password_hashing():
+    password_hasher.warm_up()
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    password_hasher.shutdown()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to BragBoard API"}
\ No newline at end of file
@@ -102,3 +102,13 @@ class AdminLog(Base):
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
     admin = relationship("User", back_populates="admin_logs")
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    path = Column(String, unique=True, nullable=False)  # /uploads/blobs/ab/cdef...
+    size = Column(Integer)
+    ref_count = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
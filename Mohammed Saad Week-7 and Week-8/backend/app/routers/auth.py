@@ -5,20 +5,41 @@ from fastapi.security import OAuth2PasswordRequestForm
 from .. import schemas, models
 from ..database import get_db
 from .. import security
+from ..password_hashing import password_hasher, PasswordHashingOverloaded
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+
+# Hashing runs in a process pool (see password_hashing.py); these routes are
+# async so they can wait for it without holding a threadpool slot. They close
+# the session before awaiting, so the DB connection goes back to the pool
+# instead of being held for the whole hash (loaded attributes stay).
+async def _hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+
+async def _verify(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+
 @router.post("/register", response_model=schemas.UserOut, status_code=201)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     # Normalize email to lowercase
     user_in.email = user_in.email.lower()
     existing = db.query(models.User).filter(models.User.email == user_in.email).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
+    db.close()
 
     user = models.User(
         name=user_in.name,
         email=user_in.email,
-        password=security.hash_password(user_in.password),
+        password=await _hash(user_in.password),
         department=user_in.department,
         role=user_in.role,
     )
@@ -29,11 +50,12 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
     # JSON-based login (for frontend)
     email = user_in.email.lower()
     user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not security.verify_password(user_in.password, user.password):
+    db.close()
+    if not user or not await _verify(user_in.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -44,7 +66,7 @@ def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
@@ -54,7 +76,8 @@ def login_for_access_token(
     """
     email = form_data.username.lower()
     user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not security.verify_password(form_data.password, user.password):
+    db.close()
+    if not user or not await _verify(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -75,13 +98,17 @@ def forgot_password(request: schemas.ForgotPasswordRequest, db: Session = Depend
 
 
 @router.post("/reset-password", status_code=200)
-def reset_password(request: schemas.ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: schemas.ResetPasswordRequest, db: Session = Depends(get_db)):
     email = request.email.lower()
     user = db.query(models.User).filter(models.User.email == email).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    user.password = security.hash_password(request.new_password)
+    user_id = user.id
+    db.close()
+
+    password = await _hash(request.new_password)
+    db.query(models.User).filter(models.User.id == user_id).update({models.User.password: password})
     db.commit()
     
     return {"message": "Password updated successfully"}
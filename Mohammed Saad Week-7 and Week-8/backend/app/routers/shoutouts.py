@@ -1,11 +1,10 @@
 import os
-import shutil
 import json
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
-from .. import models, database, security
+from .. import models, database, security, blob_store
 
 router = APIRouter(prefix="/shoutouts", tags=["Shoutouts"])
 
@@ -37,10 +36,8 @@ async def create_shoutout(
 
     attachment_url = None
     if file:
-        file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        attachment_url = f"/uploads/{file.filename}"
+        # Stored by content hash, so same-named files no longer overwrite each other
+        attachment_url = blob_store.store(db, file.file, file.filename)
 
     new_shoutout = models.ShoutOut(sender_id=current_user.id, message=message, attachment_url=attachment_url)
     db.add(new_shoutout)
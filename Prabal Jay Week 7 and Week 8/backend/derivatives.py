@@ -0,0 +1,56 @@
+# Smaller WebP/JPEG copies of uploaded shoutout images for the feed.
+# Saved next to the original as <name>_w<width>.<ext>; widths wider than the original are skipped.
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+from database import SessionLocal
+import models
+
+WIDTHS = (320, 640, 1280)
+FORMATS = (("webp", "WEBP", {"quality": 80, "method": 4}),
+           ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}))
+
+def _rgb(img):
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        img = img.convert("RGBA")
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.getchannel("A"))
+        return bg
+    return img.convert("RGB")
+
+def generate_derivatives(path, widths=WIDTHS):
+    """Returns [(width, ext, file_path)] for the copies written, smallest first."""
+    try: img = Image.open(path)
+    except (UnidentifiedImageError, OSError): return []
+    out = []
+    with img:
+        if getattr(img, "is_animated", False): return []
+        # EXIF orientation 5-8: stored turned by 90 degrees, so the shown width is the stored height
+        turned = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        widths = sorted((w for w in widths if w < (img.height if turned else img.width)), reverse=True)
+        if not widths: return []
+        img.draft("RGB", (1, widths[0]) if turned else (widths[0], 1))
+        current = _rgb(ImageOps.exif_transpose(img))
+        for w in widths:
+            current = current.resize((w, max(1, round(current.height * w / current.width))), Image.LANCZOS)
+            for ext, fmt, opts in FORMATS:
+                target = f"{os.path.splitext(path)[0]}_w{w}.{ext}"
+                current.save(target + ".tmp", fmt, **opts)
+                os.replace(target + ".tmp", target)
+                out.append((w, ext, target))
+    return sorted(out)
+
+def generate_for_shoutout(shoutout_id: int, path: str, base_url: str):
+    """Background task run after create_shoutout has responded."""
+    try:
+        items = [{"width": w, "format": ext, "url": base_url + target.replace(os.sep, "/")}
+                 for w, ext, target in generate_derivatives(path)]
+    except Exception as e:
+        print(f"Derivatives failed for {path}: {e}"); return
+    db = SessionLocal()
+    try:
+        post = db.query(models.Shoutout).filter(models.Shoutout.id == shoutout_id).first()
+        if post:
+            post.image_derivatives = items
+            db.commit()
+    finally:
+        db.close()
@@ -1,15 +1,16 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form, BackgroundTasks, Request
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-import models, auth, schemas
-from database import engine, get_db
+import models, auth, schemas, derivatives, realtime, unread
+from database import engine, get_db, SessionLocal
 from typing import List, Optional
-import shutil, os, uuid
+import shutil, os, uuid, datetime
 import csv
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import io
 
 models.Base.metadata.create_all(bind=engine)
@@ -26,6 +27,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_notification_push(): realtime.notification_hub.start()
+
+@app.on_event("shutdown")
+def stop_notification_push(): realtime.notification_hub.shutdown()
+
 def get_current_user(token_data: dict = Depends(auth.get_user_from_token), db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.email == token_data["email"]).first()
     if not user: raise HTTPException(401, "User not found")
@@ -59,11 +66,12 @@ def get_all_users(db: Session = Depends(get_db), u: models.User = Depends(get_cu
 
 @app.post("/shoutouts", response_model=schemas.ShoutoutResponse)
 async def create_shoutout(
+    background_tasks: BackgroundTasks,
     message: str = Form(...), recipient_ids: str = Form(...), 
     media_url: Optional[str] = Form(None), file: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db), u: models.User = Depends(get_current_user)
 ):
-    final_url = media_url
+    final_url, path = media_url, None
     if file:
         ext = file.filename.split(".")[-1]
         path = f"static/uploads/{uuid.uuid4()}.{ext}"
@@ -72,9 +80,11 @@ async def create_shoutout(
 
     post = models.Shoutout(sender_id=u.id, message=message, image_url=final_url)
     db.add(post); db.commit(); db.refresh(post)
-    for rid in recipient_ids.split(","):
-        if rid: db.add(models.ShoutoutRecipient(shoutout_id=post.id, recipient_id=int(rid)))
-    db.commit(); db.refresh(post)
+    links = [models.ShoutoutRecipient(shoutout_id=post.id, recipient_id=int(rid)) for rid in recipient_ids.split(",") if rid]
+    db.add_all(links); db.commit(); db.refresh(post)
+    data = schemas.ShoutoutResponse.model_validate(post).model_dump(mode="json")
+    for link in links: realtime.notification_hub.publish(link.recipient_id, link.id, data)
+    if path: background_tasks.add_task(derivatives.generate_for_shoutout, post.id, path, "http://127.0.0.1:8000/")
     return post
 
 @app.get("/shoutouts", response_model=List[schemas.ShoutoutResponse])
@@ -98,6 +108,48 @@ def get_notifs(db: Session = Depends(get_db), u: models.User = Depends(get_curre
     ids = [l.shoutout_id for l in links]
     return db.query(models.Shoutout).filter(models.Shoutout.id.in_(ids)).all()
 
+# The stream uses its own short sessions: it must not hold a DB connection while open
+def _user_id(email):
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        return user.id if user else None
+
+# A link can commit after one with a higher id, so replay also resends links to shoutouts
+# created this close to the last one the client saw; the client skips ids it already has
+REPLAY_OVERLAP = datetime.timedelta(seconds=10)
+
+def _replay(user_id, last_event_id):
+    if last_event_id is None: return []
+    R, S = models.ShoutoutRecipient, models.Shoutout
+    with SessionLocal() as db:
+        seen_at = db.query(S.created_at).join(R).filter(R.recipient_id == user_id, R.id <= last_event_id)\
+            .order_by(R.id.desc()).limit(1).scalar()
+        missed = R.id > last_event_id
+        if seen_at is not None: missed = or_(missed, and_(R.id < last_event_id, S.created_at >= seen_at - REPLAY_OVERLAP))
+        links = db.query(R).join(S).filter(R.recipient_id == user_id, missed).order_by(R.id).limit(500).all()
+        return [{"id": l.id, "data": schemas.ShoutoutResponse.model_validate(l.shoutout).model_dump(mode="json")} for l in links]
+
+@app.get("/notifications/unread-count")
+def unread_notifs(db: Session = Depends(get_db), u: models.User = Depends(get_current_user)):
+    return {"unread": unread.unread_count(db, u.id)}
+
+@app.get("/notifications/stream")
+async def stream_notifs(request: Request, access_token: Optional[str] = None, last_event_id: Optional[int] = None):
+    # EventSource can't set headers, hence ?access_token=; its Last-Event-ID header wins over the query
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "): access_token = header[7:]
+    if request.headers.get("last-event-id", "").isdigit(): last_event_id = int(request.headers["last-event-id"])
+    if not access_token: raise HTTPException(401, "Not authenticated")
+    user_id = await run_in_threadpool(_user_id, auth.get_user_from_token(access_token)["email"])
+    if user_id is None: raise HTTPException(401, "User not found")
+    # Subscribe before reading the replay so nothing committed in between is lost
+    sub = realtime.notification_hub.subscribe(user_id)
+    try: replay = await run_in_threadpool(_replay, user_id, last_event_id)
+    except Exception:
+        realtime.notification_hub.unsubscribe(sub); raise
+    return StreamingResponse(realtime.event_stream(sub, replay), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.put("/shoutouts/{id}/seen")
 def mark_seen(id: int, db: Session = Depends(get_db), u: models.User = Depends(get_current_user)):
     link = db.query(models.ShoutoutRecipient).filter(models.ShoutoutRecipient.shoutout_id == id, models.ShoutoutRecipient.recipient_id == u.id).first()
@@ -0,0 +1,11 @@
+# One-off for databases created before feed image derivatives: python migrate_derivatives.py
+# create_all never alters an existing table, so shoutouts.image_derivatives is added here. Safe to re-run.
+from sqlalchemy import inspect, text
+from database import engine
+
+with engine.begin() as conn:
+    if "image_derivatives" in {c["name"] for c in inspect(conn).get_columns("shoutouts")}:
+        print("shoutouts.image_derivatives already exists")
+    else:
+        conn.execute(text("ALTER TABLE shoutouts ADD COLUMN image_derivatives JSON"))
+        print("Added shoutouts.image_derivatives")
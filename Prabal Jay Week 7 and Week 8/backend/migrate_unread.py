@@ -0,0 +1,12 @@
+# One-off for databases created before unread_counts existed: python migrate_unread.py
+# create_all only adds missing tables, so the (recipient_id, is_seen) index and the counts are filled in here.
+from sqlalchemy import text
+import models, unread
+from database import engine, SessionLocal
+
+with engine.begin() as conn:
+    conn.execute(text("UPDATE shoutout_recipients SET is_seen = 0 WHERE is_seen IS NULL"))
+    for index in models.ShoutoutRecipient.__table__.indexes: index.create(conn, checkfirst=True)
+    models.UnreadCount.__table__.create(conn, checkfirst=True)
+with SessionLocal() as db:
+    print(f"Unread counts rebuilt for {unread.rebuild(db)} users"); db.commit()
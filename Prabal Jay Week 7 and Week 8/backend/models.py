@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Text, Boolean, JSON, Index, false
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func
 from database import Base
 
@@ -25,6 +25,7 @@ class Shoutout(Base):
     sender_id = Column(Integer, ForeignKey("users.id"))
     message = Column(Text, nullable=False)
     image_url = Column(String, nullable=True) 
+    image_derivatives = Column(JSON, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), default=func.now())
 
     sender = relationship("User", back_populates="shoutouts_sent")
@@ -38,10 +39,17 @@ class ShoutoutRecipient(Base):
     id = Column(Integer, primary_key=True, index=True)
     shoutout_id = Column(Integer, ForeignKey("shoutouts.id"))
     recipient_id = Column(Integer, ForeignKey("users.id"))
-    is_seen = Column(Boolean, default=False) 
+    # active_history: unread.py needs the old value to adjust the counter
+    is_seen = column_property(Column(Boolean, default=False, server_default=false(), nullable=False), active_history=True)
 
     shoutout = relationship("Shoutout", back_populates="recipients")
     recipient = relationship("User", back_populates="shoutouts_received")
+    __table_args__ = (Index("ix_shoutout_recipients_unseen", "recipient_id", "is_seen"),)
+
+class UnreadCount(Base):
+    __tablename__ = "unread_counts"  # unseen shoutouts per user, maintained by unread.py
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
 
 class Reaction(Base):
     __tablename__ = "reactions"
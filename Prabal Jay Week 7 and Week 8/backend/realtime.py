@@ -0,0 +1,167 @@
+# Push channel for /notifications: GET /notifications/stream is a Server-Sent Events stream.
+# Every shoutout a user is tagged in is sent as one event, id = ShoutoutRecipient.id, data = the
+# same JSON as an item of GET /notifications. A reconnecting EventSource sends Last-Event-ID (or the
+# client passes ?last_event_id=) and gets everything after it from the database before live events
+# (plus a short overlap, see main._replay, so clients skip ids they already have).
+# The hub fans events out to this process's open streams. With NOTIFICATION_BROKER_URL=redis://...
+# (needs the redis package) events go through one Redis channel per user instead and every worker
+# forwards them to its own streams; FakeRedis is an in-memory stand-in for tests and offline use.
+# Run uvicorn with --timeout-graceful-shutdown, otherwise open streams hold up a restart.
+import asyncio, json, os, queue, threading
+
+BROKER_URL = os.getenv("NOTIFICATION_BROKER_URL", "")
+CHANNEL_PREFIX = os.getenv("NOTIFICATION_CHANNEL_PREFIX", "bragboard:notifications:")
+MAX_QUEUED = 100  # a stream further behind than this is closed; the client catches up via replay
+HEARTBEAT_SECONDS = 15.0
+
+class Subscription:
+    def __init__(self, user_id, loop):
+        self.user_id, self.loop = user_id, loop
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    def _put(self, event):
+        # Runs on the stream's event loop; None ends the stream
+        if self.closed: return
+        if event is None or self.queue.qsize() >= MAX_QUEUED:
+            self.closed, event = True, None
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        try: self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError: pass  # loop already closed
+
+class Hub:
+    def __init__(self, broker=None):
+        self.subscribers, self.lock = {}, threading.Lock()
+        self.broker = broker or LocalBroker()
+        self.broker.hub = self
+
+    def subscribe(self, user_id):
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self.lock: self.subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            subs = self.subscribers.get(sub.user_id, set())
+            subs.discard(sub)
+            if not subs: self.subscribers.pop(sub.user_id, None)
+
+    def dispatch(self, user_id, event):
+        with self.lock: subs = list(self.subscribers.get(user_id, ()))
+        for sub in subs: sub.deliver(event)
+
+    def publish(self, user_id, event_id, data):
+        """Thread-safe; event_id is what the client sends back as Last-Event-ID."""
+        try: self.broker.publish(user_id, {"id": event_id, "data": data})
+        except Exception as e: print(f"Notification push failed: {e}")  # replay covers it
+
+    def start(self): self.broker.start()
+
+    def shutdown(self):
+        self.broker.stop()
+        with self.lock: subs = [s for group in self.subscribers.values() for s in group]
+        for sub in subs: sub.deliver(None)
+
+class LocalBroker:
+    hub = None
+    def start(self): pass
+    def stop(self): pass
+    def publish(self, user_id, event): self.hub.dispatch(user_id, event)
+
+class RedisBroker:
+    hub = None
+
+    def __init__(self, client, prefix=CHANNEL_PREFIX):
+        self.client, self.prefix = client, prefix
+        self.pubsub, self.thread, self.stopping = None, None, threading.Event()
+
+    @classmethod
+    def from_url(cls, url):
+        import redis  # optional, only with NOTIFICATION_BROKER_URL
+        return cls(redis.Redis.from_url(url))
+
+    def start(self):
+        if self.thread: return
+        self.stopping.clear()
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.psubscribe(self.prefix + "*")
+        self.thread = threading.Thread(target=self._listen, name="notification-broker", daemon=True)
+        self.thread.start()
+
+    def _listen(self):
+        while not self.stopping.is_set():
+            try: msg = self.pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                print(f"Notification broker: {e}"); self.stopping.wait(1.0); continue
+            if not msg or msg.get("type") != "pmessage": continue
+            channel = msg["channel"].decode() if isinstance(msg["channel"], bytes) else msg["channel"]
+            try: self.hub.dispatch(int(channel[len(self.prefix):]), json.loads(msg["data"]))
+            except ValueError: continue
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread: self.thread.join(timeout=5); self.thread = None
+        if self.pubsub: self.pubsub.close(); self.pubsub = None
+
+    def publish(self, user_id, event):
+        self.client.publish(f"{self.prefix}{user_id}", json.dumps(event, default=str))
+
+class FakeRedis:
+    """The few redis.Redis calls RedisBroker makes, in memory (trailing-* patterns only)."""
+    def __init__(self): self.pubsubs, self.lock = [], threading.Lock()
+
+    def publish(self, channel, message):
+        with self.lock: pubsubs = list(self.pubsubs)
+        data = message.encode() if isinstance(message, str) else message
+        return sum(p._receive(channel, data) for p in pubsubs)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        p = FakePubSub(self)
+        with self.lock: self.pubsubs.append(p)
+        return p
+
+class FakePubSub:
+    def __init__(self, server): self.server, self.patterns, self.messages = server, [], queue.Queue()
+    def psubscribe(self, *patterns): self.patterns.extend(patterns)
+
+    def _receive(self, channel, data):
+        if not any(channel.startswith(p.rstrip("*")) for p in self.patterns): return 0
+        self.messages.put({"type": "pmessage", "channel": channel.encode(), "data": data})
+        return 1
+
+    def get_message(self, timeout=0.0):
+        try: return self.messages.get(timeout=timeout)
+        except queue.Empty: return None
+
+    def close(self):
+        with self.server.lock:
+            if self in self.server.pubsubs: self.server.pubsubs.remove(self)
+
+def create_broker(url=BROKER_URL):
+    if not url: return LocalBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")): return RedisBroker.from_url(url)
+    raise ValueError(f"Unsupported NOTIFICATION_BROKER_URL: {url}")
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+async def event_stream(sub, replay, hub=None):
+    """SSE body: the replayed events, then live ones (minus any already replayed) until closed."""
+    hub = hub or notification_hub
+    try:
+        yield "retry: 3000\n\n"
+        replayed = set()
+        for event in replay:
+            replayed.add(event["id"]); yield format_event(event)
+        while True:
+            try: event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"; continue
+            if event is None: return
+            if event["id"] not in replayed: yield format_event(event)
+    finally:
+        hub.unsubscribe(sub)
+
+notification_hub = Hub(create_broker())
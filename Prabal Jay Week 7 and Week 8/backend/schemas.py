@@ -35,11 +35,17 @@ class ShoutoutRecipientDetailResponse(BaseModel):
     is_seen: bool
     class Config: from_attributes = True
 
+class ImageDerivativeResponse(BaseModel):
+    width: int
+    format: str
+    url: str
+
 class ShoutoutResponse(BaseModel):
     id: int
     sender: UserResponse
     message: str
     image_url: Optional[str] = None
+    image_derivatives: Optional[List[ImageDerivativeResponse]] = None
     created_at: datetime
     recipients: List[ShoutoutRecipientDetailResponse] = []
     reactions: List[ReactionResponse] = [] 
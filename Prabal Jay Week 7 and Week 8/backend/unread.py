@@ -0,0 +1,40 @@
+# Unseen-shoutout badge: unread_counts keeps one row per user so GET /notifications/unread-count is a
+# primary-key lookup, not a scan of shoutout_recipients. The counters move in the same transaction as the
+# links: every flush through SessionLocal counts new unseen links, is_seen flips and deleted links (also the
+# ones removed by the Shoutout -> recipients cascade). Code that writes links with bulk statements must call
+# adjust() itself. rebuild() recounts from scratch (see migrate_unread.py).
+from collections import Counter
+from sqlalchemy import delete, event, false, func, inspect, insert, select
+from sqlalchemy.dialects.sqlite import insert as upsert
+import models
+from database import SessionLocal
+
+def adjust(db, deltas):
+    rows = [{"user_id": k, "unread": v} for k, v in deltas.items() if k and v]
+    if not rows: return
+    stmt = upsert(models.UnreadCount.__table__)
+    db.connection().execute(stmt.on_conflict_do_update(index_elements=["user_id"],
+        set_={"unread": models.UnreadCount.__table__.c.unread + stmt.excluded.unread}), rows)
+
+def unread_count(db, user_id):
+    row = db.get(models.UnreadCount, user_id)
+    return max(row.unread, 0) if row else 0
+
+def rebuild(db):
+    db.execute(delete(models.UnreadCount))
+    R = models.ShoutoutRecipient
+    counts = select(R.recipient_id, func.count()).where(R.recipient_id.is_not(None), R.is_seen == false()).group_by(R.recipient_id)
+    return db.execute(insert(models.UnreadCount).from_select(["user_id", "unread"], counts)).rowcount
+
+@event.listens_for(SessionLocal, "after_flush")
+def _count(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, models.ShoutoutRecipient) and not obj.is_seen: deltas[obj.recipient_id] += 1
+    for obj in session.dirty:
+        if not isinstance(obj, models.ShoutoutRecipient): continue
+        h = inspect(obj).attrs.is_seen.history
+        if h.added and h.deleted and bool(h.added[0]) != bool(h.deleted[0]): deltas[obj.recipient_id] += -1 if h.added[0] else 1
+    for obj in session.deleted:
+        if isinstance(obj, models.ShoutoutRecipient) and not obj.is_seen: deltas[obj.recipient_id] -= 1
+    adjust(session, deltas)
@@ -0,0 +1,28 @@
+import sqlite3
+
+DB_PATH = "bragboard.db"
+
+# notifications.actor_count: how many people a coalesced reaction notification
+# stands for. Existing rows each stand for one.
+def add_column():
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(notifications)")
+        columns = [info[1] for info in cursor.fetchall()]
+
+        if "actor_count" not in columns:
+            print("Adding actor_count column...")
+            cursor.execute("ALTER TABLE notifications ADD COLUMN actor_count INTEGER NOT NULL DEFAULT 1")
+            conn.commit()
+            print("Column added successfully.")
+        else:
+            print("Column 'actor_count' already exists.")
+
+        conn.close()
+    except Exception as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    add_column()
@@ -0,0 +1,20 @@
+import sqlite3
+
+DB_PATH = "bragboard.db"
+
+# The notification retention job looks rows up by created_at alone, which the
+# (user_id, is_read, created_at) index can't serve.
+def add_index():
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        print("Ensuring index ix_notifications_created_at...")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_created_at ON notifications (created_at)")
+        conn.commit()
+        conn.close()
+        print("Index ready.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    add_index()
@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import os
+
+from app.models import NotificationUnreadCount
+from app import unread_counters
+
+DATABASE_URL = "sqlite:///./bragboard.db"
+
+# notifications.is_read becomes a boolean in the models. SQLite already stores
+# it as 0/1, so existing rows only need their NULLs cleared; then the unread
+# index is added and notification_unread_counts is filled from the data.
+def migrate():
+    if not os.path.exists("bragboard.db"):
+        print("Database not found, skipping migration (will be created by app).")
+        return
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        try:
+            print("Normalizing notifications.is_read...")
+            conn.execute(text("UPDATE notifications SET is_read = 0 WHERE is_read IS NULL"))
+            conn.execute(text("UPDATE notifications SET is_read = 1 WHERE is_read NOT IN (0, 1)"))
+
+            print("Ensuring index ix_notifications_user_unread...")
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_notifications_user_unread "
+                "ON notifications (user_id, is_read, created_at)"
+            ))
+            NotificationUnreadCount.__table__.create(conn, checkfirst=True)
+            conn.commit()
+
+            db = sessionmaker(bind=engine)()
+            try:
+                users = unread_counters.rebuild(db)
+                db.commit()
+            finally:
+                db.close()
+            print(f"Unread counters rebuilt for {users} users.")
+            print("Migration completed.")
+
+        except Exception as e:
+            print(f"Error: {e}")
+
+if __name__ == "__main__":
+    migrate()
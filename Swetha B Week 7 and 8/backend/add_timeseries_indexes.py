@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine, text
+import os
+
+DATABASE_URL = "sqlite:///./bragboard.db"
+
+# Indexes backing the range scans done by /stats/timeseries
+INDEXES = {
+    "ix_shoutouts_created_at": ("shoutouts", "created_at"),
+    "ix_reactions_created_at": ("reactions", "created_at"),
+    "ix_comments_created_at": ("comments", "created_at"),
+}
+
+def migrate():
+    if not os.path.exists("bragboard.db"):
+        print("Database not found, skipping migration.")
+        return
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        try:
+            # Reactions had no timestamp before
+            result = conn.execute(text("PRAGMA table_info(reactions)"))
+            existing_columns = [row.name for row in result.fetchall()]
+
+            if "created_at" not in existing_columns:
+                print("Adding reactions.created_at column...")
+                conn.execute(text("ALTER TABLE reactions ADD COLUMN created_at DATETIME"))
+            else:
+                print("reactions.created_at column already exists.")
+
+            for index_name, (table, column) in INDEXES.items():
+                print(f"Ensuring index {index_name}...")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})"))
+
+            conn.commit()
+            print("Migration completed.")
+
+        except Exception as e:
+            print(f"Error: {e}")
+
+if __name__ == "__main__":
+    migrate()
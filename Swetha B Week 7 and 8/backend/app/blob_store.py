@@ -0,0 +1,145 @@
+# backend/app/blob_store.py
+"""
+Content-addressed storage for uploads.
+
+Each upload is streamed to a temp file while its SHA-256 is computed, then
+handed to the storage backend (see storage.py) under the key
+blobs/<first 2 hex chars>/<remaining hex><ext>. Identical files therefore end
+up as a single stored copy; the `blobs` table keeps one row per distinct file
+with a reference count. Callers store the returned URL as before (image_url,
+profile_image_url) and call `release` when a reference goes away. The
+increment happens in the caller's transaction, so it is committed together
+with the row that points at the blob.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, storage
+from .image_derivatives import FORMATS, WIDTHS, derivative_key
+
+UPLOAD_DIR = "uploads"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+CHUNK_SIZE = 1024 * 1024
+_SAFE_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+def blob_key(digest: str, extension: str = "") -> str:
+    return f"blobs/{digest[:2]}/{digest[2:]}{extension}"
+
+
+def local_path(url: str) -> str:
+    return url.lstrip("/").replace("/", os.sep)
+
+
+def safe_extension(filename: str | None) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if _SAFE_EXTENSION.match(extension) else ""
+
+
+def write_temp(fileobj, chunk_size: int = CHUNK_SIZE):
+    """
+    Copies a stream to a temp file under BLOB_DIR (local disk whatever the
+    backend); returns (path, sha256 hex, size).
+    """
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def _acquire(db: Session, digest: str) -> bool:
+    """Bumps the reference count of an existing blob; False if there is none."""
+    updated = db.query(models.Blob).filter(models.Blob.sha256 == digest).update(
+        {models.Blob.ref_count: models.Blob.ref_count + 1}, synchronize_session=False
+    )
+    return updated > 0
+
+
+def store(db: Session, fileobj, filename: str | None = None, backend: storage.StorageBackend | None = None) -> str:
+    """
+    Stores a stream and returns its URL, reusing an identical blob when there
+    is one. Does not commit.
+    """
+    backend = backend or storage.get_storage()
+    tmp_path, digest, size = write_temp(fileobj)
+    try:
+        if _acquire(db, digest):
+            url = db.query(models.Blob.path).filter(models.Blob.sha256 == digest).scalar()
+            owner = storage.backend_for(url)
+            if owner is not None and not owner.exists(url):
+                # The row outlived its file (e.g. a rolled back release); put it back
+                owner.save_file(tmp_path, owner.key_for_url(url))
+            return url
+
+        url = backend.save_file(tmp_path, blob_key(digest, safe_extension(filename)))
+
+        try:
+            with db.begin_nested():
+                db.add(models.Blob(sha256=digest, path=url, size=size, ref_count=1))
+        except IntegrityError:
+            # Someone stored the same content concurrently (under the same key)
+            _acquire(db, digest)
+            return db.query(models.Blob.path).filter(models.Blob.sha256 == digest).scalar()
+        return url
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def release(db: Session, url: str | None):
+    """
+    Drops one reference to the blob behind `url`. The file and its resized
+    copies (see image_derivatives) are deleted with the last reference. URLs that are not blobs (older uploads) are ignored.
+    Does not commit.
+    """
+    backend, urls = _drop_reference(db, url)
+    for file_url in urls:
+        backend.delete(file_url)
+
+
+async def arelease(db: Session, url: str | None):
+    """release for async endpoints: the stored files are deleted concurrently, off the event loop."""
+    backend, urls = _drop_reference(db, url)
+    await asyncio.gather(*(backend.adelete(file_url) for file_url in urls))
+
+
+def _drop_reference(db: Session, url: str | None):
+    """Decrements the blob's count; returns its backend and the file URLs to delete, if that was the last reference."""
+    if not url:
+        return None, []
+    blob = db.query(models.Blob).filter(models.Blob.path == url).first()
+    if blob is None:
+        return None, []
+
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        return None, []
+    db.delete(blob)
+    backend = storage.backend_for(url)
+    if backend is None:
+        return None, []
+    key = backend.key_for_url(url)
+    derivatives = [backend.url_for(derivative_key(key, width, extension))
+                   for width in WIDTHS for extension, _, _ in FORMATS]
+    return backend, [url, *derivatives]
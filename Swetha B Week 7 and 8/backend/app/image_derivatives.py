@@ -0,0 +1,113 @@
+# backend/app/image_derivatives.py
+"""
+Feed-sized copies of shoutout images.
+
+The original upload stays where it was stored. Next to it we store
+<name>_w<width>.webp and .jpg for each width in WIDTHS that is smaller than
+the original, and store the list on ShoutOut.image_derivatives so the
+frontend can build a srcset instead of always loading the full photo.
+"""
+import os
+import uuid
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .database import SessionLocal
+from . import models, storage
+
+WIDTHS = (320, 640, 1280)
+FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+EXIF_ORIENTATION = 0x0112
+
+
+def derivative_key(key: str, width: int, extension: str) -> str:
+    return f"{os.path.splitext(key)[0]}_w{width}.{extension}"
+
+
+def _to_rgb(image):
+    # JPEG can't store alpha, so transparent areas become white
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        return flat
+    return image.convert("RGB")
+
+
+def generate_derivatives(source_path, widths=WIDTHS):
+    """
+    Writes the resized copies for one image and returns
+    [{"width", "format", "path"}] sorted by width.
+
+    Never upscales, and skips animated GIFs and anything that isn't an image.
+    """
+    try:
+        image = Image.open(source_path)
+    except (UnidentifiedImageError, OSError):
+        return []
+
+    results = []
+    with image:
+        if getattr(image, "is_animated", False):
+            return []
+
+        # EXIF orientations 5-8 are stored rotated by 90 degrees: the displayed width is the stored height
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+        widths = sorted((w for w in widths if w < (image.height if rotated else image.width)), reverse=True)
+        if not widths:
+            return []
+
+        # JPEG: decode at reduced scale (draft sees the stored, unrotated size)
+        image.draft("RGB", (1, widths[0]) if rotated else (widths[0], 1))
+        current = _to_rgb(ImageOps.exif_transpose(image))
+
+        # Largest first, each one resized from the previous
+        for width in widths:
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.LANCZOS)
+
+            stem = os.path.splitext(source_path)[0]
+            for extension, pil_format, options in FORMATS:
+                target = f"{stem}_w{width}.{extension}"
+                # Identical uploads share a file, so two tasks can write these at once
+                tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+                current.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, target)
+                results.append({"width": width, "format": extension, "path": target})
+
+    results.sort(key=lambda d: (d["width"], d["format"]))
+    return results
+
+
+def generate_for_shoutout(shoutout_id: int, image_url: str, session_factory=SessionLocal):
+    """Background task: build the derivatives of a stored image and save them on the shoutout."""
+    backend = storage.backend_for(image_url)
+    if backend is None:
+        return
+    key = backend.key_for_url(image_url)
+    try:
+        # Resized from a local copy (the file itself with local storage)
+        with backend.local_copy(image_url) as source_path:
+            derivatives = [
+                {
+                    "width": d["width"],
+                    "format": d["format"],
+                    "url": backend.save_file(d["path"], derivative_key(key, d["width"], d["format"])),
+                }
+                for d in generate_derivatives(source_path)
+            ]
+    except Exception as e:
+        print(f"Could not generate derivatives for {image_url}: {e}")
+        return
+
+    db = session_factory()
+    try:
+        shoutout = db.query(models.ShoutOut).filter(models.ShoutOut.id == shoutout_id).first()
+        if shoutout:
+            shoutout.image_derivatives = derivatives
+            db.commit()
+    finally:
+        db.close()
@@ -2,8 +2,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from . import models
 from .database import engine
-from .routers import auth, users, shoutouts, notifications, activity, comments, admin
-from fastapi.staticfiles import StaticFiles
+from .routers import auth, users, shoutouts, notifications, activity, comments, admin, stats
+from .media_files import MediaFiles
+from . import storage
+from . import unread_counters  # keeps notification_unread_counts in step
+from .notification_hub import notification_hub
+from .notification_retention import retention_job
 import os
 
 # Create uploads directory if it doesn't exist
@@ -16,7 +20,7 @@ models.Base.metadata.create_all(bind=engine)
 app = FastAPI(title="BragBoard API")
 
 # Mount the uploads directory to serve static files
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+app.mount("/uploads", MediaFiles(directory=UPLOAD_DIR), name="uploads")
 
 # Allow frontend on Vite dev server
 origins = [
@@ -31,6 +35,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+def close_storage():
+    storage.close_storage()
+
+@app.on_event("startup")
+def start_notification_push():
+    notification_hub.start()
+
+@app.on_event("shutdown")
+def stop_notification_push():
+    notification_hub.shutdown()
+
+@app.on_event("startup")
+def start_notification_retention():
+    retention_job.start()
+
+@app.on_event("shutdown")
+def stop_notification_retention():
+    retention_job.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to BragBoard API"}
@@ -42,3 +66,4 @@ app.include_router(comments.router)
 app.include_router(activity.router)
 app.include_router(notifications.router)
 app.include_router(admin.router)
+app.include_router(stats.router)
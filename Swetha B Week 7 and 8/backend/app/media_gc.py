@@ -0,0 +1,133 @@
+# backend/app/media_gc.py
+"""
+Mark-and-sweep cleanup of files under uploads/ that nothing points at.
+
+Some deletes drop rows without their files (images from before the blob
+store, uploads interrupted halfway), so uploads/ only grows. `mark` streams
+every image URL the database still references into a set; `sweep` walks
+uploads/ with os.scandir in batches and deletes or quarantines each file
+that is unreferenced and older than the grace period (which protects
+uploads written before their row is committed). Removals are rate limited
+and the walk pauses between batches to keep disk I/O reasonable.
+
+Run it through gc_media.py in the backend directory.
+"""
+import datetime
+import os
+import shutil
+import time
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+UPLOAD_DIR = "uploads"
+QUARANTINE_DIR = "media_quarantine"  # outside uploads/, so quarantined files aren't served
+GRACE_HOURS = 24
+MODES = ("report", "quarantine", "delete")
+
+
+class RateLimiter:
+    """At most `rate` calls to wait() per second; 0 means unlimited."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def referenced_urls(db: Session, page_size: int = 1000):
+    for (url,) in db.query(models.User.profile_image_url).yield_per(page_size):
+        yield url
+    for url, derivatives in db.query(models.ShoutOut.image_url, models.ShoutOut.image_derivatives).yield_per(page_size):
+        yield url
+        for derivative in derivatives or []:
+            yield derivative.get("url")
+    for (url,) in db.query(models.Blob.path).yield_per(page_size):
+        yield url
+
+
+def mark(db: Session) -> set:
+    """Paths relative to uploads/ that the database still uses."""
+    return {url[len("/uploads/"):] for url in referenced_urls(db) if url and url.startswith("/uploads/")}
+
+
+def scan_files(root: str, batch_size: int = 500):
+    """Yields the files under root in lists of at most batch_size DirEntry objects."""
+    pending = [root]
+    batch = []
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        batch.append(entry)
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+        except FileNotFoundError:
+            continue
+    if batch:
+        yield batch
+
+
+def sweep(referenced: set, root: str = UPLOAD_DIR, mode: str = "report", grace_hours: float = GRACE_HOURS,
+          rate: float = 50, batch_size: int = 500, pause: float = 0.05, quarantine_dir: str = QUARANTINE_DIR,
+          now: float = None) -> dict:
+    """
+    Deletes (mode="delete"), moves to quarantine_dir (mode="quarantine") or
+    just lists (mode="report") orphaned files. Returns counters.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    cutoff = (now or time.time()) - grace_hours * 3600
+    quarantine_root = os.path.join(quarantine_dir, datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S"))
+    limiter = RateLimiter(rate)
+    stats = {"scanned": 0, "orphaned": 0, "removed": 0, "recent": 0, "bytes": 0, "errors": 0}
+
+    for batch in scan_files(root, batch_size):
+        for entry in batch:
+            stats["scanned"] += 1
+            relative_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            if relative_path in referenced or entry.name.startswith("."):
+                continue
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat_result.st_mtime > cutoff:
+                stats["recent"] += 1
+                continue
+
+            stats["orphaned"] += 1
+            stats["bytes"] += stat_result.st_size
+            if mode == "report":
+                print(f"orphan: {relative_path}")
+                continue
+
+            limiter.wait()
+            try:
+                if mode == "delete":
+                    os.remove(entry.path)
+                else:
+                    target = os.path.join(quarantine_root, relative_path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(entry.path, target)
+                stats["removed"] += 1
+            except OSError as e:
+                stats["errors"] += 1
+                print(f"Could not remove {relative_path}: {e}")
+        if pause:
+            time.sleep(pause)
+    return stats
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, Boolean, String, ForeignKey, DateTime, Enum, Text, JSON, Index, false
+from sqlalchemy.orm import relationship, column_property
 import datetime
 import enum
 from .database import Base
@@ -47,11 +47,12 @@ class ShoutOut(Base):
     sender_id = Column(Integer, ForeignKey("users.id"))
     message = Column(Text)
     image_url = Column(String, nullable=True)
+    image_derivatives = Column(JSON, nullable=True) # [{"width", "format", "url"}] resized copies of image_url
     edit_count = Column(Integer, default=0)
     is_edited = Column(Integer, default=0) # 0=False, 1=True
     is_edited = Column(Integer, default=0) # 0=False, 1=True
     last_edited_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
     location = Column(String, nullable=True)
 
     sender = relationship("User", back_populates="shoutouts_sent")
@@ -78,7 +79,7 @@ class Comment(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     parent_id = Column(Integer, ForeignKey("comments.id"), nullable=True) # New field
     content = Column(Text)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
 
     shoutout = relationship("ShoutOut", back_populates="comments")
     user = relationship("User", back_populates="comments")
@@ -92,6 +93,7 @@ class Reaction(Base):
     shoutout_id = Column(Integer, ForeignKey("shoutouts.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
     type = Column(Enum(ReactionType))
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
 
     shoutout = relationship("ShoutOut", back_populates="reactions")
     user = relationship("User", back_populates="reactions")
@@ -131,7 +133,9 @@ class Notification(Base):
     shoutout_id = Column(Integer, ForeignKey("shoutouts.id"), nullable=True)
     type = Column(String) # 'reaction', 'comment'
     message = Column(String)
-    is_read = Column(Integer, default=0)
+    # active_history: unread_counters needs the old value even when it was expired
+    is_read = column_property(Column(Boolean, default=False, server_default=false(), nullable=False), active_history=True)
+    actor_count = Column(Integer, default=1, server_default="1", nullable=False) # > 1 once reactions are coalesced
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     # Relationships
@@ -139,6 +143,20 @@ class Notification(Base):
     actor = relationship("User", foreign_keys=[actor_id])
     shoutout = relationship("ShoutOut")
 
+    __table_args__ = (
+        # The notification list and the unread filter: one user's rows, newest first
+        Index("ix_notifications_user_unread", "user_id", "is_read", "created_at"),
+        # The retention job's scan (notification_retention.py)
+        Index("ix_notifications_created_at", "created_at"),
+    )
+
+class NotificationUnreadCount(Base):
+    __tablename__ = "notification_unread_counts"
+
+    # One row per user, maintained by app/unread_counters.py
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+
 # Association Table for Followers
 from sqlalchemy import Table
 followers = Table(
@@ -178,4 +196,13 @@ class ScreenTime(Base):
     
     user = relationship("User", backref="screen_time_logs")
 
+class Blob(Base):
+    """One stored upload per distinct content, shared by every row that references it."""
+    __tablename__ = "blobs"
 
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    path = Column(String, unique=True, nullable=False) # /uploads/blobs/ab/cdef...
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
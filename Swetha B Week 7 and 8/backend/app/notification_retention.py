@@ -0,0 +1,97 @@
+# backend/app/notification_retention.py
+"""
+Background pruning of old notifications.
+
+Notifications were never deleted, so the table only grew. RetentionJob runs
+in a daemon thread and, every PRUNE_INTERVAL seconds, deletes notifications
+older than RETENTION_DAYS. The deletion is split into batches of BATCH_SIZE
+ids, each committed on its own with a short sleep after it: SQLite allows one
+writer at a time, and a single huge DELETE would block every request that
+wants to write until it finished.
+
+The batches are ORM bulk deletes through SessionLocal, so unread_counters
+lowers the counts of any unread rows that expire. NOTIFICATION_RETENTION_DAYS=0
+disables the job.
+"""
+import datetime
+import os
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+RETENTION_DAYS = float(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+PRUNE_INTERVAL = float(os.getenv("NOTIFICATION_PRUNE_INTERVAL", "3600"))
+BATCH_SIZE = int(os.getenv("NOTIFICATION_PRUNE_BATCH_SIZE", "500"))
+BATCH_PAUSE = 0.05
+
+
+def delete_batch(db: Session, cutoff: datetime.datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Deletes at most batch_size notifications created before cutoff; the caller commits."""
+    ids = db.execute(
+        select(models.Notification.id)
+        .where(models.Notification.created_at < cutoff)
+        .order_by(models.Notification.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if ids:
+        db.query(models.Notification).filter(models.Notification.id.in_(ids)).delete(synchronize_session=False)
+    return len(ids)
+
+
+def prune_expired(retention_days: float = RETENTION_DAYS, batch_size: int = BATCH_SIZE,
+                  pause: float = BATCH_PAUSE, stop: threading.Event | None = None,
+                  session_factory=SessionLocal) -> int:
+    """Deletes notifications older than retention_days batch by batch; returns how many went."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)
+    total = 0
+    while stop is None or not stop.is_set():
+        db = session_factory()
+        try:
+            deleted = delete_batch(db, cutoff, batch_size)
+            db.commit()
+        finally:
+            db.close()
+        total += deleted
+        if deleted < batch_size:
+            break
+        time.sleep(pause)
+    return total
+
+
+class RetentionJob:
+    def __init__(self, retention_days: float = RETENTION_DAYS, interval: float = PRUNE_INTERVAL):
+        self.retention_days = retention_days
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.retention_days <= 0 or self.thread:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="notification-retention", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                deleted = prune_expired(self.retention_days, stop=self.stopping)
+                if deleted:
+                    print(f"Pruned {deleted} expired notifications")
+            except Exception as e:
+                print(f"Notification pruning failed: {e}")
+            self.stopping.wait(self.interval)
+
+    def shutdown(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+            self.thread = None
+
+
+retention_job = RetentionJob()
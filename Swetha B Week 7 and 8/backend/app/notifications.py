@@ -0,0 +1,277 @@
+# backend/app/notifications.py
+"""
+Bulk recipient and notification writes.
+
+Shoutouts to a whole team used to check each recipient with its own SELECT
+and add a ShoutOutRecipient and a Notification object per person; comments
+added one Notification per recipient of the shoutout. Here recipients are
+validated with a single IN query and rows are written with one multi-row
+INSERT per batch.
+
+Fan-outs above BACKGROUND_THRESHOLD recipients can be handed to a
+BackgroundTasks instance (see `fan_out`); the notifications are then written
+in their own session after the response has been sent.
+
+Notifications committed through a SessionLocal session, whether written here
+or added as ORM objects by the routers, are published to the recipient's
+open streams (notification_hub.py) after the commit. Bulk inserts bump the
+unread counters (unread_counters.py) in the same transaction.
+
+Reactions use `coalesce`: while the author has not read it, every reaction
+to a shoutout within COALESCE_WINDOW lands on the same row ("Alice and 41
+others reacted to your shoutout") instead of adding one. Merges are not
+pushed; the client sees them on its next fetch.
+
+`mark_read` and `delete_read_before` are the set-based versions of the
+per-notification endpoints: one UPDATE or DELETE however many rows match.
+Old notifications are removed by notification_retention.py.
+"""
+import datetime
+import os
+from collections import Counter
+
+from fastapi import BackgroundTasks
+from sqlalchemy import and_, event, false, insert, or_, select, true
+from sqlalchemy.orm import Session
+
+from . import models, schemas, unread_counters
+from .database import SessionLocal
+from .notification_hub import notification_hub
+
+BACKGROUND_THRESHOLD = int(os.getenv("NOTIFICATION_BACKGROUND_THRESHOLD", "200"))
+BATCH_SIZE = 1000
+# Cap on what a reconnecting stream gets replayed; the list endpoint has the rest
+REPLAY_LIMIT = 500
+# A notification can commit after one with a higher id (ids are handed out at INSERT),
+# so replay also resends what was created within this long of the client's last event
+REPLAY_OVERLAP = datetime.timedelta(seconds=10)
+# How long after its latest merge an unread notification keeps absorbing new ones
+COALESCE_WINDOW = datetime.timedelta(seconds=int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "3600")))
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def to_event(notification) -> dict:
+    """A Notification row, or a dict of its columns, as the JSON sent to streams."""
+    return schemas.NotificationOut.model_validate(notification).model_dump(mode="json")
+
+
+def _queue_push(session: Session, events):
+    session.info.setdefault("pending_notification_events", []).extend(events)
+
+
+def _after_flush(session: Session, flush_context):
+    _queue_push(session, [to_event(obj) for obj in session.new if isinstance(obj, models.Notification)])
+
+
+def _after_commit(session: Session):
+    for pushed in session.info.pop("pending_notification_events", []):
+        try:
+            notification_hub.publish(pushed["user_id"], pushed)
+        except Exception as e:
+            # Not fatal: the client picks it up from the replay on reconnect
+            print(f"Notification push failed: {e}")
+
+
+def _after_rollback(session: Session):
+    session.info.pop("pending_notification_events", None)
+
+
+def register(session_factory=SessionLocal):
+    """Attach the push listeners to a sessionmaker (idempotent)."""
+    for name, listener in (("after_flush", _after_flush), ("after_commit", _after_commit),
+                           ("after_rollback", _after_rollback)):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)
+
+
+def replay(db: Session, user_id: int, after_id: int | None):
+    """
+    Events for the user's notifications after after_id, oldest first; none
+    without an id. Anything within REPLAY_OVERLAP of after_id's notification
+    is included as well, so clients must skip ids they already have.
+    """
+    if after_id is None:
+        return []
+    seen_at = db.query(models.Notification.created_at).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.id <= after_id,
+    ).order_by(models.Notification.id.desc()).limit(1).scalar()
+    missed = models.Notification.id > after_id
+    if seen_at is not None:
+        missed = or_(missed, and_(models.Notification.id < after_id,
+                                  models.Notification.created_at >= seen_at - REPLAY_OVERLAP))
+    rows = db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        missed,
+    ).order_by(models.Notification.id).limit(REPLAY_LIMIT).all()
+    return [to_event(row) for row in rows]
+
+
+def find_missing_users(db: Session, user_ids):
+    """Ids from user_ids with no matching user, in the order given."""
+    wanted = list(dict.fromkeys(user_ids))
+    found = set()
+    for batch in _batches(wanted):
+        found.update(db.execute(select(models.User.id).where(models.User.id.in_(batch))).scalars())
+    return [user_id for user_id in wanted if user_id not in found]
+
+
+def add_recipients(db: Session, shoutout_id: int, recipient_ids) -> int:
+    """Writes one ShoutOutRecipient per distinct id; does not commit. Returns the row count."""
+    rows = [
+        {"shoutout_id": shoutout_id, "recipient_id": recipient_id}
+        for recipient_id in dict.fromkeys(recipient_ids)
+    ]
+    for batch in _batches(rows):
+        db.execute(insert(models.ShoutOutRecipient), batch)
+    return len(rows)
+
+
+def notify(db: Session, user_ids, actor_id: int, type: str, message: str, shoutout_id: int | None = None) -> int:
+    """Writes the same notification for every distinct user; does not commit. Returns the row count."""
+    created_at = datetime.datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "actor_id": actor_id,
+            "shoutout_id": shoutout_id,
+            "type": type,
+            "message": message,
+            "is_read": False,
+            "created_at": created_at,
+        }
+        for user_id in dict.fromkeys(user_ids)
+    ]
+    statement = insert(models.Notification).returning(models.Notification.id, sort_by_parameter_order=True)
+    for batch in _batches(rows):
+        ids = db.execute(statement, batch).scalars().all()
+        _queue_push(db, [to_event({**row, "id": row_id}) for row, row_id in zip(batch, ids)])
+    unread_counters.adjust(db, Counter(row["user_id"] for row in rows))
+    return len(rows)
+
+
+def mark_read(db: Session, user_id: int, notification_ids=None) -> int:
+    """Marks the user's unread notifications (or just notification_ids) read in one UPDATE; does not commit."""
+    query = db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == false(),
+    )
+    if notification_ids is not None:
+        query = query.filter(models.Notification.id.in_(list(notification_ids)))
+    updated = query.update({models.Notification.is_read: True}, synchronize_session=False)
+    # Bulk UPDATEs bypass the flush listeners of unread_counters
+    unread_counters.adjust(db, {user_id: -updated})
+    return updated
+
+
+def delete_read_before(db: Session, user_id: int, before: datetime.datetime) -> int:
+    """Deletes the user's read notifications created before `before` in one DELETE; does not commit."""
+    return db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == true(),
+        models.Notification.created_at < before,
+    ).delete(synchronize_session=False)
+
+
+def describe_actors(name: str, actor_count: int) -> str:
+    """'Alice', 'Alice and 1 other' or 'Alice and 41 others'."""
+    others = actor_count - 1
+    if others <= 0:
+        return name
+    return f"{name} and {others} other{'s' if others > 1 else ''}"
+
+
+def _coalescible(db: Session, user_id: int, type: str, shoutout_id: int | None,
+                 now: datetime.datetime) -> models.Notification | None:
+    # ix_notifications_user_unread narrows this to the user's recent unread rows;
+    # FOR UPDATE (where supported) stops two reactions from both missing the row
+    return db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == false(),
+        models.Notification.created_at >= now - COALESCE_WINDOW,
+        models.Notification.shoutout_id == shoutout_id,
+        models.Notification.type == type,
+    ).order_by(models.Notification.created_at.desc()).with_for_update().first()
+
+
+def coalesce(db: Session, user_id: int, actor: models.User, type: str, action: str,
+             shoutout_id: int | None = None, grouped_action: str | None = None,
+             actor_count: int | None = None) -> models.Notification:
+    """
+    Notifies user_id that actor did `action`, or folds it into their unread
+    notification of the same type and shoutout from the last COALESCE_WINDOW:
+    the message names the new actor followed by `grouped_action`, and the row
+    moves to the top of the list. actor_count is how many distinct people are
+    behind it now (e.g. counted from Reaction rows); without it the count goes
+    up unless the latest actor acted again. Does not commit.
+    """
+    now = datetime.datetime.utcnow()
+    notification = _coalescible(db, user_id, type, shoutout_id, now)
+
+    if notification is None:
+        notification = models.Notification(user_id=user_id, actor_id=actor.id, shoutout_id=shoutout_id,
+                                           type=type, message=f"{actor.name} {action}", created_at=now)
+        db.add(notification)
+        return notification
+
+    if actor_count is not None:
+        notification.actor_count = max(actor_count, 1)
+    elif notification.actor_id != actor.id:
+        notification.actor_count += 1
+    notification.actor_id = actor.id
+    notification.message = f"{describe_actors(actor.name, notification.actor_count)} {grouped_action or action}"
+    notification.created_at = now
+    return notification
+
+
+def recount(db: Session, user_id: int, type: str, grouped_action: str, shoutout_id: int | None,
+            actor_count: int, actor: models.User | None = None) -> models.Notification | None:
+    """
+    Sets the actor count of the notification coalesce() would fold into, e.g.
+    after someone takes their reaction back, naming `actor` (someone still
+    behind it); the row keeps its place in the list. With no actors left the
+    row is deleted, which also drops it from the unread count. Returns None
+    when no notification is left. Does not commit.
+    """
+    notification = _coalescible(db, user_id, type, shoutout_id, datetime.datetime.utcnow())
+    if notification is None:
+        return None
+    if actor_count <= 0:
+        db.delete(notification)
+        return None
+    if actor is not None:
+        notification.actor_id = actor.id
+    notification.actor_count = actor_count
+    name = actor.name if actor is not None else notification.actor.name
+    notification.message = f"{describe_actors(name, actor_count)} {grouped_action}"
+    return notification
+
+
+def notify_in_background(user_ids, **notification):
+    """Background-task entry point: commits every BATCH_SIZE notifications."""
+    db = SessionLocal()
+    try:
+        for batch in _batches(list(user_ids)):
+            notify(db, batch, **notification)
+            db.commit()
+    finally:
+        db.close()
+
+
+def fan_out(db: Session, background_tasks: BackgroundTasks, user_ids, **notification):
+    """
+    Notifies user_ids in the caller's transaction, or after the response when
+    there are more than BACKGROUND_THRESHOLD of them. The caller commits.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if len(user_ids) > BACKGROUND_THRESHOLD:
+        background_tasks.add_task(notify_in_background, user_ids, **notification)
+    else:
+        notify(db, user_ids, **notification)
+
+
+register()
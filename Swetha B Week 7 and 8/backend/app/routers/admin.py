@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
-from .. import schemas, models
+from .. import schemas, models, blob_store
 from ..database import get_db
 from ..deps import get_current_user
 import csv
@@ -96,6 +96,7 @@ def admin_delete_shoutout(
     db.query(models.ShoutOutRecipient).filter(models.ShoutOutRecipient.shoutout_id == shoutout_id).delete()
     db.query(models.Report).filter(models.Report.shoutout_id == shoutout_id).delete()
     
+    blob_store.release(db, shoutout.image_url)
     db.delete(shoutout)
     
     # Log admin action
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas, database, notifications, unread_counters
 from ..deps import get_current_user
+from ..notification_hub import event_stream, notification_hub
+from ..security import decode_access_token
 
 router = APIRouter(
     prefix="/notifications",
@@ -20,6 +25,94 @@ def get_notifications(
         .all()
     return notifications
 
+@router.get("/unread-count", response_model=schemas.UnreadCountOut)
+def get_unread_count(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # One primary-key lookup on the maintained counter
+    return {"unread": unread_counters.unread_count(db, current_user.id)}
+
+def _stream_replay(user_id: int, last_event_id: int | None):
+    # A short session of its own; the stream must not hold a connection for its whole life
+    db = database.SessionLocal()
+    try:
+        if db.get(models.User, user_id) is None:
+            return None
+        return notifications.replay(db, user_id, last_event_id)
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    access_token: str | None = None,
+    last_event_id: int | None = None,
+):
+    # Server-Sent Events: one event per new notification, its id being the notification id.
+    # EventSource can't send an Authorization header, hence ?access_token=.
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        access_token = authorization[7:]
+    # EventSource sends this on reconnect; it is newer than the one in the URL
+    header_event_id = request.headers.get("last-event-id", "")
+    if header_event_id.isdigit():
+        last_event_id = int(header_event_id)
+
+    user_id = decode_access_token(access_token) if access_token else None
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+
+    # Subscribed before the replay query, so nothing committed in between is lost
+    subscription = notification_hub.subscribe(user_id)
+    try:
+        replay = await run_in_threadpool(_stream_replay, user_id, last_event_id)
+    except Exception:
+        notification_hub.unsubscribe(subscription)
+        raise
+    if replay is None:
+        notification_hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return StreamingResponse(
+        event_stream(subscription, replay),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.put("/read-all", response_model=schemas.BulkNotificationOut)
+def mark_all_notifications_read(
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    count = notifications.mark_read(db, current_user.id)
+    db.commit()
+    return {"count": count}
+
+@router.put("/read", response_model=schemas.BulkNotificationOut)
+def mark_notifications_read(
+    body: schemas.NotificationIdsIn,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Other users' ids and ones already read are simply not counted
+    count = notifications.mark_read(db, current_user.id, body.ids)
+    db.commit()
+    return {"count": count}
+
+@router.delete("/", response_model=schemas.BulkNotificationOut)
+def delete_read_notifications(
+    before: datetime.datetime,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Only read notifications go; created_at is naive UTC
+    if before.tzinfo is not None:
+        before = before.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    count = notifications.delete_read_before(db, current_user.id, before)
+    db.commit()
+    return {"count": count}
+
 @router.put("/{notification_id}/read")
 def mark_notification_read(
     notification_id: int,
@@ -33,6 +126,6 @@ def mark_notification_read(
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    notification.is_read = 1
+    notification.is_read = True
     db.commit()
     return {"status": "success"}
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile, BackgroundTasks
+from sqlalchemy import func
 from sqlalchemy.orm import Session, aliased, joinedload
 from .. import schemas, models
 from ..database import get_db
 from ..deps import get_current_user
+from .. import image_derivatives, blob_store, notifications
 from datetime import datetime
 
 router = APIRouter(prefix="/shoutouts", tags=["Shoutouts"])
@@ -62,6 +64,7 @@ def read_shoutouts(
 
 @router.post("/", response_model=schemas.ShoutOutOut)
 def create_shoutout(
+    background_tasks: BackgroundTasks,
     message: str = Form(...),
     recipient_ids: list[str] = Form(None), 
     location: str = Form(None), # Added location
@@ -72,40 +75,22 @@ def create_shoutout(
     if not recipient_ids:
          raise HTTPException(status_code=400, detail="At least one recipient must be selected")
 
-    # Verify recipients exist
-    recipients = []
+    parsed_ids = []
     for r_id in recipient_ids:
         try:
-            recipient_id = int(r_id)
+            parsed_ids.append(int(r_id))
         except ValueError:
              raise HTTPException(status_code=400, detail=f"Invalid recipient ID: {r_id}")
-             
-        user = db.query(models.User).filter(models.User.id == recipient_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail=f"User with id {recipient_id} not found")
-        recipients.append(user)
+
+    # Verify recipients exist (one IN query for all of them)
+    missing = notifications.find_missing_users(db, parsed_ids)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"User with id {missing[0]} not found")
     
     image_url = None
     if file:
-        import shutil
-        import os
-        import uuid
-        
-        # Ensure uploads directory exists (safety check, though main.py should have created it)
-        UPLOAD_DIR = "uploads"
-        if not os.path.exists(UPLOAD_DIR):
-            os.makedirs(UPLOAD_DIR)
-            
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1]
-        filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Store relative URL
-        image_url = f"/uploads/{filename}"
+        # Identical images are stored once and shared (see blob_store)
+        image_url = blob_store.store(db, file.file, file.filename)
     
     # Create shoutout
     db_shoutout = models.ShoutOut(
@@ -118,28 +103,24 @@ def create_shoutout(
     db.commit()
     db.refresh(db_shoutout)
     
-    # Add recipients and create notifications
-    for recipient in recipients:
-        db_recipient = models.ShoutOutRecipient(
-            shoutout_id=db_shoutout.id,
-            recipient_id=recipient.id
-        )
-        db.add(db_recipient)
-
-        # Create Notification
-        # Ensure we don't notify ourselves if we tag ourselves (optional but good practice)
-        if recipient.id != current_user.id:
-            notification = models.Notification(
-                user_id=recipient.id,
-                actor_id=current_user.id,
-                shoutout_id=db_shoutout.id,
-                type='shoutout',
-                message=f"You received a shoutout from {current_user.name}!",
-            )
-            db.add(notification)
+    # Add recipients and create notifications, one multi-row insert each
+    notifications.add_recipients(db, db_shoutout.id, parsed_ids)
+    # Don't notify ourselves if we tag ourselves; large fan-outs run after the response
+    notifications.fan_out(
+        db, background_tasks,
+        [recipient_id for recipient_id in parsed_ids if recipient_id != current_user.id],
+        actor_id=current_user.id,
+        shoutout_id=db_shoutout.id,
+        type='shoutout',
+        message=f"You received a shoutout from {current_user.name}!",
+    )
     
     db.commit()
     db.refresh(db_shoutout)
+
+    # Thumbnails are generated after the response is sent
+    if image_url:
+        background_tasks.add_task(image_derivatives.generate_for_shoutout, db_shoutout.id, image_url)
     return db_shoutout
 
 @router.delete("/{shoutout_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -162,6 +143,7 @@ def delete_shoutout(
     # Let's check models again quickly, or safeguard by deleting recipients first.
     db.query(models.ShoutOutRecipient).filter(models.ShoutOutRecipient.shoutout_id == shoutout_id).delete()
     
+    blob_store.release(db, shoutout.image_url)
     db.delete(shoutout)
     db.commit()
     return None
@@ -188,6 +170,13 @@ def add_reaction(
         # Standard: if same type, remove. If different, update.
         if existing.type == type:
              db.delete(existing)
+             db.flush()
+             # One person fewer behind the author's merged notification
+             if shoutout.sender_id != current_user.id:
+                 reactors = _reactors(db, shoutout)
+                 notifications.recount(db, user_id=shoutout.sender_id, type='reaction',
+                                       grouped_action="reacted to your shoutout", shoutout_id=shoutout.id,
+                                       actor_count=reactors.count(), actor=reactors.first())
              db.commit()
              # Return a dummy reaction with 'removed' type or handle 204?
              # For simplicity now, let's just delete and return a specific structure or raise?
@@ -208,23 +197,33 @@ def add_reaction(
         type=type
     )
     db.add(new_reaction)
-    db.commit()
-    db.refresh(new_reaction)
+    db.flush()
 
-    # Create Notification for ShoutOut Author (if not self-reacting)
+    # Notify the ShoutOut Author (if not self-reacting); a burst of reactions shares one notification.
+    # Committed together with the reaction.
     if shoutout.sender_id != current_user.id:
-        notification = models.Notification(
+        notifications.coalesce(
+            db,
             user_id=shoutout.sender_id,
-            actor_id=current_user.id,
-            shoutout_id=shoutout.id,
+            actor=current_user,
             type='reaction',
-            message=f"{current_user.name} reacted with {type} to your shoutout",
+            action=f"reacted with {type} to your shoutout",
+            grouped_action="reacted to your shoutout",
+            shoutout_id=shoutout.id,
+            actor_count=_reactors(db, shoutout).count(),
         )
-        db.add(notification)
-        db.commit()
+    db.commit()
+    db.refresh(new_reaction)
 
     return new_reaction
 
+def _reactors(db: Session, shoutout: models.ShoutOut):
+    """People other than the author who currently react to the shoutout, latest first"""
+    return db.query(models.User).join(models.Reaction, models.Reaction.user_id == models.User.id).filter(
+        models.Reaction.shoutout_id == shoutout.id,
+        models.Reaction.user_id != shoutout.sender_id,
+    ).group_by(models.User.id).order_by(func.max(models.Reaction.id).desc())
+
 @router.put("/{shoutout_id}", response_model=schemas.ShoutOutOut)
 def edit_shoutout(
     shoutout_id: int,
@@ -255,6 +254,7 @@ def edit_shoutout(
 def create_comment(
     shoutout_id: int,
     comment: schemas.CommentCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -289,19 +289,18 @@ def create_comment(
         )
         db.add(notification)
     
-    # Notify shoutout RECIPIENTS (if not self)
-    # Get all recipients
-    for recipient_rel in shoutout.recipients:
-        recipient_id = recipient_rel.recipient_id
-        if recipient_id != current_user.id and recipient_id != shoutout.sender_id:
-             notification = models.Notification(
-                user_id=recipient_id,
-                actor_id=current_user.id,
-                shoutout_id=shoutout.id,
-                type='comment',
-                message=f"{current_user.name} commented on a shoutout you received",
-            )
-             db.add(notification)
+    # Notify shoutout RECIPIENTS (if not self) in one multi-row insert
+    notifications.fan_out(
+        db, background_tasks,
+        [
+            recipient_rel.recipient_id for recipient_rel in shoutout.recipients
+            if recipient_rel.recipient_id not in (current_user.id, shoutout.sender_id)
+        ],
+        actor_id=current_user.id,
+        shoutout_id=shoutout.id,
+        type='comment',
+        message=f"{current_user.name} commented on a shoutout you received",
+    )
 
     db.commit()
         
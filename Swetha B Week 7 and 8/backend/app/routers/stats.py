@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, cast, Integer
+import numpy as np
+import datetime
+from .. import models
+from ..database import get_db
+from ..deps import get_current_user
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+SECONDS_PER_DAY = 86400
+MAX_DAYS = 366
+
+# metric -> (timestamp column, column holding the acting user's id)
+METRICS = {
+    "shoutouts": (models.ShoutOut.created_at, models.ShoutOut.sender_id),
+    "reactions": (models.Reaction.created_at, models.Reaction.user_id),
+    "comments": (models.Comment.created_at, models.Comment.user_id),
+}
+
+BUCKET_DAYS = {"day": 1, "week": 7}
+
+
+def epoch_day(column, dialect_name: str):
+    """SQL expression turning a DateTime column into whole days since 1970-01-01."""
+    if dialect_name == "sqlite":
+        return cast(func.julianday(column) - 2440587.5, Integer)
+    return cast(func.floor(func.extract("epoch", column) / SECONDS_PER_DAY), Integer)
+
+
+def bin_daily_counts(days: np.ndarray, counts: np.ndarray, start_day: int, n_buckets: int, bucket_days: int) -> np.ndarray:
+    """
+    Folds per-day counts (keyed by epoch day) into `n_buckets` buckets of `bucket_days`
+    starting at `start_day`. Empty buckets are returned as zeros; anything outside the
+    window is dropped.
+    """
+    if days.size == 0:
+        return np.zeros(n_buckets, dtype=np.int64)
+
+    bucket_index = (days - start_day) // bucket_days
+    in_range = (bucket_index >= 0) & (bucket_index < n_buckets)
+    binned = np.bincount(bucket_index[in_range], weights=counts[in_range], minlength=n_buckets)
+    return binned.astype(np.int64)
+
+
+def fetch_daily_counts(db: Session, metric: str, start: datetime.datetime, end: datetime.datetime, dept: str | None = None):
+    """
+    Counts rows per epoch day for [start, end).
+
+    Only the timestamp column is touched (a range scan on its index) and the database
+    hands back one row per active day rather than one row per event, so a year of data
+    is at most 366 small tuples no matter how many rows are in the table.
+    """
+    ts_column, actor_column = METRICS[metric]
+    day = epoch_day(ts_column, db.get_bind().dialect.name).label("day")
+    stmt = select(day, func.count()).where(
+        ts_column >= start,
+        ts_column < end,
+    ).group_by(day)
+    if dept:
+        stmt = stmt.join(models.User, actor_column == models.User.id).where(models.User.department == dept)
+
+    rows = db.execute(stmt).all()
+    days = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    counts = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    return days, counts
+
+
+@router.get("/timeseries")
+def get_timeseries(
+    metric: str = "shoutouts", # shoutouts, reactions, comments
+    bucket: str = "day", # day, week
+    days: int = 30,
+    dept: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Invalid metric. Must be one of: {', '.join(METRICS)}")
+    if bucket not in BUCKET_DAYS:
+        raise HTTPException(status_code=400, detail=f"Invalid bucket. Must be one of: {', '.join(BUCKET_DAYS)}")
+    if days < 1 or days > MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_DAYS}")
+
+    bucket_days = BUCKET_DAYS[bucket]
+    n_buckets = -(-days // bucket_days)
+
+    # Window ends at the end of today (UTC) and is aligned to whole buckets
+    today = datetime.datetime.utcnow().date()
+    end_day = (today - datetime.date(1970, 1, 1)).days + 1
+    start_day = end_day - n_buckets * bucket_days
+    epoch = datetime.datetime(1970, 1, 1)
+    start = epoch + datetime.timedelta(days=start_day)
+    end = epoch + datetime.timedelta(days=end_day)
+
+    days_with_activity, daily_counts = fetch_daily_counts(db, metric, start, end, dept)
+    counts = bin_daily_counts(days_with_activity, daily_counts, start_day, n_buckets, bucket_days)
+
+    return {
+        "metric": metric,
+        "bucket": bucket,
+        "department": dept,
+        "total": int(counts.sum()),
+        "series": [
+            {
+                "date": (start + datetime.timedelta(days=i * bucket_days)).strftime("%Y-%m-%d"),
+                "count": int(count),
+            }
+            for i, count in enumerate(counts)
+        ],
+    }
@@ -1,8 +1,9 @@
 # backend/app/routers/users.py
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from .. import schemas, models
+from .. import schemas, models, blob_store
 from ..database import get_db
 from ..deps import get_current_user
 
@@ -69,32 +70,19 @@ async def upload_avatar(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    import shutil
-    import os
-    from uuid import uuid4
-    
-    # Ensure uploads exists
-    UPLOAD_DIR = "uploads"
-    if not os.path.exists(UPLOAD_DIR):
-        os.makedirs(UPLOAD_DIR)
-        
     # Valid extensions
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
     extension = file.filename.split(".")[-1].lower()
     if extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Invalid file type")
         
-    # Generate unique filename
-    filename = f"{uuid4()}.{extension}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    # Stored by content, so re-uploading the same picture reuses the file.
+    # Hashing and the storage upload block, so they run off the event loop.
+    url_path = await run_in_threadpool(blob_store.store, db, file.file, file.filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
     # Update user profile
     # URL path to be used by frontend
-    url_path = f"/uploads/{filename}"
-    
+    await blob_store.arelease(db, current_user.profile_image_url)
     current_user.profile_image_url = url_path
     db.commit()
     db.refresh(current_user)
@@ -153,9 +141,11 @@ def delete_me(db: Session = Depends(get_db), current_user: models.User = Depends
         # Delete reports on this shoutout
         db.query(models.Report).filter(models.Report.shoutout_id == s.id).delete()
         # Finally delete shoutout
+        blob_store.release(db, s.image_url)
         db.delete(s)
         
     # 6. Delete User
+    blob_store.release(db, current_user.profile_image_url)
     db.delete(current_user)
     db.commit()
     return None
@@ -1,7 +1,7 @@
 # backend/app/schemas.py
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from .models import UserRole
 
 class UserBase(BaseModel):
@@ -89,11 +89,17 @@ class CommentOut(BaseModel):
     class Config:
         from_attributes = True
 
+class ImageDerivativeOut(BaseModel):
+    width: int
+    format: str
+    url: str
+
 class ShoutOutOut(BaseModel):
     id: int
     sender: Optional[UserOut] = None
     message: str
     image_url: Optional[str] = None
+    image_derivatives: Optional[list[ImageDerivativeOut]] = None
     edit_count: int = 0
     is_edited: int = 0
     created_at: datetime
@@ -112,15 +118,26 @@ class NotificationOut(BaseModel):
     shoutout_id: Optional[int] = None
     type: str
     message: str
-    is_read: int
+    is_read: bool
+    actor_count: int = 1
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class UnreadCountOut(BaseModel):
+    unread: int
+
     class Config:
         from_attributes = True
 
+class NotificationIdsIn(BaseModel):
+    ids: list[int] = Field(..., max_length=1000)
+
+class BulkNotificationOut(BaseModel):
+    status: str = "success"
+    count: int
+
 class UserActivityOut(BaseModel):
     id: int
     user_id: int
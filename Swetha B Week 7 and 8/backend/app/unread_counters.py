@@ -0,0 +1,109 @@
+# backend/app/unread_counters.py
+"""
+Unread notification counts, kept per user in `notification_unread_counts`.
+
+GET /notifications/unread-count reads a single row by primary key instead of
+loading the whole notification list. The row is updated in the transaction
+that changes the notifications:
+
+- ORM inserts, is_read changes and deletes are counted after every flush
+  (listeners on SessionLocal, see `register`);
+- bulk `query.delete()` on notifications counts the unread rows it removes
+  before the statement runs;
+- code that bulk-inserts or bulk-updates notifications (notifications.notify)
+  calls `adjust` itself.
+
+`rebuild` recounts everything from the notifications table.
+"""
+from collections import Counter
+
+from sqlalchemy import delete, event, false, func, inspect, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Notification, NotificationUnreadCount
+
+_UPSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def adjust(session: Session, deltas):
+    """Adds deltas[user_id] to the users' counters in the session's transaction."""
+    rows = [{"user_id": user_id, "unread": delta} for user_id, delta in deltas.items() if user_id and delta]
+    if not rows:
+        return
+    connection = session.connection()
+    table = NotificationUnreadCount.__table__
+    upsert = _UPSERT.get(connection.dialect.name)
+    if upsert is None:
+        for row in rows:
+            updated = connection.execute(
+                table.update().where(table.c.user_id == row["user_id"]).values(unread=table.c.unread + row["unread"])
+            )
+            if updated.rowcount == 0:
+                connection.execute(table.insert(), [row])
+        return
+    statement = upsert(table)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"unread": table.c.unread + statement.excluded.unread},
+        ),
+        rows,
+    )
+
+
+def unread_count(db: Session, user_id: int) -> int:
+    counter = db.get(NotificationUnreadCount, user_id)
+    return max(counter.unread, 0) if counter else 0
+
+
+def rebuild(db: Session) -> int:
+    """Recounts every user's unread notifications; returns how many users have some."""
+    db.execute(delete(NotificationUnreadCount))
+    counts = select(Notification.user_id, func.count()).where(
+        Notification.user_id.is_not(None),
+        Notification.is_read == false(),
+    ).group_by(Notification.user_id)
+    return db.execute(insert(NotificationUnreadCount).from_select(["user_id", "unread"], counts)).rowcount
+
+
+def _after_flush(session: Session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = inspect(obj).attrs.is_read.history
+            if history.added and history.deleted and bool(history.added[0]) != bool(history.deleted[0]):
+                deltas[obj.user_id] += -1 if history.added[0] else 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] -= 1
+    adjust(session, deltas)
+
+
+def _before_bulk_delete(orm_execute_state):
+    if not orm_execute_state.is_delete:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Notification:
+        return
+    query = select(Notification.user_id, func.count()).where(Notification.is_read == false())
+    if orm_execute_state.statement.whereclause is not None:
+        query = query.where(orm_execute_state.statement.whereclause)
+    session = orm_execute_state.session
+    removed = session.execute(query.group_by(Notification.user_id)).all()
+    adjust(session, {user_id: -count for user_id, count in removed})
+
+
+def register(session_factory=SessionLocal):
+    """Attach the listeners to a sessionmaker or session (idempotent)."""
+    if not event.contains(session_factory, "after_flush", _after_flush):
+        event.listen(session_factory, "after_flush", _after_flush)
+    if not event.contains(session_factory, "do_orm_execute", _before_bulk_delete):
+        event.listen(session_factory, "do_orm_execute", _before_bulk_delete)
+
+
+register()
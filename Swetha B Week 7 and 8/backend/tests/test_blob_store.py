@@ -0,0 +1,34 @@
+import io
+import os
+from app import blob_store
+from app.models import Blob
+
+def test_identical_uploads_share_one_file(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    first = blob_store.store(db_session, io.BytesIO(b"same bytes"), "a.PNG")
+    second = blob_store.store(db_session, io.BytesIO(b"same bytes"), "b.png")
+    other = blob_store.store(db_session, io.BytesIO(b"other bytes"), "c.png")
+    db_session.commit()
+
+    assert first == second != other
+    assert first.startswith("/uploads/blobs/") and first.endswith(".png")
+    assert db_session.query(Blob).filter(Blob.path == first).one().ref_count == 2
+    assert os.listdir(blob_store.BLOB_DIR + "/tmp") == []
+
+def test_release_deletes_file_with_last_reference(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    url = blob_store.store(db_session, io.BytesIO(b"photo"), "p.jpg")
+    blob_store.store(db_session, io.BytesIO(b"photo"), "p.jpg")
+    db_session.commit()
+
+    blob_store.release(db_session, url)
+    db_session.commit()
+    assert os.path.exists(blob_store.local_path(url))
+
+    blob_store.release(db_session, url)
+    blob_store.release(db_session, "/uploads/legacy.jpg")  # not a blob: ignored
+    db_session.commit()
+    assert not os.path.exists(blob_store.local_path(url))
+    assert db_session.query(Blob).count() == 0
@@ -0,0 +1,55 @@
+from PIL import Image
+from app.models import User, ShoutOut, UserRole
+from app.image_derivatives import generate_derivatives, generate_for_shoutout
+
+def test_generate_derivatives_skips_widths_above_original(tmp_path):
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (800, 600), (200, 100, 50)).save(source)
+
+    derivatives = generate_derivatives(str(source))
+
+    assert [(d["width"], d["format"]) for d in derivatives] == [
+        (320, "jpg"), (320, "webp"), (640, "jpg"), (640, "webp"),
+    ]
+    with Image.open(tmp_path / "photo_w320.webp") as thumb:
+        assert thumb.size == (320, 240)
+
+def test_generate_derivatives_uses_the_rotated_size(tmp_path):
+    # Stored 1400x700 but EXIF-rotated to a 700 px wide portrait: 1280 would be an upscale
+    source = tmp_path / "portrait.jpg"
+    image = Image.new("RGB", (1400, 700), (200, 100, 50))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    image.save(source, exif=exif.tobytes())
+
+    derivatives = generate_derivatives(str(source))
+
+    assert sorted({d["width"] for d in derivatives}) == [320, 640]
+    with Image.open(tmp_path / "portrait_w640.jpg") as copy:
+        assert copy.size == (640, 1280)
+
+def test_generate_derivatives_ignores_non_images(tmp_path):
+    source = tmp_path / "notes.txt"
+    source.write_text("not an image")
+
+    assert generate_derivatives(str(source)) == []
+
+def test_generate_for_shoutout_stores_urls(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    user = User(name="a", email="a@example.com", password="password", department="Eng", role=UserRole.EMPLOYEE)
+    db_session.add(user)
+    db_session.commit()
+    shoutout = ShoutOut(sender_id=user.id, message="hi")
+    db_session.add(shoutout)
+    db_session.commit()
+
+    (tmp_path / "uploads").mkdir()
+    Image.new("RGBA", (400, 400), (0, 0, 0, 0)).save(tmp_path / "uploads" / "photo.png")
+
+    shoutout_id = shoutout.id
+    generate_for_shoutout(shoutout_id, "/uploads/photo.png", session_factory=lambda: db_session)
+
+    stored = db_session.get(ShoutOut, shoutout_id).image_derivatives
+    assert [d["width"] for d in stored] == [320, 320]
+    assert [d["url"] for d in stored] == ["/uploads/photo_w320.jpg", "/uploads/photo_w320.webp"]
+    assert (tmp_path / "uploads" / "photo_w320.webp").exists()
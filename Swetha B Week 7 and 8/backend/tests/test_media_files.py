@@ -0,0 +1,40 @@
+import hashlib
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.media_files import IMMUTABLE_CACHE_CONTROL, MediaFiles
+
+def _client(directory, **kwargs):
+    app = FastAPI()
+    app.mount("/uploads", MediaFiles(directory=directory, **kwargs), name="uploads")
+    return TestClient(app)
+
+def test_blobs_get_a_digest_etag_and_are_cached_for_a_year(tmp_path):
+    digest = hashlib.sha256(b"photo").hexdigest()
+    (tmp_path / "blobs" / digest[:2]).mkdir(parents=True)
+    (tmp_path / "blobs" / digest[:2] / f"{digest[2:]}.jpg").write_bytes(b"photo")
+    (tmp_path / "blobs" / digest[:2] / f"{digest[2:]}_w320.webp").write_bytes(b"small")
+    client = _client(tmp_path)
+
+    response = client.get(f"/uploads/blobs/{digest[:2]}/{digest[2:]}.jpg")
+    assert response.content == b"photo"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] == f'"{digest}"'
+    derivative = client.get(f"/uploads/blobs/{digest[:2]}/{digest[2:]}_w320.webp")
+    assert derivative.headers["etag"] == f'"{digest}_w320.webp"'
+
+    cached = client.get(f"/uploads/blobs/{digest[:2]}/{digest[2:]}.jpg", headers={"If-None-Match": f'"{digest}"'})
+    assert cached.status_code == 304
+    partial = client.get(f"/uploads/blobs/{digest[:2]}/{digest[2:]}.jpg", headers={"Range": "bytes=1-2"})
+    assert partial.status_code == 206 and partial.content == b"ho"
+
+def test_accel_mode_sends_headers_only(tmp_path):
+    (tmp_path / "legacy name.png").write_bytes(b"old upload")
+
+    nginx = _client(tmp_path, accel_mode="nginx", accel_prefix="/protected").get("/uploads/legacy name.png")
+    assert nginx.content == b""
+    assert nginx.headers["x-accel-redirect"] == "/protected/legacy%20name.png"
+    assert nginx.headers["content-type"] == "image/png"
+    assert nginx.headers["etag"] and nginx.headers["last-modified"]
+
+    sendfile = _client(tmp_path, accel_mode="sendfile").get("/uploads/legacy name.png")
+    assert sendfile.headers["x-sendfile"] == str(tmp_path / "legacy name.png")
@@ -0,0 +1,35 @@
+import os
+import time
+from app import media_gc
+from app.models import User, ShoutOut, UserRole
+
+def _write(path, age_hours):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * 10)
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+
+def test_mark_collects_images_avatars_and_derivatives(db_session):
+    user = User(name="a", email="a@example.com", password="password", department="Eng",
+                role=UserRole.EMPLOYEE, profile_image_url="/uploads/avatar.png")
+    db_session.add(user)
+    db_session.commit()
+    db_session.add(ShoutOut(sender_id=user.id, message="hi", image_url="/uploads/photo.jpg",
+                            image_derivatives=[{"width": 320, "format": "webp", "url": "/uploads/photo_w320.webp"}]))
+    db_session.commit()
+
+    assert media_gc.mark(db_session) == {"avatar.png", "photo.jpg", "photo_w320.webp"}
+
+def test_sweep_quarantines_only_old_orphans(tmp_path):
+    root = tmp_path / "uploads"
+    _write(root / "photo.jpg", age_hours=48)
+    _write(root / "orphan.jpg", age_hours=48)
+    _write(root / "blobs" / "ab" / "orphan.png", age_hours=48)
+    _write(root / "just_uploaded.jpg", age_hours=0)
+
+    stats = media_gc.sweep({"photo.jpg"}, root=str(root), mode="quarantine", rate=0, pause=0,
+                           quarantine_dir=str(tmp_path / "quarantine"))
+
+    assert stats["orphaned"] == 2 and stats["removed"] == 2 and stats["recent"] == 1
+    assert sorted(p.name for p in root.rglob("*") if p.is_file()) == ["just_uploaded.jpg", "photo.jpg"]
+    assert sorted(p.name for p in (tmp_path / "quarantine").rglob("*") if p.is_file()) == ["orphan.jpg", "orphan.png"]
@@ -0,0 +1,232 @@
+import asyncio
+import datetime
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import sessionmaker
+from app import notifications, notification_retention, unread_counters
+from app.routers import shoutouts
+from app.notification_hub import FakeRedis, NotificationHub, RedisBroker, event_stream
+from app.models import User, ShoutOut, ShoutOutRecipient, Notification, NotificationUnreadCount, UserRole
+
+def _users(db, count):
+    users = [User(name=f"u{i}", email=f"u{i}@example.com", password="password", department="Eng",
+                  role=UserRole.EMPLOYEE) for i in range(count)]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+def test_find_missing_users_uses_given_order(db_session):
+    ids = _users(db_session, 3)
+    assert notifications.find_missing_users(db_session, [999, ids[0], 998, 999]) == [999, 998]
+    assert notifications.find_missing_users(db_session, ids) == []
+
+def test_recipients_and_notifications_are_bulk_inserted(db_session):
+    ids = _users(db_session, 5)
+    shoutout = ShoutOut(sender_id=ids[0], message="team")
+    db_session.add(shoutout)
+    db_session.commit()
+
+    assert notifications.add_recipients(db_session, shoutout.id, ids[1:] + ids[1:2]) == 4
+    tasks = BackgroundTasks()
+    notifications.fan_out(db_session, tasks, ids[1:], actor_id=ids[0], shoutout_id=shoutout.id,
+                          type="shoutout", message="hi")
+    db_session.commit()
+
+    assert not tasks.tasks
+    assert sorted(r.recipient_id for r in db_session.query(ShoutOutRecipient)) == ids[1:]
+    rows = db_session.query(Notification).all()
+    assert sorted(n.user_id for n in rows) == ids[1:]
+    assert all(n.is_read == 0 and n.created_at is not None and n.actor_id == ids[0] for n in rows)
+
+def test_large_fan_out_is_deferred(db_session, monkeypatch):
+    monkeypatch.setattr(notifications, "BACKGROUND_THRESHOLD", 2)
+    tasks = BackgroundTasks()
+    notifications.fan_out(db_session, tasks, [1, 2, 3], actor_id=4, type="shoutout", message="hi")
+
+    assert db_session.query(Notification).count() == 0
+    assert len(tasks.tasks) == 1 and tasks.tasks[0].func is notifications.notify_in_background
+    assert tasks.tasks[0].args == ([1, 2, 3],)
+
+def test_committed_notifications_are_pushed(db_session, monkeypatch):
+    ids = _users(db_session, 3)
+    published = []
+    monkeypatch.setattr(notifications.notification_hub, "publish", lambda user_id, event: published.append((user_id, event)))
+    notifications.register(db_session)
+
+    notifications.notify(db_session, ids[1:], actor_id=ids[0], type="shoutout", message="hi")
+    db_session.add(Notification(user_id=ids[0], actor_id=ids[1], type="comment", message="c"))
+    db_session.flush()
+    assert published == []
+    db_session.commit()
+
+    assert [(user_id, event["type"]) for user_id, event in published] == [
+        (ids[1], "shoutout"), (ids[2], "shoutout"), (ids[0], "comment")]
+    assert [event["id"] for _, event in published] == [n.id for n in db_session.query(Notification).order_by(Notification.id)]
+
+    notifications.notify(db_session, ids[1:], actor_id=ids[0], type="shoutout", message="again")
+    db_session.rollback()
+    db_session.commit()
+    assert len(published) == 3
+    assert [e["id"] for e in notifications.replay(db_session, ids[1], published[0][1]["id"] - 1)] == [published[0][1]["id"]]
+    assert notifications.replay(db_session, ids[1], None) == []
+
+def test_replay_resends_notifications_that_committed_late(db_session):
+    ids = _users(db_session, 2)
+    now = datetime.datetime.utcnow()
+    old, late, seen = (Notification(user_id=ids[0], actor_id=ids[1], type="comment", message=m, created_at=at)
+                       for m, at in (("old", now - datetime.timedelta(hours=1)), ("late", now), ("seen", now)))
+    db_session.add_all([old, late, seen])
+    db_session.commit()
+
+    # The client saw `seen` before `late` (lower id) had committed
+    assert [e["id"] for e in notifications.replay(db_session, ids[0], seen.id)] == [late.id]
+    assert [e["id"] for e in notifications.replay(db_session, ids[0], old.id)] == [late.id, seen.id]
+
+def test_redis_broker_reaches_streams_of_other_workers():
+    async def scenario():
+        server = FakeRedis()
+        sender, receiver = NotificationHub(RedisBroker(server)), NotificationHub(RedisBroker(server))
+        sender.start()
+        receiver.start()
+        subscription = receiver.subscribe(7)
+        stream = event_stream(subscription, [{"id": 1}], hub=receiver)
+        try:
+            assert await stream.__anext__() == "retry: 3000\n\n"
+            assert (await stream.__anext__()).startswith("id: 1\n")
+            sender.publish(8, {"id": 2})
+            sender.publish(7, {"id": 1})
+            sender.publish(7, {"id": 3})
+            # id 1 was already replayed, id 2 belongs to someone else
+            assert (await asyncio.wait_for(stream.__anext__(), 5)).startswith("id: 3\n")
+            receiver.shutdown()
+            with pytest.raises(StopAsyncIteration):
+                await asyncio.wait_for(stream.__anext__(), 5)
+            assert receiver.connected(7) == 0
+        finally:
+            sender.shutdown()
+            receiver.shutdown()
+
+    asyncio.run(scenario())
+
+def test_unread_counters_follow_inserts_reads_and_deletes(db_session):
+    unread_counters.register(db_session)
+    ids = _users(db_session, 3)
+    notifications.notify(db_session, ids[1:], actor_id=ids[0], type="shoutout", message="hi", shoutout_id=7)
+    first = Notification(user_id=ids[1], actor_id=ids[0], type="comment", message="c")
+    db_session.add(first)
+    db_session.commit()
+    assert [unread_counters.unread_count(db_session, i) for i in ids] == [0, 2, 1]
+
+    first.is_read = True
+    db_session.commit()
+    first.is_read = True
+    db_session.commit()
+    assert unread_counters.unread_count(db_session, ids[1]) == 1
+
+    db_session.delete(first)
+    db_session.query(Notification).filter(Notification.shoutout_id == 7, Notification.user_id == ids[2]).delete()
+    db_session.commit()
+    assert [unread_counters.unread_count(db_session, i) for i in ids] == [0, 1, 0]
+
+    db_session.query(NotificationUnreadCount).delete()
+    assert unread_counters.rebuild(db_session) == 1
+    assert unread_counters.unread_count(db_session, ids[1]) == 1
+
+def test_reaction_bursts_are_coalesced(db_session, monkeypatch):
+    unread_counters.register(db_session)
+    ids = _users(db_session, 4)
+    author, *reactors = [db_session.get(User, i) for i in ids]
+    shoutout = ShoutOut(sender_id=author.id, message="team")
+    db_session.add(shoutout)
+    db_session.commit()
+
+    def react(user):
+        notifications.coalesce(db_session, author.id, user, "reaction", "reacted with like to your shoutout",
+                               shoutout_id=shoutout.id, grouped_action="reacted to your shoutout")
+        db_session.commit()
+
+    for user in reactors + reactors[2:]:
+        react(user)
+    rows = db_session.query(Notification).all()
+    assert len(rows) == 1
+    assert rows[0].actor_count == 3 and rows[0].actor_id == reactors[2].id
+    assert rows[0].message == "u3 and 2 others reacted to your shoutout"
+    assert unread_counters.unread_count(db_session, author.id) == 1
+
+    # Read notifications and ones outside the window are left alone
+    rows[0].is_read = True
+    db_session.commit()
+    react(reactors[0])
+    monkeypatch.setattr(notifications, "COALESCE_WINDOW", notifications.COALESCE_WINDOW * 0)
+    react(reactors[1])
+    assert db_session.query(Notification).count() == 3
+    assert unread_counters.unread_count(db_session, author.id) == 2
+
+def _reacting(db):
+    """Users u0..u2 and a shoutout by u0; the returned react(user) toggles user's like."""
+    unread_counters.register(db)
+    users = [db.get(User, i) for i in _users(db, 3)]
+    shoutout = ShoutOut(sender_id=users[0].id, message="team")
+    db.add(shoutout)
+    db.commit()
+
+    def react(user):
+        shoutouts.add_reaction(shoutout.id, type="like", db=db, current_user=user)
+        return db.query(Notification).one_or_none()
+    return users, react
+
+def test_coalesced_reactions_count_people_not_events(db_session):
+    (author, bob, carol), react = _reacting(db_session)
+
+    react(bob)
+    assert react(carol).actor_count == 2
+    # Bob takes his like back: Carol is the one left, then Bob likes it again
+    notification = react(bob)
+    assert notification.actor_count == 1 and notification.message == "u2 reacted to your shoutout"
+    notification = react(bob)
+    assert notification.actor_count == 2 and notification.message == "u1 and 1 other reacted to your shoutout"
+
+def test_withdrawn_reaction_removes_its_notification(db_session):
+    (author, bob, _), react = _reacting(db_session)
+
+    assert react(bob) is not None
+    assert unread_counters.unread_count(db_session, author.id) == 1
+    assert react(bob) is None
+    assert unread_counters.unread_count(db_session, author.id) == 0
+
+def test_bulk_mark_read_and_delete(db_session):
+    unread_counters.register(db_session)
+    ids = _users(db_session, 3)
+    notifications.notify(db_session, ids[1:], actor_id=ids[0], type="shoutout", message="a")
+    notifications.notify(db_session, ids[1:], actor_id=ids[0], type="shoutout", message="b")
+    db_session.commit()
+    mine = [n.id for n in db_session.query(Notification).filter(Notification.user_id == ids[1])]
+    theirs = [n.id for n in db_session.query(Notification).filter(Notification.user_id == ids[2])]
+
+    assert notifications.mark_read(db_session, ids[1], [mine[0], theirs[0]]) == 1
+    assert notifications.mark_read(db_session, ids[1]) == 1
+    assert notifications.mark_read(db_session, ids[1]) == 0
+    db_session.commit()
+    assert [unread_counters.unread_count(db_session, i) for i in ids[1:]] == [0, 2]
+
+    later = datetime.datetime.utcnow() + datetime.timedelta(minutes=1)
+    assert notifications.delete_read_before(db_session, ids[2], later) == 0
+    assert notifications.delete_read_before(db_session, ids[1], later) == 2
+    db_session.commit()
+    assert sorted(n.id for n in db_session.query(Notification)) == theirs
+
+def test_retention_prunes_expired_notifications_in_batches(db_session):
+    sessions = sessionmaker(bind=db_session.get_bind())
+    unread_counters.register(sessions)
+    ids = _users(db_session, 2)
+    notifications.notify(db_session, ids, actor_id=ids[0], type="shoutout", message="old")
+    db_session.commit()
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=100)
+    db_session.query(Notification).update({Notification.created_at: old})
+    notifications.notify(db_session, ids[1:], actor_id=ids[0], type="shoutout", message="new")
+    db_session.commit()
+
+    assert notification_retention.prune_expired(90, batch_size=1, pause=0, session_factory=sessions) == 2
+    db_session.expire_all()
+    assert [n.message for n in db_session.query(Notification)] == ["new"]
+    assert [unread_counters.unread_count(db_session, i) for i in ids] == [0, 1]
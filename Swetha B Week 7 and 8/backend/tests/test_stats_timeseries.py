@@ -0,0 +1,74 @@
+import datetime
+import numpy as np
+from app.models import User, ShoutOut, Comment, UserRole
+from app.routers.stats import bin_daily_counts, fetch_daily_counts, get_timeseries
+
+def _make_user(db_session, email, department):
+    user = User(name=email, email=email, password="password", department=department, role=UserRole.EMPLOYEE)
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+def test_bin_daily_counts_fills_empty_buckets():
+    start_day = 19000
+    days = np.array([start_day, start_day + 2], dtype=np.int64)
+    counts = np.array([2, 1], dtype=np.int64)
+
+    binned = bin_daily_counts(days, counts, start_day, 4, 1)
+
+    assert binned.tolist() == [2, 0, 1, 0]
+
+def test_bin_daily_counts_weekly_drops_out_of_range():
+    start_day = 19000
+    days = np.array([start_day - 1, start_day, start_day + 6, start_day + 7, start_day + 14], dtype=np.int64)
+    counts = np.array([5, 1, 1, 3, 4], dtype=np.int64)
+
+    binned = bin_daily_counts(days, counts, start_day, 2, 7)
+
+    assert binned.tolist() == [2, 3]
+
+def test_bin_daily_counts_empty():
+    empty = np.array([], dtype=np.int64)
+
+    assert bin_daily_counts(empty, empty, 19000, 3, 1).tolist() == [0, 0, 0]
+
+def test_fetch_daily_counts_filters_range_and_department(db_session):
+    eng = _make_user(db_session, "eng@example.com", "Engineering")
+    sales = _make_user(db_session, "sales@example.com", "Sales")
+    base = datetime.datetime(2024, 3, 10, 12, 0, 0)
+
+    db_session.add_all([
+        ShoutOut(sender_id=eng.id, message="in range", created_at=base),
+        ShoutOut(sender_id=eng.id, message="same day", created_at=base + datetime.timedelta(hours=11)),
+        ShoutOut(sender_id=sales.id, message="other dept", created_at=base + datetime.timedelta(days=1)),
+        ShoutOut(sender_id=eng.id, message="too old", created_at=base - datetime.timedelta(days=30)),
+    ])
+    db_session.commit()
+
+    start = datetime.datetime(2024, 3, 1)
+    end = datetime.datetime(2024, 3, 20)
+    base_day = (base.date() - datetime.date(1970, 1, 1)).days
+
+    days, counts = fetch_daily_counts(db_session, "shoutouts", start, end)
+    assert dict(zip(days.tolist(), counts.tolist())) == {base_day: 2, base_day + 1: 1}
+
+    days, counts = fetch_daily_counts(db_session, "shoutouts", start, end, dept="Engineering")
+    assert dict(zip(days.tolist(), counts.tolist())) == {base_day: 2}
+
+def test_get_timeseries_returns_zero_filled_daily_series(db_session):
+    user = _make_user(db_session, "commenter@example.com", "Engineering")
+    now = datetime.datetime.utcnow()
+    db_session.add_all([
+        Comment(user_id=user.id, content="today", created_at=now),
+        Comment(user_id=user.id, content="two days ago", created_at=now - datetime.timedelta(days=2)),
+    ])
+    db_session.commit()
+
+    result = get_timeseries(metric="comments", bucket="day", days=7, dept=None, db=db_session, current_user=user)
+
+    counts = [point["count"] for point in result["series"]]
+    assert len(counts) == 7
+    assert counts[-1] == 1
+    assert counts[-3] == 1
+    assert result["total"] == 2
+    assert result["series"][-1]["date"] == now.strftime("%Y-%m-%d")
@@ -53,20 +53,56 @@ export default function Navbar({ isFixed = true }) {
       if (res.ok) {
         const data = await res.json();
         setNotifications(data);
-        setUnreadCount(data.filter(n => !n.is_read).length);
+        return data;
       }
     } catch (err) {
       console.error("Error fetching notifications", err);
     }
   };
 
-  useEffect(() => {
-    if (token) {
-      fetchNotifications();
-      // Poll for notifications every 30 seconds
-      const interval = setInterval(fetchNotifications, 30000);
-      return () => clearInterval(interval);
+  // Read from the server's counter rather than counted from the whole list
+  const fetchUnreadCount = async () => {
+    try {
+      const res = await fetch(`${API_BASE_URL}/notifications/unread-count`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (res.ok) {
+        const data = await res.json();
+        setUnreadCount(data.unread);
+      }
+    } catch (err) {
+      console.error("Error fetching unread count", err);
     }
+  };
+
+  useEffect(() => {
+    if (!token) return;
+    let source = null;
+    let cancelled = false;
+
+    // New notifications are pushed over Server-Sent Events instead of polling. The stream
+    // replays whatever is newer than the list we loaded, and again after a reconnect.
+    fetchUnreadCount();
+    fetchNotifications().then((data) => {
+      if (cancelled || typeof EventSource === 'undefined') return;
+      const params = new URLSearchParams({ access_token: token });
+      if (data) params.set('last_event_id', Math.max(0, ...data.map(n => n.id)));
+      source = new EventSource(`${API_BASE_URL}/notifications/stream?${params}`);
+      source.addEventListener('notification', (event) => {
+        const notification = JSON.parse(event.data);
+        setNotifications(prev => {
+          // Replays overlap what we have already
+          if (prev.some(n => n.id === notification.id)) return prev;
+          return [notification, ...prev];
+        });
+        fetchUnreadCount();
+      });
+    });
+
+    return () => {
+      cancelled = true;
+      if (source) source.close();
+    };
   }, [token]);
 
   const markAsRead = async (id) => {
@@ -75,9 +111,8 @@ export default function Navbar({ isFixed = true }) {
         method: 'PUT',
         headers: { 'Authorization': `Bearer ${token}` }
       });
-      const updated = notifications.map(n => n.id === id ? { ...n, is_read: 1 } : n);
-      setNotifications(updated);
-      setUnreadCount(updated.filter(n => !n.is_read).length);
+      if (notifications.some(n => n.id === id && !n.is_read)) setUnreadCount(count => Math.max(0, count - 1));
+      setNotifications(notifications.map(n => n.id === id ? { ...n, is_read: 1 } : n));
     } catch (err) {
       console.error("Error marking read", err);
     }
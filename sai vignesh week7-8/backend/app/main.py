@@ -9,6 +9,7 @@ from . import models, schemas
 from .database import engine, get_db
 from .routers import auth, users, shoutouts
 from .security import get_current_user
+from .password_hashing import password_hasher
 
 models.Base.metadata.create_all(bind=engine)
 app = FastAPI(title="BragBoard API")
@@ -45,6 +46,14 @@ async def create_shoutout(
     db.commit()
     return {"message": "Success"}
 
+@app.on_event("startup")
+def start_password_hashing():
+    password_hasher.warm_up()
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    password_hasher.shutdown()
+
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(shoutouts.router)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import security
+
+# Password hashing (pbkdf2_sha256) is 100+ ms of pure CPU per call.
+# In FastAPI's threadpool it holds the GIL for that long, so a burst of
+# logins slows down every other endpoint. The auth routes await it from a
+# small pool of worker processes instead. At most MAX_PENDING hashes may be
+# queued or running; beyond that PasswordHashingOverloaded is raised and the
+# routes answer 503 with Retry-After.
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class PasswordHashingOverloaded(Exception):
+    """Raised when too many hashes are already waiting."""
+
+
+def _warm_up_worker():
+    # Unpickling this imports this module, and with it passlib
+    return os.getpid()
+
+
+class PasswordHasher:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the API process has threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset_executor(self, broken):
+        # A crashed worker breaks the whole pool; the next call gets a fresh one
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingOverloaded("Too many sign-ins at once, please try again shortly")
+        executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(security.hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(security.verify_password, plain_password, hashed_password)
+
+    def warm_up(self):
+        # Starts the workers now instead of on the first login
+        executor = self._get_executor()
+        return [executor.submit(_warm_up_worker) for _ in range(self.workers)]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
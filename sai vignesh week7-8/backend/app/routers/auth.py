@@ -4,20 +4,38 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from .. import schemas, models
 from ..database import get_db
-from ..security import hash_password, verify_password, create_access_token
+from ..security import create_access_token
+from ..password_hashing import password_hasher, PasswordHashingOverloaded
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Hashing runs in a process pool (see password_hashing.py); these routes are
+# async so they can wait for it without holding a threadpool slot. They close
+# the session before awaiting, so the DB connection goes back to the pool
+# instead of being held for the whole hash (loaded attributes stay).
+async def _hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+async def _verify(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
 @router.post("/register", response_model=schemas.UserOut, status_code=201)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     existing = db.query(models.User).filter(models.User.email == user_in.email).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
+    db.close()
 
     user = models.User(
         name=user_in.name,
         email=user_in.email,
-        password=hash_password(user_in.password),
+        password=await _hash(user_in.password),
         department=user_in.department,
         role=user_in.role,
     )
@@ -35,9 +53,10 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     return user
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.email == user_in.email).first()
-    if not user or not verify_password(user_in.password, user.password):
+    db.close()
+    if not user or not await _verify(user_in.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -52,7 +71,7 @@ def login(user_in: schemas.UserLogin, db: Session = Depends(get_db)):
     )
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
@@ -61,7 +80,8 @@ def login_for_access_token(
     Accepts form data with 'username' and 'password' fields. username is the email.
     """
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+    db.close()
+    if not user or not await _verify(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1,3 +1,6 @@
+import os
+import statistics
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -12,12 +15,52 @@ SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 43200  # 30 days
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor: each extra round doubles the work. Hashes made with a lower cost are
+# upgraded the next time their user logs in (see verify_and_update_password); ones with a
+# higher cost are left alone. PASSWORD_HASH_TARGET_MS picks the cost at startup instead.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+
+def build_context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto",
+                        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+pwd_context = build_context(BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+def set_bcrypt_rounds(rounds: int):
+    global BCRYPT_ROUNDS, pwd_context
+    BCRYPT_ROUNDS = rounds
+    pwd_context = build_context(rounds)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """Returns (valid, new_hash); new_hash is None unless the stored hash should be replaced"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def measure_verify_seconds(rounds: int, samples: int = 3) -> float:
+    """Median time of one verification at the given cost on this machine"""
+    context = build_context(rounds)
+    hashed = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """Highest cost whose verification stays within target_ms here (never below MIN_BCRYPT_ROUNDS)"""
+    rounds = MIN_BCRYPT_ROUNDS
+    expected_ms = measure_verify_seconds(rounds) * 1000
+    while rounds < MAX_BCRYPT_ROUNDS and expected_ms * 2 <= target_ms:
+        rounds += 1
+        expected_ms *= 2
+    return rounds
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
@@ -0,0 +1,52 @@
+# benchmark_charts.py - cold vs cached leaderboard chart renders.
+# Usage: python benchmark_charts.py [iterations] [threads]
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from charts import ChartCache, leaderboard_chart_png
+
+def sample_series(seed: int):
+    users = [f"user_{seed}_{i}" for i in range(10)]
+    scores = [(seed * 37 + i * 11) % 500 for i in range(10)]
+    return users, scores
+
+def time_renders(iterations: int, cache: ChartCache, distinct: bool):
+    if not distinct:
+        leaderboard_chart_png(*sample_series(0), cache=cache)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        users, scores = sample_series(i if distinct else 0)
+        leaderboard_chart_png(users, scores, cache=cache)
+    return (time.perf_counter() - start) / iterations
+
+def concurrent_renders(iterations: int, threads: int):
+    """Render from many threads at once and check every image matches a serial render"""
+    cache = ChartCache(max_entries=0)  # force a real render every call
+    users, scores = sample_series(1)
+    expected = leaderboard_chart_png(users, scores, cache=cache)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: leaderboard_chart_png(users, scores, cache=cache), range(iterations)))
+    elapsed = time.perf_counter() - start
+
+    mismatches = sum(1 for png in results if png != expected)
+    return elapsed / iterations, mismatches
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    # Warm up matplotlib's font cache so it doesn't count against the first render
+    leaderboard_chart_png(*sample_series(-1), cache=ChartCache())
+
+    cold = time_renders(iterations, ChartCache(max_entries=iterations), distinct=True)
+    cached = time_renders(iterations, ChartCache(), distinct=False)
+    concurrent, mismatches = concurrent_renders(iterations, threads)
+
+    print(f"iterations: {iterations}")
+    print(f"cold render:       {cold * 1000:8.2f} ms/chart")
+    print(f"cached render:     {cached * 1000:8.3f} ms/chart  ({cold / cached:,.0f}x faster)")
+    print(f"{threads} threads, cold: {concurrent * 1000:8.2f} ms/chart, {mismatches} mismatched images")
@@ -0,0 +1,23 @@
+# calibrate_password_hashing.py - pick a bcrypt cost for this machine.
+# Usage: python calibrate_password_hashing.py [target_ms]   (default 250)
+# Prints how long one login's password check takes at each cost, then the BCRYPT_ROUNDS
+# setting that stays within the target. Run it on the deployment hardware; alternatively set
+# PASSWORD_HASH_TARGET_MS and the API calibrates itself at startup.
+import sys
+
+import auth
+
+def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    print("cost | ms per verify")
+    for rounds in range(auth.MIN_BCRYPT_ROUNDS, auth.MAX_BCRYPT_ROUNDS + 1):
+        elapsed_ms = auth.measure_verify_seconds(rounds, samples=1) * 1000
+        print(f"{rounds:>4} | {elapsed_ms:>13.1f}")
+        if elapsed_ms > target_ms * 2:
+            break
+
+    rounds = auth.calibrate_bcrypt_rounds(target_ms)
+    print(f"\nBCRYPT_ROUNDS={rounds}  (current: {auth.BCRYPT_ROUNDS})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# charts.py - chart images for the PDF reports.
+# Uses matplotlib's object-oriented Figure API on an Agg canvas instead of the global
+# pyplot state machine, so it can be called from several threads or worker processes.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+CHART_CACHE_SIZE = 64
+
+PODIUM_COLORS = ['gold', 'silver', '#CD7F32']
+DEFAULT_BAR_COLOR = 'skyblue'
+
+class ChartCache:
+    """Small thread-safe LRU of rendered PNG bytes"""
+    def __init__(self, max_entries: int = CHART_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+            return png
+
+    def put(self, key: str, png: bytes):
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+chart_cache = ChartCache()
+
+def chart_key(kind: str, **spec) -> str:
+    """Hash of everything that affects the rendered image"""
+    payload = json.dumps({"kind": kind, **spec}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _render_leaderboard_chart(labels, values, title, xlabel, figsize, dpi) -> bytes:
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+
+    colors = (PODIUM_COLORS + [DEFAULT_BAR_COLOR] * len(labels))[:len(labels)]
+    ax.barh(labels, values, color=colors)
+    ax.set_xlabel(xlabel)
+    ax.set_title(title)
+    ax.invert_yaxis()
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+def leaderboard_chart_png(labels, values, title='Top 10 Contributors', xlabel='Points',
+                          figsize=(8, 4), dpi=100, cache: ChartCache = chart_cache) -> bytes:
+    """Horizontal bar chart as PNG bytes, served from the cache when the series is unchanged"""
+    labels = [str(label) for label in labels]
+    values = list(values)
+    key = chart_key("leaderboard", labels=labels, values=values, title=title,
+                    xlabel=xlabel, figsize=list(figsize), dpi=dpi)
+
+    png = cache.get(key)
+    if png is None:
+        png = _render_leaderboard_chart(labels, values, title, xlabel, figsize, dpi)
+        cache.put(key, png)
+    return png
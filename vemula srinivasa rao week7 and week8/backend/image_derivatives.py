@@ -0,0 +1,123 @@
+# image_derivatives.py - feed-sized copies of uploaded images.
+# /api/upload-image stores the original as <name>; a background task then stores
+# <name>_w<width>.webp and .jpg for each width below the original's, next to it in the same
+# storage backend. Shoutouts only store image_url, so the copies are found again by name when
+# a shoutout is serialized. The widths stored for each image are remembered in memory (set by the
+# task, or looked up once, for the KNOWN_WIDTHS_SIZE most recently used images), so rendering
+# the feed doesn't stat or HEAD every derivative.
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import storage
+
+WIDTHS = (320, 640, 1280)
+FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+EXIF_ORIENTATION = 0x0112
+
+def derivative_name(filename: str, width: int, extension: str) -> str:
+    return f"{Path(filename).stem}_w{width}.{extension}"
+
+def _flatten(image):
+    """JPEG has no alpha channel, so transparent pixels become white"""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+def generate_derivatives(source: Path, widths=WIDTHS):
+    """Write the resized copies of one image; returns the widths written (never upscales)"""
+    try:
+        image = Image.open(source)
+    except (UnidentifiedImageError, OSError):
+        return []
+
+    with image:
+        if getattr(image, "is_animated", False):
+            return []  # resizing a GIF frame would drop the animation
+
+        # Orientations 5-8 are stored rotated by 90 degrees; compare against the displayed width
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+        widths = sorted((w for w in widths if w < (image.height if rotated else image.width)), reverse=True)
+        if not widths:
+            return []
+
+        # draft() sees the stored size, before exif_transpose turns it
+        image.draft("RGB", (1, widths[0]) if rotated else (widths[0], 1))
+        current = _flatten(ImageOps.exif_transpose(image))
+        for width in widths:
+            # Resize from the previous (larger) copy instead of the original
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.LANCZOS)
+            for extension, pil_format, options in FORMATS:
+                target = source.with_name(derivative_name(source.name, width, extension))
+                tmp_path = target.with_name(target.name + ".tmp")
+                current.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, target)
+    return sorted(widths)
+
+def generate_derivatives_task(image_url: str):
+    """BackgroundTasks entry point for /api/upload-image"""
+    backend = storage.backend_for(image_url)
+    if backend is None:
+        return
+    try:
+        with backend.local_copy(image_url) as source:
+            source = Path(source)
+            widths = generate_derivatives(source)
+            for width in widths:
+                for extension, _, _ in FORMATS:
+                    name = derivative_name(source.name, width, extension)
+                    backend.save_file(str(source.with_name(name)), name)
+        _remember(image_url, widths)
+    except Exception as e:
+        print(f"Error generating derivatives for {image_url}: {e}")
+
+# image_url -> (widths stored, monotonic time looked up)
+KNOWN_WIDTHS_SIZE = 10000
+_known_widths: "OrderedDict[str, Any]" = OrderedDict()  # least recently used first
+_widths_lock = threading.Lock()
+MISSING_RECHECK_SECONDS = 60
+
+def _remember(image_url: str, widths):
+    with _widths_lock:
+        _known_widths[image_url] = (tuple(widths), time.monotonic())
+        _known_widths.move_to_end(image_url)
+        while len(_known_widths) > KNOWN_WIDTHS_SIZE:
+            _known_widths.popitem(last=False)
+
+def _stored_widths(backend, image_url: str, key: str):
+    """Widths stored for an image, without a stat or HEAD per derivative on every feed request"""
+    with _widths_lock:
+        cached = _known_widths.get(image_url)
+        if cached:
+            _known_widths.move_to_end(image_url)
+    # Derivatives never change once written; an empty answer may just mean the task hasn't finished
+    if cached and (cached[0] or time.monotonic() - cached[1] < MISSING_RECHECK_SECONDS):
+        return cached[0]
+    # The .jpg of a width is stored after its .webp, so it stands for both
+    widths = [w for w in WIDTHS if backend.exists(backend.url_for(derivative_name(key, w, FORMATS[-1][0])))]
+    _remember(image_url, widths)
+    return tuple(widths)
+
+def list_derivatives(image_url: Optional[str]) -> List[Dict[str, Any]]:
+    """Derivatives that exist for a stored image_url, smallest first"""
+    backend = storage.backend_for(image_url)
+    if backend is None:
+        return []
+    key = backend.key_for_url(image_url)
+    return [
+        {"width": width, "format": extension, "url": backend.url_for(derivative_name(key, width, extension))}
+        for width in _stored_widths(backend, image_url, key)
+        for extension, _, _ in FORMATS
+    ]
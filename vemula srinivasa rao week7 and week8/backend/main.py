@@ -1,37 +1,34 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, BackgroundTasks, Request
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import json
 import csv
-from io import StringIO, BytesIO
-from fastapi.responses import Response, JSONResponse, FileResponse
+import zlib
+from io import StringIO
+from fastapi.responses import Response, JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from pathlib import Path
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')
 import base64
-from io import BytesIO
 import asyncio
 
 # Import your modules
 from database import get_db, engine, SessionLocal
 from models import Base, User, Department, Shoutout, ShoutoutRecipient, Reaction, Comment, Report, ReactionType
 import auth
+from reports import calculate_leaderboard, REPORT_KINDS
+from report_jobs import report_jobs
+from image_derivatives import generate_derivatives_task, list_derivatives
+from media_files import MediaFiles, save_upload
+from storage import close_storage
 from schemas import (
     UserCreate, UserResponse, UserLogin, ShoutoutCreate, 
     ShoutoutResponse, ReactionCreate, CommentCreate, ReportCreate,
-    LeaderboardEntry, AdminStats, UserStatsResponse, ExportResponse, UserRoleUpdate
+    LeaderboardEntry, AdminStats, UserStatsResponse, ExportResponse, UserRoleUpdate,
+    ReportJobCreate
 )
 
 app = FastAPI(title="BragBoard API")
@@ -76,55 +73,6 @@ def create_department(
     
     return {"id": new_department.id, "name": new_department.name}
 
-# ========== UTILITY FUNCTIONS ==========
-
-def calculate_leaderboard(db: Session):
-    users = db.query(User).all()
-    leaderboard = []
-    
-    for user in users:
-        # Shoutouts received (as recipient)
-        shoutouts_received = db.query(ShoutoutRecipient).filter(
-            ShoutoutRecipient.user_id == user.id
-        ).count()
-        
-        # Reactions received (on user's shoutouts)
-        reactions_received = db.query(Reaction).join(Shoutout).filter(
-            Shoutout.sender_id == user.id
-        ).count()
-        
-        # Shoutouts sent
-        shoutouts_sent = db.query(Shoutout).filter(
-            Shoutout.sender_id == user.id
-        ).count()
-        
-        # Comments made
-        comments_count = db.query(Comment).filter(
-            Comment.user_id == user.id
-        ).count()
-        
-        # Calculate points: 10 for shoutouts received, 5 for reactions, 2 for shoutouts sent, 1 for comments
-        points = (shoutouts_received * 10) + (reactions_received * 5) + (shoutouts_sent * 2) + comments_count
-        
-        department_name = None
-        if user.department:
-            department_name = user.department.name
-        
-        leaderboard.append({
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "department_name": department_name,
-            "shoutouts_sent": shoutouts_sent,
-            "shoutouts_received": shoutouts_received,
-            "reactions_received": reactions_received,
-            "comments_count": comments_count,
-            "score": points
-        })
-    
-    leaderboard.sort(key=lambda x: x["score"], reverse=True)
-    return leaderboard
-
 # ========== INITIAL DATA SETUP ==========
 
 def init_data():
@@ -302,6 +250,14 @@ init_data()
 
 # ========== AUTH ENDPOINTS ==========
 
+@app.on_event("startup")
+def calibrate_password_hashing():
+    # Tunes the bcrypt cost to this machine; weaker stored hashes are upgraded at login
+    target_ms = float(os.getenv("PASSWORD_HASH_TARGET_MS", "0"))
+    if target_ms:
+        auth.set_bcrypt_rounds(auth.calibrate_bcrypt_rounds(target_ms))
+        print(f"Password hashing: bcrypt cost {auth.BCRYPT_ROUNDS} for a {target_ms:.0f} ms target")
+
 @app.post("/api/register", response_model=UserResponse)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = db.query(User).filter(User.email == user.email).first()
@@ -325,9 +281,14 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 @app.post("/api/login")
 def login(user_data: UserLogin, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not auth.verify_password(user_data.password, user.hashed_password):
+    valid, new_hash = auth.verify_and_update_password(user_data.password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
+    # The stored hash predates the current bcrypt cost: replace it while we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+    
     # Update last login
     user.last_login = datetime.now()
     db.commit()
@@ -431,6 +392,7 @@ def create_shoutout(
         "sender_name": sender.username,
         "sender_email": sender.email,
         "image_url": new_shoutout.image_url,
+        "image_derivatives": list_derivatives(new_shoutout.image_url),
         "created_at": new_shoutout.created_at,
         "recipients": recipients_data,
         "reaction_counts": {"like": 0, "clap": 0, "star": 0},
@@ -487,6 +449,7 @@ def get_shoutouts(db: Session = Depends(get_db), current_user: User = Depends(au
             "sender_name": sender.username if sender else "Unknown",
             "sender_email": sender.email if sender else None,
             "image_url": shoutout.image_url,
+            "image_derivatives": list_derivatives(shoutout.image_url),
             "created_at": shoutout.created_at,
             "recipients": recipient_data,
             "reaction_counts": reaction_counts,
@@ -546,6 +509,7 @@ def get_shoutout(shoutout_id: int, db: Session = Depends(get_db), current_user:
         "sender_name": sender.username if sender else "Unknown",
         "sender_email": sender.email if sender else None,
         "image_url": shoutout.image_url,
+        "image_derivatives": list_derivatives(shoutout.image_url),
         "created_at": shoutout.created_at,
         "recipients": recipient_data,
         "reaction_counts": reaction_counts,
@@ -953,103 +917,169 @@ def get_admin_stats(
 
 # ========== EXPORT ENDPOINTS ==========
 
+EXPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def iter_csv_chunks(header, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write rows through one reusable buffer and yield it every ~chunk_size characters"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def csv_export_response(chunks, filename, request: Request, envelope: bool, compress: bool):
+    """
+    Send an export either as a chunked text/csv download (gzipped when the client accepts it)
+    or, with envelope=true, in the old {"filename", "content", "content_type"} JSON shape.
+    """
+    if envelope:
+        return JSONResponse({
+            "filename": filename,
+            "content": "".join(chunks),
+            "content_type": "text/csv"
+        })
+    
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Vary": "Accept-Encoding"
+    }
+    if compress and "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        chunks = gzip_chunks(chunks)
+    
+    return StreamingResponse(chunks, media_type="text/csv", headers=headers)
+
+def iter_shoutout_export_rows(batch_size=EXPORT_BATCH_SIZE):
+    """Yield shoutout export rows, fetching recipients and reaction counts once per batch"""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(Shoutout.id, Shoutout.message, User.username, Shoutout.image_url, Shoutout.created_at)
+            .outerjoin(User, Shoutout.sender_id == User.id)
+            .order_by(Shoutout.created_at.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in result.partitions():
+            ids = [row.id for row in batch]
+            
+            recipient_names = {}
+            for shoutout_id, username in db.query(ShoutoutRecipient.shoutout_id, User.username)\
+                    .join(User, ShoutoutRecipient.user_id == User.id)\
+                    .filter(ShoutoutRecipient.shoutout_id.in_(ids))\
+                    .order_by(ShoutoutRecipient.id):
+                recipient_names.setdefault(shoutout_id, []).append(username)
+            
+            reaction_counts = {}
+            for shoutout_id, reaction_type, count in db.query(Reaction.shoutout_id, Reaction.reaction_type, func.count(Reaction.id))\
+                    .filter(Reaction.shoutout_id.in_(ids))\
+                    .group_by(Reaction.shoutout_id, Reaction.reaction_type):
+                reaction_counts.setdefault(shoutout_id, {})[reaction_type.value] = count
+            
+            for row in batch:
+                counts = reaction_counts.get(row.id, {})
+                yield [
+                    row.id,
+                    row.message[:200] + "..." if len(row.message) > 200 else row.message,
+                    row.username or "Unknown",
+                    ", ".join(recipient_names.get(row.id, [])),
+                    f"👍 {counts.get('like', 0)} 👏 {counts.get('clap', 0)} ⭐ {counts.get('star', 0)}",
+                    "Yes" if row.image_url else "No",
+                    row.created_at.strftime("%Y-%m-%d %H:%M:%S")
+                ]
+    finally:
+        db.close()
+
+def iter_user_export_rows(batch_size=EXPORT_BATCH_SIZE):
+    """Yield user export rows with sent/received counts joined in from grouped subqueries"""
+    db = SessionLocal()
+    try:
+        sent = select(Shoutout.sender_id.label("user_id"), func.count(Shoutout.id).label("total"))\
+            .group_by(Shoutout.sender_id).subquery()
+        received = select(ShoutoutRecipient.user_id.label("user_id"), func.count(ShoutoutRecipient.id).label("total"))\
+            .group_by(ShoutoutRecipient.user_id).subquery()
+        
+        result = db.execute(
+            select(
+                User.id, User.username, User.email, User.role, Department.name,
+                func.coalesce(sent.c.total, 0), func.coalesce(received.c.total, 0), User.created_at
+            )
+            .outerjoin(Department, User.department_id == Department.id)
+            .outerjoin(sent, sent.c.user_id == User.id)
+            .outerjoin(received, received.c.user_id == User.id)
+            .order_by(User.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for user_id, username, email, role, department_name, shoutouts_sent, shoutouts_received, created_at in result:
+            yield [
+                user_id,
+                username,
+                email,
+                role,
+                department_name or "No Department",
+                shoutouts_sent,
+                shoutouts_received,
+                created_at.strftime("%Y-%m-%d %H:%M:%S")
+            ]
+    finally:
+        db.close()
+
 @app.get("/api/export/shoutouts/csv")
 def export_shoutouts_csv(
-    db: Session = Depends(get_db),
+    request: Request,
+    envelope: bool = False,
+    compress: bool = True,
     current_user: User = Depends(auth.get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can export data")
     
-    shoutouts = db.query(Shoutout).order_by(Shoutout.created_at.desc()).all()
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["ID", "Message", "Sender", "Recipients", "Reactions", "Image", "Created At"])
-    
-    for shoutout in shoutouts:
-        sender = db.query(User).filter(User.id == shoutout.sender_id).first()
-        
-        recipients = db.query(ShoutoutRecipient).filter(
-            ShoutoutRecipient.shoutout_id == shoutout.id
-        ).all()
-        recipient_names = []
-        for rec in recipients:
-            user = db.query(User).filter(User.id == rec.user_id).first()
-            if user:
-                recipient_names.append(user.username)
-        
-        reactions = db.query(Reaction).filter(Reaction.shoutout_id == shoutout.id).all()
-        reaction_counts = {"like": 0, "clap": 0, "star": 0}
-        for reaction in reactions:
-            reaction_counts[reaction.reaction_type.value] += 1
-        
-        writer.writerow([
-            shoutout.id,
-            shoutout.message[:200] + "..." if len(shoutout.message) > 200 else shoutout.message,
-            sender.username if sender else "Unknown",
-            ", ".join(recipient_names),
-            f"👍 {reaction_counts['like']} 👏 {reaction_counts['clap']} ⭐ {reaction_counts['star']}",
-            "Yes" if shoutout.image_url else "No",
-            shoutout.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        ])
-    
-    output.seek(0)
-    csv_content = output.getvalue()
-    
-    # Return as downloadable file
-    return JSONResponse({
-        "filename": f"shoutouts_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        "content": csv_content,
-        "content_type": "text/csv"
-    })
+    chunks = iter_csv_chunks(
+        ["ID", "Message", "Sender", "Recipients", "Reactions", "Image", "Created At"],
+        iter_shoutout_export_rows()
+    )
+    filename = f"shoutouts_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return csv_export_response(chunks, filename, request, envelope, compress)
 
 @app.get("/api/export/users/csv")
 def export_users_csv(
-    db: Session = Depends(get_db),
+    request: Request,
+    envelope: bool = False,
+    compress: bool = True,
     current_user: User = Depends(auth.get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can export data")
     
-    users = db.query(User).all()
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["ID", "Username", "Email", "Role", "Department", "Shoutouts Sent", "Shoutouts Received", "Joined At"])
-    
-    for user in users:
-        shoutouts_sent = db.query(Shoutout).filter(Shoutout.sender_id == user.id).count()
-        shoutouts_received = db.query(ShoutoutRecipient).filter(
-            ShoutoutRecipient.user_id == user.id
-        ).count()
-        
-        department_name = user.department.name if user.department else "No Department"
-        
-        writer.writerow([
-            user.id,
-            user.username,
-            user.email,
-            user.role,
-            department_name,
-            shoutouts_sent,
-            shoutouts_received,
-            user.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        ])
-    
-    output.seek(0)
-    csv_content = output.getvalue()
-    
-    return JSONResponse({
-        "filename": f"users_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        "content": csv_content,
-        "content_type": "text/csv"
-    })
+    chunks = iter_csv_chunks(
+        ["ID", "Username", "Email", "Role", "Department", "Shoutouts Sent", "Shoutouts Received", "Joined At"],
+        iter_user_export_rows()
+    )
+    filename = f"users_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return csv_export_response(chunks, filename, request, envelope, compress)
 
 @app.get("/api/export/leaderboard/csv")
 def export_leaderboard_csv(
+    request: Request,
+    envelope: bool = False,
+    compress: bool = True,
     db: Session = Depends(get_db),
     current_user: User = Depends(auth.get_current_user)
 ):
@@ -1058,13 +1088,8 @@ def export_leaderboard_csv(
     
     leaderboard = calculate_leaderboard(db)
     
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Rank", "Username", "Email", "Department", "Shoutouts Sent", "Shoutouts Received", "Reactions Received", "Points"])
-    
-    for i, user in enumerate(leaderboard, 1):
-        writer.writerow([
+    rows = (
+        [
             i,
             user["username"],
             user["email"],
@@ -1073,337 +1098,96 @@ def export_leaderboard_csv(
             user["shoutouts_received"],
             user["reactions_received"],
             user["score"]
-        ])
-    
-    output.seek(0)
-    csv_content = output.getvalue()
-    
-    return JSONResponse({
-        "filename": f"leaderboard_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        "content": csv_content,
-        "content_type": "text/csv"
-    })
+        ]
+        for i, user in enumerate(leaderboard, 1)
+    )
+    chunks = iter_csv_chunks(
+        ["Rank", "Username", "Email", "Department", "Shoutouts Sent", "Shoutouts Received", "Reactions Received", "Points"],
+        rows
+    )
+    filename = f"leaderboard_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return csv_export_response(chunks, filename, request, envelope, compress)
 
 # ========== PDF EXPORT ENDPOINTS ==========
+# PDFs are rendered by report_jobs in a process pool; these handlers only queue and wait.
 
-def create_shoutouts_pdf(shoutouts_data):
-    """Create PDF for shoutouts"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
-    styles.add(ParagraphStyle(name='Left', alignment=TA_LEFT))
-    
-    story = []
-    
-    # Title
-    title = Paragraph("<b>BragBoard - Shoutouts Report</b>", styles['Title'])
-    story.append(title)
-    story.append(Spacer(1, 12))
-    
-    # Date
-    date_str = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
-    story.append(date_str)
-    story.append(Spacer(1, 24))
-    
-    # Summary
-    summary = Paragraph(f"<b>Total Shoutouts:</b> {len(shoutouts_data)}", styles['Normal'])
-    story.append(summary)
-    story.append(Spacer(1, 12))
-    
-    # Table data
-    table_data = [["ID", "Sender", "Message", "Recipients", "Date"]]
-    
-    for shoutout in shoutouts_data:
-        table_data.append([
-            str(shoutout["id"]),
-            shoutout["sender"],
-            shoutout["message"][:100] + "..." if len(shoutout["message"]) > 100 else shoutout["message"],
-            shoutout["recipients"],
-            shoutout["date"]
-        ])
-    
-    # Create table
-    table = Table(table_data, colWidths=[50, 80, 200, 100, 80])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    
-    story.append(table)
-    story.append(Spacer(1, 20))
-    
-    # Footer
-    footer = Paragraph("<i>BragBoard - Celebrating Success Together</i>", styles['Italic'])
-    story.append(footer)
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-def create_leaderboard_pdf(leaderboard_data):
-    """Create PDF for leaderboard"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
-    
-    story = []
-    
-    # Title
-    title = Paragraph("<b>BragBoard - Leaderboard Report</b>", styles['Title'])
-    story.append(title)
-    story.append(Spacer(1, 12))
-    
-    # Date
-    date_str = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
-    story.append(date_str)
-    story.append(Spacer(1, 24))
-    
-    # Create chart image
-    fig, ax = plt.subplots(figsize=(8, 4))
-    users = [entry["username"][:15] for entry in leaderboard_data[:10]]
-    scores = [entry["score"] for entry in leaderboard_data[:10]]
-    
-    bars = ax.barh(users, scores, color=['gold', 'silver', '#CD7F32'] + ['skyblue'] * 7)
-    ax.set_xlabel('Points')
-    ax.set_title('Top 10 Contributors')
-    ax.invert_yaxis()
-    
-    # Save chart to buffer
-    chart_buffer = BytesIO()
-    plt.tight_layout()
-    plt.savefig(chart_buffer, format='png', dpi=100)
-    plt.close()
-    chart_buffer.seek(0)
-    
-    # Add chart to PDF
-    story.append(Paragraph("<b>Top Contributors Chart</b>", styles['Heading2']))
-    story.append(Spacer(1, 12))
-    
-    # Table data
-    table_data = [["Rank", "Username", "Department", "Shoutouts", "Reactions", "Points"]]
-    
-    for i, entry in enumerate(leaderboard_data[:20], 1):
-        table_data.append([
-            str(i),
-            entry["username"],
-            entry["department_name"] or "N/A",
-            str(entry["shoutouts_sent"] + entry["shoutouts_received"]),
-            str(entry["reactions_received"]),
-            str(entry["score"])
-        ])
-    
-    # Create table
-    table = Table(table_data, colWidths=[40, 100, 100, 70, 70, 60])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (0, 3), colors.HexColor('#FFD700')),  # Gold
-        ('BACKGROUND', (0, 4), (0, 4), colors.HexColor('#C0C0C0')),  # Silver
-        ('BACKGROUND', (0, 5), (0, 5), colors.HexColor('#CD7F32')),  # Bronze
-        ('BACKGROUND', (0, 6), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    
-    story.append(table)
-    story.append(Spacer(1, 20))
-    
-    # Statistics
-    stats_text = f"""
-    <b>Statistics:</b><br/>
-    Total Users on Leaderboard: {len(leaderboard_data)}<br/>
-    Average Points: {sum(entry['score'] for entry in leaderboard_data) / len(leaderboard_data):.1f}<br/>
-    Top Score: {leaderboard_data[0]['score'] if leaderboard_data else 0}<br/>
-    """
-    stats = Paragraph(stats_text, styles['Normal'])
-    story.append(stats)
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-def create_reports_pdf(reports_data):
-    """Create PDF for reports"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    
-    styles = getSampleStyleSheet()
-    
-    story = []
-    
-    # Title
-    title = Paragraph("<b>BragBoard - Reports Analysis</b>", styles['Title'])
-    story.append(title)
-    story.append(Spacer(1, 12))
-    
-    # Date
-    date_str = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
-    story.append(date_str)
-    story.append(Spacer(1, 24))
-    
-    # Summary
-    pending = len([r for r in reports_data if r["status"] == "pending"])
-    resolved = len([r for r in reports_data if r["status"] == "resolved"])
-    dismissed = len([r for r in reports_data if r["status"] == "dismissed"])
-    
-    summary = Paragraph(
-        f"<b>Report Summary:</b><br/>"
-        f"Total Reports: {len(reports_data)}<br/>"
-        f"Pending: {pending}<br/>"
-        f"Resolved: {resolved}<br/>"
-        f"Dismissed: {dismissed}",
-        styles['Normal']
+def check_report_access(kind: str, current_user: User):
+    if kind not in REPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown report. Must be one of: {', '.join(REPORT_KINDS)}")
+    
+    _, admin_only = REPORT_KINDS[kind]
+    if admin_only and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can export reports")
+
+def report_file_response(job):
+    prefix, _ = REPORT_KINDS[job.kind]
+    return FileResponse(
+        job.file_path,
+        media_type="application/pdf",
+        filename=f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     )
-    story.append(summary)
-    story.append(Spacer(1, 20))
-    
-    # Table data
-    table_data = [["ID", "Shoutout ID", "Reporter", "Reason", "Status", "Date"]]
-    
-    for report in reports_data:
-        table_data.append([
-            str(report["id"]),
-            str(report["shoutout_id"]),
-            report["reporter_username"],
-            report["reason"][:30] + "..." if len(report["reason"]) > 30 else report["reason"],
-            report["status"],
-            report["created_at"].strftime("%Y-%m-%d") if hasattr(report["created_at"], 'strftime') else report["created_at"]
-        ])
-    
-    # Create table
-    table = Table(table_data, colWidths=[40, 60, 80, 150, 60, 80])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    
-    story.append(table)
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+
+async def render_report_now(kind: str, current_user: User):
+    """Queue the report (or join an identical one in flight) and wait for the file"""
+    check_report_access(kind, current_user)
+    job = await report_jobs.wait(report_jobs.submit(kind))
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {job.error}")
+    return report_file_response(job)
 
 @app.get("/api/export/shoutouts/pdf")
-async def export_shoutouts_pdf(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(auth.get_current_user)
-):
+async def export_shoutouts_pdf(current_user: User = Depends(auth.get_current_user)):
     """Export shoutouts as PDF"""
-    shoutouts = db.query(Shoutout).order_by(Shoutout.created_at.desc()).all()
-    
-    # Prepare data for PDF
-    shoutouts_data = []
-    for shoutout in shoutouts:
-        sender = db.query(User).filter(User.id == shoutout.sender_id).first()
-        
-        # Get recipients
-        recipients = db.query(ShoutoutRecipient).filter(
-            ShoutoutRecipient.shoutout_id == shoutout.id
-        ).all()
-        recipient_names = []
-        for rec in recipients:
-            user = db.query(User).filter(User.id == rec.user_id).first()
-            if user:
-                recipient_names.append(user.username)
-        
-        shoutouts_data.append({
-            "id": shoutout.id,
-            "message": shoutout.message,
-            "sender": sender.username if sender else "Unknown",
-            "recipients": ", ".join(recipient_names) if recipient_names else "No recipients",
-            "date": shoutout.created_at.strftime("%Y-%m-%d")
-        })
-    
-    pdf_buffer = create_shoutouts_pdf(shoutouts_data)
-    
-    headers = {
-        'Content-Disposition': f'attachment; filename="shoutouts_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    }
-    
-    return Response(
-        content=pdf_buffer.getvalue(),
-        media_type="application/pdf",
-        headers=headers
-    )
+    return await render_report_now("shoutouts", current_user)
 
 @app.get("/api/export/leaderboard/pdf")
-async def export_leaderboard_pdf(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(auth.get_current_user)
-):
+async def export_leaderboard_pdf(current_user: User = Depends(auth.get_current_user)):
     """Export leaderboard as PDF"""
-    leaderboard_data = calculate_leaderboard(db)
-    
-    pdf_buffer = create_leaderboard_pdf(leaderboard_data)
-    
-    headers = {
-        'Content-Disposition': f'attachment; filename="leaderboard_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    }
-    
-    return Response(
-        content=pdf_buffer.getvalue(),
-        media_type="application/pdf",
-        headers=headers
-    )
+    return await render_report_now("leaderboard", current_user)
 
 @app.get("/api/export/reports/pdf")
-async def export_reports_pdf(
-    db: Session = Depends(get_db),
+async def export_reports_pdf(current_user: User = Depends(auth.get_current_user)):
+    """Export reports as PDF (admin only)"""
+    return await render_report_now("reports", current_user)
+
+@app.post("/api/export/jobs", status_code=202)
+async def create_report_job(
+    job_data: ReportJobCreate,
     current_user: User = Depends(auth.get_current_user)
 ):
-    """Export reports as PDF (admin only)"""
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only admins can export reports")
-    
-    reports = db.query(Report).order_by(Report.created_at.desc()).all()
-    
-    # Prepare data for PDF
-    reports_data = []
-    for report in reports:
-        reporter = db.query(User).filter(User.id == report.reporter_id).first()
-        
-        reports_data.append({
-            "id": report.id,
-            "shoutout_id": report.shoutout_id,
-            "reporter_username": reporter.username if reporter else "Unknown",
-            "reason": report.reason,
-            "status": report.status,
-            "created_at": report.created_at
-        })
-    
-    pdf_buffer = create_reports_pdf(reports_data)
-    
-    headers = {
-        'Content-Disposition': f'attachment; filename="reports_analysis_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    }
-    
-    return Response(
-        content=pdf_buffer.getvalue(),
-        media_type="application/pdf",
-        headers=headers
-    )
+    """Queue a PDF report; poll GET /api/export/jobs/{job_id} for its status"""
+    check_report_access(job_data.kind, current_user)
+    return report_jobs.submit(job_data.kind).to_dict()
+
+@app.get("/api/export/jobs/{job_id}")
+async def get_report_job(job_id: str, current_user: User = Depends(auth.get_current_user)):
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    check_report_access(job.kind, current_user)
+    return job.to_dict()
+
+@app.get("/api/export/jobs/{job_id}/download")
+async def download_report_job(job_id: str, current_user: User = Depends(auth.get_current_user)):
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    check_report_access(job.kind, current_user)
+    
+    if job.status == "pending":
+        raise HTTPException(status_code=409, detail="Report is still being generated")
+    if job.status != "done" or not job.file_path.exists():
+        raise HTTPException(status_code=410, detail=f"Report is not available: {job.error or 'expired'}")
+    
+    return report_file_response(job)
+
+@app.on_event("shutdown")
+def shutdown_report_jobs():
+    report_jobs.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_storage():
+    close_storage()
 
 # ========== USER MANAGEMENT ENDPOINTS ==========
 
@@ -1510,30 +1294,24 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 
 @app.post("/api/upload-image")
 def upload_image(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(auth.get_current_user)
 ):
-    allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
+    allowed_types = {"image/jpeg": "jpg", "image/png": "png", "image/gif": "gif", "image/webp": "webp"}
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = file.filename.split(".")[-1]
-    filename = f"{timestamp}_{current_user.id}.{file_extension}"
-    file_path = UPLOAD_DIR / filename
-    
-    with open(file_path, "wb") as buffer:
-        content = file.file.read()
-        buffer.write(content)
+    # Named after the content hash, so the file behind a URL never changes
+    image_url, is_new = save_upload(file.file, UPLOAD_DIR, allowed_types[file.content_type])
     
-    return {"image_url": f"/uploads/{filename}"}
+    # Thumbnails are written after the response; shoutouts pick them up by name
+    if is_new:
+        background_tasks.add_task(generate_derivatives_task, image_url)
+    return {"image_url": image_url}
 
-@app.get("/uploads/{filename}")
-def get_image(filename: str):
-    file_path = UPLOAD_DIR / filename
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+# Immutable caching, ETags, Range requests and optional proxy offload (see media_files.py)
+app.mount("/uploads", MediaFiles(directory=UPLOAD_DIR), name="uploads")
 
 # ========== HEALTH CHECK ==========
 @app.get("/")
@@ -0,0 +1,98 @@
+# media_files.py - storage naming and serving for /uploads.
+# Uploads are saved as <sha256>.<ext> (in uploads/ or the bucket, see storage.py), so a name always means the same bytes: the same image
+# uploaded twice is stored once, and responses can be cached for a year as immutable with the
+# digest as a strong ETag (derivatives get "<digest>_w320.webp"). Range requests (video seeking)
+# are handled by FileResponse. MEDIA_ACCEL_MODE=nginx|sendfile makes the response carry only
+# headers plus X-Accel-Redirect / X-Sendfile, and the front proxy sends the bytes.
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+import storage
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ACCEL_MODE = os.getenv("MEDIA_ACCEL_MODE", "").lower()  # "", "nginx" or "sendfile"
+ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-uploads/")
+CHUNK_SIZE = 1024 * 1024
+
+# <64 hex>.jpg, or a derivative of it: <64 hex>_w320.webp
+_HASHED_NAME = re.compile(r"^([0-9a-f]{64})(?:(_w\d+\.[a-z0-9]+)|\.[a-z0-9]{1,10})?$")
+
+def save_upload(fileobj, upload_dir: Path, extension: str, backend=None):
+    """Stream an upload to storage as <sha256>.<extension>, staged in upload_dir; returns (url, is_new)"""
+    backend = backend or storage.get_storage()
+    upload_dir.mkdir(exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".tmp")
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+        key = f"{digest.hexdigest()}.{extension}"
+        if backend.exists(backend.url_for(key)):
+            return backend.url_for(key), False
+        return backend.save_file(tmp_path, key), True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def content_etag(relative_path: str):
+    """Strong ETag for hash-named files, None for older uploads"""
+    match = _HASHED_NAME.match(relative_path)
+    if not match:
+        return None
+    return f'"{match.group(1)}{match.group(2) or ""}"'
+
+def stat_etag(stat_result: os.stat_result) -> str:
+    """Same ETag FileResponse would send, for responses without a body"""
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+
+class MediaFiles(StaticFiles):
+    def __init__(self, *args, accel_mode: str = ACCEL_MODE, accel_prefix: str = ACCEL_PREFIX, **kwargs):
+        super().__init__(*args, **kwargs)
+        if accel_mode not in ("", "nginx", "sendfile"):
+            raise ValueError(f"Unknown MEDIA_ACCEL_MODE: {accel_mode}")
+        self.accel_mode = accel_mode
+        self.accel_prefix = accel_prefix.rstrip("/") + "/"
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+
+        headers = {"cache-control": IMMUTABLE_CACHE_CONTROL}
+        etag = content_etag(relative_path)
+        if etag:
+            headers["etag"] = etag
+
+        if self.accel_mode:
+            response = self.accel_response(full_path, relative_path, stat_result, headers, status_code)
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def accel_response(self, full_path, relative_path: str, stat_result, headers: dict, status_code: int) -> Response:
+        headers.setdefault("etag", stat_etag(stat_result))
+        headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        if self.accel_mode == "nginx":
+            headers["x-accel-redirect"] = self.accel_prefix + quote(relative_path)
+        else:
+            headers["x-sendfile"] = os.path.abspath(full_path)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,143 @@
+# report_jobs.py - background PDF report jobs.
+# Rendering runs in a process pool so the event loop (and the GIL) stay free for other requests.
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from database import SessionLocal, engine
+from reports import build_report
+
+REPORT_DIR = Path(os.getenv("REPORT_DIR", "generated_reports"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+JOB_TTL_SECONDS = int(os.getenv("REPORT_JOB_TTL", "3600"))
+
+@dataclass
+class ReportJob:
+    id: str
+    kind: str
+    status: str = "pending"  # pending, done, failed
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    file_path: Optional[Path] = None
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+def _init_worker():
+    # Connections inherited from the parent process must not be reused here
+    engine.dispose(close=False)
+
+def render_report(kind: str, output_path: str) -> str:
+    """Runs inside a worker process: query, render and write the PDF to disk"""
+    db = SessionLocal()
+    try:
+        buffer = build_report(kind, db)
+    finally:
+        db.close()
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, output_path)
+    return output_path
+
+class ReportJobManager:
+    """
+    Keeps track of report jobs for this worker.
+
+    - At most `max_workers` reports render at the same time (process pool size).
+    - Requests for a kind that is still rendering share that job instead of rendering twice,
+      so there are never more unfinished jobs than report kinds and no queue limit is needed.
+    """
+    def __init__(self, output_dir: Path = REPORT_DIR, max_workers: int = REPORT_WORKERS,
+                 ttl_seconds: int = JOB_TTL_SECONDS):
+        self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+        self.jobs: Dict[str, ReportJob] = {}
+        self._in_flight: Dict[str, str] = {}  # dedup key -> job id
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        return self._executor
+
+    def submit(self, kind: str) -> ReportJob:
+        """Queue a report (must be called from the event loop). Returns the existing job for duplicates."""
+        self.prune()
+
+        dedup_key = kind
+        existing_id = self._in_flight.get(dedup_key)
+        if existing_id is not None:
+            return self.jobs[existing_id]
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        job = ReportJob(id=uuid.uuid4().hex, kind=kind)
+        job.file_path = self.output_dir / f"{job.id}.pdf"
+
+        loop = asyncio.get_running_loop()
+        job.future = loop.run_in_executor(self._get_executor(), render_report, kind, str(job.file_path))
+        job.future.add_done_callback(lambda fut, job=job, key=dedup_key: self._on_done(job, key, fut))
+
+        self.jobs[job.id] = job
+        self._in_flight[dedup_key] = job.id
+        return job
+
+    def _on_done(self, job: ReportJob, dedup_key: str, fut: asyncio.Future):
+        job.finished_at = time.time()
+        if self._in_flight.get(dedup_key) == job.id:
+            del self._in_flight[dedup_key]
+
+        if fut.cancelled():
+            job.status = "failed"
+            job.error = "cancelled"
+        elif fut.exception() is not None:
+            job.status = "failed"
+            job.error = str(fut.exception())
+        else:
+            job.status = "done"
+
+    async def wait(self, job: ReportJob) -> ReportJob:
+        """Wait for a job to finish without cancelling it for other waiters"""
+        try:
+            await asyncio.shield(job.future)
+        except Exception:
+            pass
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        return self.jobs.get(job_id)
+
+    def prune(self):
+        """Forget finished jobs older than the TTL and delete their files"""
+        cutoff = time.time() - self.ttl_seconds
+        for job_id, job in list(self.jobs.items()):
+            if job.status != "pending" and job.finished_at and job.finished_at < cutoff:
+                if job.file_path and job.file_path.exists():
+                    try:
+                        job.file_path.unlink()
+                    except OSError:
+                        pass
+                del self.jobs[job_id]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+report_jobs = ReportJobManager()
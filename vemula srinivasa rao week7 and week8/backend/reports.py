@@ -0,0 +1,344 @@
+# reports.py - data collection and PDF rendering for the export reports.
+# Kept free of FastAPI/app imports so report_jobs can run it in worker processes.
+from datetime import datetime
+from io import BytesIO
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+from models import User, Department, Shoutout, ShoutoutRecipient, Reaction, Comment, Report
+from charts import leaderboard_chart_png
+
+# ========== DATA COLLECTION ==========
+
+def calculate_leaderboard(db: Session):
+    # One grouped query per metric instead of four queries per user
+    shoutouts_received_by_user = dict(
+        db.query(ShoutoutRecipient.user_id, func.count(ShoutoutRecipient.id))
+        .group_by(ShoutoutRecipient.user_id).all()
+    )
+    reactions_received_by_user = dict(
+        db.query(Shoutout.sender_id, func.count(Reaction.id))
+        .join(Reaction, Reaction.shoutout_id == Shoutout.id)
+        .group_by(Shoutout.sender_id).all()
+    )
+    shoutouts_sent_by_user = dict(
+        db.query(Shoutout.sender_id, func.count(Shoutout.id))
+        .group_by(Shoutout.sender_id).all()
+    )
+    comments_by_user = dict(
+        db.query(Comment.user_id, func.count(Comment.id))
+        .group_by(Comment.user_id).all()
+    )
+
+    users = db.query(User.id, User.username, User.email, Department.name)\
+        .outerjoin(Department, User.department_id == Department.id)\
+        .order_by(User.id).all()
+    leaderboard = []
+    
+    for user_id, username, email, department_name in users:
+        shoutouts_received = shoutouts_received_by_user.get(user_id, 0)
+        reactions_received = reactions_received_by_user.get(user_id, 0)
+        shoutouts_sent = shoutouts_sent_by_user.get(user_id, 0)
+        comments_count = comments_by_user.get(user_id, 0)
+        
+        # Calculate points: 10 for shoutouts received, 5 for reactions, 2 for shoutouts sent, 1 for comments
+        points = (shoutouts_received * 10) + (reactions_received * 5) + (shoutouts_sent * 2) + comments_count
+        
+        leaderboard.append({
+            "id": user_id,
+            "username": username,
+            "email": email,
+            "department_name": department_name,
+            "shoutouts_sent": shoutouts_sent,
+            "shoutouts_received": shoutouts_received,
+            "reactions_received": reactions_received,
+            "comments_count": comments_count,
+            "score": points
+        })
+    
+    leaderboard.sort(key=lambda x: x["score"], reverse=True)
+    return leaderboard
+
+def collect_shoutouts_data(db: Session):
+    """Rows for the shoutouts PDF"""
+    shoutouts = db.query(Shoutout).order_by(Shoutout.created_at.desc()).all()
+    
+    shoutouts_data = []
+    for shoutout in shoutouts:
+        sender = db.query(User).filter(User.id == shoutout.sender_id).first()
+        
+        # Get recipients
+        recipients = db.query(ShoutoutRecipient).filter(
+            ShoutoutRecipient.shoutout_id == shoutout.id
+        ).all()
+        recipient_names = []
+        for rec in recipients:
+            user = db.query(User).filter(User.id == rec.user_id).first()
+            if user:
+                recipient_names.append(user.username)
+        
+        shoutouts_data.append({
+            "id": shoutout.id,
+            "message": shoutout.message,
+            "sender": sender.username if sender else "Unknown",
+            "recipients": ", ".join(recipient_names) if recipient_names else "No recipients",
+            "date": shoutout.created_at.strftime("%Y-%m-%d")
+        })
+    
+    return shoutouts_data
+
+def collect_reports_data(db: Session):
+    """Rows for the reports analysis PDF"""
+    reports = db.query(Report).order_by(Report.created_at.desc()).all()
+    
+    reports_data = []
+    for report in reports:
+        reporter = db.query(User).filter(User.id == report.reporter_id).first()
+        
+        reports_data.append({
+            "id": report.id,
+            "shoutout_id": report.shoutout_id,
+            "reporter_username": reporter.username if reporter else "Unknown",
+            "reason": report.reason,
+            "status": report.status,
+            "created_at": report.created_at
+        })
+    
+    return reports_data
+
+# ========== PDF RENDERING ==========
+
+def create_shoutouts_pdf(shoutouts_data):
+    """Create PDF for shoutouts"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='Left', alignment=TA_LEFT))
+    
+    story = []
+    
+    # Title
+    title = Paragraph("<b>BragBoard - Shoutouts Report</b>", styles['Title'])
+    story.append(title)
+    story.append(Spacer(1, 12))
+    
+    # Date
+    date_str = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
+    story.append(date_str)
+    story.append(Spacer(1, 24))
+    
+    # Summary
+    summary = Paragraph(f"<b>Total Shoutouts:</b> {len(shoutouts_data)}", styles['Normal'])
+    story.append(summary)
+    story.append(Spacer(1, 12))
+    
+    # Table data
+    table_data = [["ID", "Sender", "Message", "Recipients", "Date"]]
+    
+    for shoutout in shoutouts_data:
+        table_data.append([
+            str(shoutout["id"]),
+            shoutout["sender"],
+            shoutout["message"][:100] + "..." if len(shoutout["message"]) > 100 else shoutout["message"],
+            shoutout["recipients"],
+            shoutout["date"]
+        ])
+    
+    # Create table
+    table = Table(table_data, colWidths=[50, 80, 200, 100, 80])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    
+    story.append(table)
+    story.append(Spacer(1, 20))
+    
+    # Footer
+    footer = Paragraph("<i>BragBoard - Celebrating Success Together</i>", styles['Italic'])
+    story.append(footer)
+    
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+def create_leaderboard_pdf(leaderboard_data):
+    """Create PDF for leaderboard"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
+    
+    story = []
+    
+    # Title
+    title = Paragraph("<b>BragBoard - Leaderboard Report</b>", styles['Title'])
+    story.append(title)
+    story.append(Spacer(1, 12))
+    
+    # Date
+    date_str = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
+    story.append(date_str)
+    story.append(Spacer(1, 24))
+    
+    # Chart image (rendered off the pyplot state machine and cached by series)
+    users = [entry["username"][:15] for entry in leaderboard_data[:10]]
+    scores = [entry["score"] for entry in leaderboard_data[:10]]
+    
+    # Add chart to PDF
+    story.append(Paragraph("<b>Top Contributors Chart</b>", styles['Heading2']))
+    story.append(Spacer(1, 12))
+    if users:
+        chart_png = leaderboard_chart_png(users, scores)
+        story.append(Image(BytesIO(chart_png), width=6 * inch, height=3 * inch))
+        story.append(Spacer(1, 12))
+    
+    # Table data
+    table_data = [["Rank", "Username", "Department", "Shoutouts", "Reactions", "Points"]]
+    
+    for i, entry in enumerate(leaderboard_data[:20], 1):
+        table_data.append([
+            str(i),
+            entry["username"],
+            entry["department_name"] or "N/A",
+            str(entry["shoutouts_sent"] + entry["shoutouts_received"]),
+            str(entry["reactions_received"]),
+            str(entry["score"])
+        ])
+    
+    # Create table
+    table = Table(table_data, colWidths=[40, 100, 100, 70, 70, 60])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (0, 3), colors.HexColor('#FFD700')),  # Gold
+        ('BACKGROUND', (0, 4), (0, 4), colors.HexColor('#C0C0C0')),  # Silver
+        ('BACKGROUND', (0, 5), (0, 5), colors.HexColor('#CD7F32')),  # Bronze
+        ('BACKGROUND', (0, 6), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    
+    story.append(table)
+    story.append(Spacer(1, 20))
+    
+    # Statistics
+    stats_text = f"""
+    <b>Statistics:</b><br/>
+    Total Users on Leaderboard: {len(leaderboard_data)}<br/>
+    Average Points: {sum(entry['score'] for entry in leaderboard_data) / len(leaderboard_data):.1f}<br/>
+    Top Score: {leaderboard_data[0]['score'] if leaderboard_data else 0}<br/>
+    """
+    stats = Paragraph(stats_text, styles['Normal'])
+    story.append(stats)
+    
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+def create_reports_pdf(reports_data):
+    """Create PDF for reports"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    styles = getSampleStyleSheet()
+    
+    story = []
+    
+    # Title
+    title = Paragraph("<b>BragBoard - Reports Analysis</b>", styles['Title'])
+    story.append(title)
+    story.append(Spacer(1, 12))
+    
+    # Date
+    date_str = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
+    story.append(date_str)
+    story.append(Spacer(1, 24))
+    
+    # Summary
+    pending = len([r for r in reports_data if r["status"] == "pending"])
+    resolved = len([r for r in reports_data if r["status"] == "resolved"])
+    dismissed = len([r for r in reports_data if r["status"] == "dismissed"])
+    
+    summary = Paragraph(
+        f"<b>Report Summary:</b><br/>"
+        f"Total Reports: {len(reports_data)}<br/>"
+        f"Pending: {pending}<br/>"
+        f"Resolved: {resolved}<br/>"
+        f"Dismissed: {dismissed}",
+        styles['Normal']
+    )
+    story.append(summary)
+    story.append(Spacer(1, 20))
+    
+    # Table data
+    table_data = [["ID", "Shoutout ID", "Reporter", "Reason", "Status", "Date"]]
+    
+    for report in reports_data:
+        table_data.append([
+            str(report["id"]),
+            str(report["shoutout_id"]),
+            report["reporter_username"],
+            report["reason"][:30] + "..." if len(report["reason"]) > 30 else report["reason"],
+            report["status"],
+            report["created_at"].strftime("%Y-%m-%d") if hasattr(report["created_at"], 'strftime') else report["created_at"]
+        ])
+    
+    # Create table
+    table = Table(table_data, colWidths=[40, 60, 80, 150, 60, 80])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    
+    story.append(table)
+    
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+# ========== REPORT KINDS ==========
+
+# kind -> (filename prefix, admin only)
+REPORT_KINDS = {
+    "shoutouts": ("shoutouts_report", False),
+    "leaderboard": ("leaderboard_report", False),
+    "reports": ("reports_analysis", True),
+}
+
+def build_report(kind: str, db: Session) -> BytesIO:
+    """Collect the data for a report kind and render it to a PDF buffer"""
+    if kind == "shoutouts":
+        return create_shoutouts_pdf(collect_shoutouts_data(db))
+    if kind == "leaderboard":
+        return create_leaderboard_pdf(calculate_leaderboard(db))
+    if kind == "reports":
+        return create_reports_pdf(collect_reports_data(db))
+    raise ValueError(f"Unknown report kind: {kind}")
@@ -55,6 +55,7 @@ class ShoutoutResponse(BaseModel):
     sender_id: int
     sender_name: str
     image_url: Optional[str]
+    image_derivatives: List[Dict[str, Any]] = []
     created_at: datetime
     recipients: List[Dict[str, Any]]
     reaction_counts: Dict[str, int]
@@ -153,4 +154,7 @@ class ExportResponse(BaseModel):
 
 # User Role Update Schema
 class UserRoleUpdate(BaseModel):
-    role: str 
\ No newline at end of file
+    role: str
+
+class ReportJobCreate(BaseModel):
+    kind: str  # shoutouts, leaderboard, reports
@@ -0,0 +1,317 @@
+# storage.py - where uploaded images live.
+# /api/upload-image and the derivative task hand finished files to a StorageBackend instead of
+# writing under uploads/ themselves: LocalStorage keeps them in uploads/ (served by the /uploads
+# mount), S3Storage puts them in an S3-compatible bucket (AWS S3, MinIO, R2, ...), and
+# STORAGE_BACKEND=fake_s3 runs S3Storage against an in-memory bucket for local testing.
+# get_storage() reads the environment once; each backend keeps one pooled HTTP client for the
+# life of the process, so uploads reuse connections. save_file, delete and signed_url block;
+# async code awaits asave_file, adelete and asigned_url, which run them in the threadpool.
+import abc
+import contextlib
+import datetime
+import functools
+import hashlib
+import hmac
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote, unquote, urlparse
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+UPLOAD_DIR = Path("uploads")
+POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "10"))
+HTTP_TIMEOUT = float(os.getenv("STORAGE_HTTP_TIMEOUT", "60"))
+CHUNK_SIZE = 1024 * 1024
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+class StorageBackend(abc.ABC):
+    """Files are addressed by keys like "<sha256>.jpg"; shoutouts store the URL save_file returns"""
+    name = "base"
+
+    @abc.abstractmethod
+    def save_file(self, path: str, key: str, content_type: Optional[str] = None) -> str:
+        """Store the local file at path under key and return its URL; the local file is moved or removed"""
+
+    @abc.abstractmethod
+    def url_for(self, key: str) -> str:
+        """The URL a file saved under key is served from"""
+
+    @abc.abstractmethod
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        """The key behind one of this backend's URLs, None for any other URL"""
+
+    def owns(self, url: Optional[str]) -> bool:
+        return self.key_for_url(url) is not None
+
+    @abc.abstractmethod
+    def exists(self, url: str) -> bool:
+        """Whether the file behind url is stored"""
+
+    @abc.abstractmethod
+    def delete(self, url: str) -> bool:
+        """Remove the file behind url; False if there was nothing to remove"""
+
+    def signed_url(self, url: str, expires_in: int = 3600) -> str:
+        """A link that expires after expires_in seconds, where the backend supports that"""
+        return url
+
+    @abc.abstractmethod
+    def local_copy(self, url: str):
+        """Context manager with a path on disk holding the file's content; remote copies (and files written next to them) are removed afterwards"""
+
+    async def asave_file(self, path: str, key: str, content_type: Optional[str] = None) -> str:
+        return await run_in_threadpool(self.save_file, path, key, content_type)
+
+    async def adelete(self, url: str) -> bool:
+        return await run_in_threadpool(self.delete, url)
+
+    async def asigned_url(self, url: str, expires_in: int = 3600) -> str:
+        return await run_in_threadpool(self.signed_url, url, expires_in)
+
+    def close(self):
+        pass
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: Path = UPLOAD_DIR, base_url: str = "/uploads"):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key: str) -> Path:
+        return self.root.joinpath(*key.split("/"))
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        if not url or not url.startswith(self.base_url + "/"):
+            return None
+        key = url[len(self.base_url) + 1:]
+        return None if ".." in key.split("/") else key
+
+    def save_file(self, path: str, key: str, content_type: Optional[str] = None) -> str:
+        target = self.path_for(key)
+        if os.path.abspath(path) != os.path.abspath(target):
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, target)
+        return self.url_for(key)
+
+    def exists(self, url: str) -> bool:
+        key = self.key_for_url(url)
+        return key is not None and self.path_for(key).exists()
+
+    def delete(self, url: str) -> bool:
+        key = self.key_for_url(url)
+        if key is None or not self.path_for(key).exists():
+            return False
+        self.path_for(key).unlink()
+        return True
+
+    @contextlib.contextmanager
+    def local_copy(self, url: str):
+        # Already on disk, no copy needed
+        yield self.path_for(self.key_for_url(url))
+
+def _uri_encode(value: str, safe: str = "") -> str:
+    return quote(value, safe="-_.~" + safe)
+
+def sigv4_signature(secret_key: str, region: str, method: str, canonical_uri: str, query: dict,
+                    headers: dict, payload_hash: str, amz_date: str, service: str = "s3") -> str:
+    """AWS Signature Version 4; every header in headers (lower-case names) is signed"""
+    canonical_query = "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+    names = sorted(headers)
+    canonical_headers = "".join(f"{name}:{' '.join(str(headers[name]).split())}\n" for name in names)
+    canonical_request = "\n".join([method, canonical_uri, canonical_query, canonical_headers, ";".join(names), payload_hash])
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()])
+
+    key = ("AWS4" + secret_key).encode()
+    for part in (amz_date[:8], region, service, "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+class S3Storage(StorageBackend):
+    """Path-style S3 (<endpoint>/<bucket>/<key>) over one pooled httpx.Client; uploads stream from disk unsigned"""
+    name = "s3"
+
+    def __init__(self, bucket: str, endpoint_url: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", public_url: Optional[str] = None, pool_size: int = POOL_SIZE,
+                 timeout: float = HTTP_TIMEOUT, transport=None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        # Where objects are served from: the bucket itself, or a CDN in front of it
+        self.public_url = (public_url or f"{self.endpoint_url}/{bucket}").rstrip("/")
+        self.host = urlparse(self.endpoint_url).netloc
+        self.client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_env(cls, transport=None) -> "S3Storage":
+        return cls(
+            bucket=os.getenv("S3_BUCKET", "bragboard"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com"),
+            access_key=os.getenv("S3_ACCESS_KEY_ID", ""),
+            secret_key=os.getenv("S3_SECRET_ACCESS_KEY", ""),
+            region=os.getenv("S3_REGION", "us-east-1"),
+            public_url=os.getenv("S3_PUBLIC_URL") or None,
+            transport=transport,
+        )
+
+    def _object_path(self, key: str) -> str:
+        return f"/{self.bucket}/{_uri_encode(key, safe='/')}"
+
+    @staticmethod
+    def _amz_date() -> str:
+        return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def _request(self, method: str, key: str, headers: Optional[dict] = None, **kwargs) -> httpx.Response:
+        amz_date = self._amz_date()
+        signed = {"host": self.host, "x-amz-date": amz_date, "x-amz-content-sha256": UNSIGNED_PAYLOAD}
+        signed.update({name.lower(): value for name, value in (headers or {}).items()})
+        path = self._object_path(key)
+        signature = sigv4_signature(self.secret_key, self.region, method, path, {}, signed, UNSIGNED_PAYLOAD, amz_date)
+        signed["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={';'.join(sorted(signed))}, Signature={signature}"
+        )
+        del signed["host"]  # set by httpx
+        return self.client.request(method, self.endpoint_url + path, headers=signed, **kwargs)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}/{_uri_encode(key, safe='/')}"
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        if not url or not url.startswith(self.public_url + "/"):
+            return None
+        return unquote(url[len(self.public_url) + 1:].split("?")[0])
+
+    def save_file(self, path: str, key: str, content_type: Optional[str] = None) -> str:
+        headers = {
+            "content-type": content_type or mimetypes.guess_type(key)[0] or "application/octet-stream",
+            "content-length": str(os.path.getsize(path)),
+        }
+        with open(path, "rb") as f:
+            self._request("PUT", key, headers, content=f).raise_for_status()
+        os.remove(path)
+        return self.url_for(key)
+
+    def exists(self, url: str) -> bool:
+        key = self.key_for_url(url)
+        return key is not None and self._request("HEAD", key).status_code == 200
+
+    def delete(self, url: str) -> bool:
+        key = self.key_for_url(url)
+        if key is None:
+            return False
+        return self._request("DELETE", key).status_code in (200, 204)
+
+    def signed_url(self, url: str, expires_in: int = 3600) -> str:
+        key = self.key_for_url(url)
+        if key is None:
+            return url
+        amz_date = self._amz_date()
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        path = self._object_path(key)
+        query["X-Amz-Signature"] = sigv4_signature(
+            self.secret_key, self.region, "GET", path, query, {"host": self.host}, UNSIGNED_PAYLOAD, amz_date
+        )
+        return f"{self.endpoint_url}{path}?" + "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in query.items())
+
+    @contextlib.contextmanager
+    def local_copy(self, url: str):
+        tmp_dir = tempfile.mkdtemp(prefix="storage-")
+        try:
+            path = Path(tmp_dir) / os.path.basename(self.key_for_url(url))
+            with self.client.stream("GET", self.signed_url(url, expires_in=300)) as response:
+                response.raise_for_status()
+                with open(path, "wb") as out:
+                    for chunk in response.iter_bytes(CHUNK_SIZE):
+                        out.write(chunk)
+            yield path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def close(self):
+        self.client.close()
+
+class FakeS3(httpx.BaseTransport):
+    """In-memory bucket for S3Storage(..., transport=FakeS3()): PUT, GET, HEAD and DELETE, signed requests only"""
+
+    def __init__(self):
+        self.objects = {}  # "<bucket>/<key>" -> (body, content type)
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.headers.get("authorization", "").startswith("AWS4-HMAC-SHA256 ") \
+                and "X-Amz-Signature" not in request.url.params:
+            return httpx.Response(403, text="AccessDenied")
+
+        name = unquote(request.url.path).lstrip("/")
+        if request.method == "PUT":
+            body = request.read()
+            with self._lock:
+                self.objects[name] = (body, request.headers.get("content-type", "application/octet-stream"))
+            return httpx.Response(200, headers={"etag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "DELETE":
+            with self._lock:
+                self.objects.pop(name, None)
+            return httpx.Response(204)
+        if request.method not in ("GET", "HEAD"):
+            return httpx.Response(405)
+
+        with self._lock:
+            stored = self.objects.get(name)
+        if stored is None:
+            return httpx.Response(404, text="NoSuchKey")
+        body, content_type = stored
+        headers = {"content-type": content_type, "content-length": str(len(body))}
+        return httpx.Response(200, headers=headers, content=body if request.method == "GET" else b"")
+
+@functools.lru_cache(maxsize=None)
+def get_storage() -> StorageBackend:
+    """The configured backend, created once per process"""
+    backend = os.getenv("STORAGE_BACKEND", "local").lower()
+    if backend == "s3":
+        return S3Storage.from_env()
+    if backend == "fake_s3":
+        return S3Storage.from_env(transport=FakeS3())
+    if backend != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return LocalStorage()
+
+@functools.lru_cache(maxsize=None)
+def _local_storage() -> LocalStorage:
+    return LocalStorage()
+
+def backend_for(url: Optional[str]) -> Optional[StorageBackend]:
+    """The backend a stored image_url belongs to; shoutouts from before a switch to S3 still point at uploads/"""
+    if not url:
+        return None
+    for backend in (get_storage(), _local_storage()):
+        if backend.owns(url):
+            return backend
+    return None
+
+def close_storage():
+    if get_storage.cache_info().currsize:
+        get_storage().close()
+        get_storage.cache_clear()
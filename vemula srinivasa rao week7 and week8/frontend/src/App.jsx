@@ -564,15 +564,12 @@ const BragBoardApp = () => {
       const res = await fetch(`${API_URL}${endpoint}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
         }
       });
       
       if (res.ok) {
-        const data = await res.json();
-        
-        // Create and download CSV
-        const blob = new Blob([data.content], { type: 'text/csv' });
+        // Endpoint streams the CSV itself (gzip is decoded by the browser)
+        const blob = await res.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
         a.href = url;